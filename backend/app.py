@@ -12,7 +12,7 @@ import json
 import time
 from datetime import datetime
 from flask import Flask, render_template, jsonify, request
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room
 import psutil
 import threading
 import logging
@@ -25,6 +25,15 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
 from system_monitor import SystemMonitor
 from dns_monitor import DNSMonitor
 from database import DatabaseManager
+from write_behind import WriteBehindQueue
+from retention import RetentionWorker
+from scheduler import CollectionScheduler
+from latest_store import LatestStore
+from raw_json import RawJSON, RawJSONEncoder
+from topics import TopicStreams, Subscriptions, room_name, topic_values, DEFAULT_RATE, LIVE_QUERIES
+from rollups import DEFAULT_POINTS
+from timestamps import to_epoch_ms, from_epoch_ms
+from latency_histogram import LatencyHistogram
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -37,63 +46,112 @@ app = Flask(__name__,
             template_folder='../frontend')
 app.config['SECRET_KEY'] = 'dns-monitor-secret-key-2024'
 
-# Initialize SocketIO
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+# Initialize SocketIO; RawJSONEncoder lets events carry JSON serialized once at publish time
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading', json=RawJSONEncoder)
 
 # Initialize monitors
 system_monitor = SystemMonitor()
-dns_monitor = DNSMonitor()
-db_manager = DatabaseManager()
+dns_monitor = DNSMonitor(stats_channel_url=os.environ.get('BIND_STATS_URL'),
+                         named_stats_file=os.environ.get('NAMED_STATS_FILE'),
+                         capture_interface=os.environ.get('DNS_CAPTURE_INTERFACE'),
+                         capture_pcap=os.environ.get('DNS_CAPTURE_PCAP'),
+                         capture_addresses=(os.environ['DNS_CAPTURE_ADDRESSES'].split(',')
+                                            if os.environ.get('DNS_CAPTURE_ADDRESSES') else None))
+db_manager = DatabaseManager(snapshot_interval=int(os.environ.get('SNAPSHOT_INTERVAL', 0)))
+write_queue = WriteBehindQueue(db_manager.store_monitoring_batch,
+                               flush_interval=int(os.environ.get('DB_FLUSH_INTERVAL_MS', 1000)) / 1000.0,
+                               flush_rows=int(os.environ.get('DB_FLUSH_ROWS', 5000)),
+                               capacity=int(os.environ.get('DB_QUEUE_SIZE', 600)),
+                               policy=os.environ.get('DB_QUEUE_POLICY', 'drop_oldest'))
+store = LatestStore()
+topic_streams = TopicStreams()
+subscriptions = Subscriptions()
+retention = RetentionWorker(db_manager,
+                            interval=int(os.environ.get('RETENTION_INTERVAL', 3600)),
+                            days=int(os.environ.get('RETENTION_DAYS', 30)),
+                            query_days=int(os.environ.get('QUERY_RETENTION_DAYS', 7)))
 
 class DNSMonitorApp:
     def __init__(self):
         self.running = False
-        self.monitoring_thread = None
+        
+        # Each collector publishes into the store at its own interval (cost is
+        # the expected ms per run). The 1s tier runs in this order, publish
+        # last; BIND probes keep their own TTL cache, which re-checks the
+        # config when a config file changes
+        self.scheduler = CollectionScheduler()
+        self.scheduler.add('system.usage', self._collect('system.usage', system_monitor.collect_usage), 1, cost=1)
+        self.scheduler.add('dns', self._collect('dns', dns_monitor.get_dns_stats, serialize=True), 1, cost=2)
+        self.scheduler.add('publish', self._publish, 1, cost=2)
+        self.scheduler.add('system.processes', self._collect('system.processes', system_monitor.collect_processes),
+                           5, cost=5)
+        self.scheduler.add('system.disk', self._collect('system.disk', system_monitor.collect_disk), 30, cost=0.1)
+        self.scheduler.add('system.static', self._collect('system.static', system_monitor.collect_static),
+                           60, cost=2)
+        self.scheduler.add('dns.latency', self._store_latency_histograms, 10, cost=1)
         
     def start_monitoring(self):
-        """Start the monitoring thread"""
+        """Start the collectors"""
         self.running = True
-        self.monitoring_thread = threading.Thread(target=self._monitor_loop)
-        self.monitoring_thread.daemon = True
-        self.monitoring_thread.start()
+        write_queue.start()
+        dns_monitor.restore_checkpoint(db_manager.get_checkpoint())
+        dns_monitor.start()
+        retention.start()
+        
+        # The slower parts are collected once up front so the first sample is complete
+        for name, collect in (('system.static', system_monitor.collect_static),
+                              ('system.disk', system_monitor.collect_disk),
+                              ('system.processes', system_monitor.collect_processes)):
+            store.publish(name, collect())
+        self.scheduler.start()
         logger.info("Monitoring started")
         
     def stop_monitoring(self):
-        """Stop the monitoring thread"""
+        """Stop the collectors"""
         self.running = False
-        if self.monitoring_thread:
-            self.monitoring_thread.join()
+        self.scheduler.stop()
+        dns_monitor.stop()
+        write_queue.stop()
+        retention.stop()
         logger.info("Monitoring stopped")
         
-    def _monitor_loop(self):
-        """Main monitoring loop"""
-        while self.running:
-            try:
-                # Collect system data
-                system_data = system_monitor.get_system_stats()
-                
-                # Collect DNS data
-                dns_data = dns_monitor.get_dns_stats()
-                
-                # Combine data
-                monitoring_data = {
-                    'timestamp': datetime.now().isoformat(),
-                    'system': system_data,
-                    'dns': dns_data
-                }
-                
-                # Store in database
-                db_manager.store_monitoring_data(monitoring_data)
-                
-                # Emit to connected clients
-                socketio.emit('monitoring_data', monitoring_data)
-                
-                # Wait before next iteration
-                time.sleep(1)
-                
-            except Exception as e:
-                logger.error(f"Error in monitoring loop: {e}")
-                time.sleep(5)
+    def _collect(self, name, collect, serialize=False):
+        """Collector publishing the result of ``collect`` under ``name``"""
+        return lambda: store.publish(name, collect(), serialize)
+        
+    def _publish(self):
+        """Assemble the latest collected parts into a monitoring sample, queue
+        it for the database and push it to connected clients"""
+        system_data = system_monitor.build_stats(store.get('system.usage'), store.get('system.disk'),
+                                                 store.get('system.processes'))
+        system_data['collection'].update({
+            'duration_ms': round(self.scheduler.last_tick_ms, 3),
+            'cpu_ms': round(self.scheduler.last_tick_cpu_ms, 3)
+        })
+        
+        monitoring_data = {
+            'timestamp': datetime.now().astimezone().isoformat(),
+            'system': system_data,
+            'dns': store.get('dns', {})
+        }
+        # Serialized once here, every API request and client gets these bytes
+        store.publish('system', system_data, serialize=True)
+        store.publish('monitoring_data', monitoring_data, serialize=True)
+        
+        # Queue for the database writer thread, with every query ingested
+        # since the previous tick and the checkpoint that covers them
+        sample = dict(monitoring_data)
+        sample['queries'], sample['checkpoint'] = dns_monitor.drain_queries()
+        write_queue.put(sample)
+        
+        # Emit what changed in each topic to the clients subscribed to it
+        topics = topic_values(system_data, monitoring_data['dns'], system_monitor.get_system_health(system_data),
+                              dns_monitor.get_recent_queries(LIVE_QUERIES))
+        for room, frame in topic_streams.advance(topics):
+            socketio.emit('monitoring_frame', RawJSON(frame), to=room)
+        
+    def _store_latency_histograms(self):
+        db_manager.store_latency_histograms(dns_monitor.collect_latency_intervals())
 
 # Initialize app
 monitor_app = DNSMonitorApp()
@@ -108,11 +166,21 @@ def favicon():
     """Serve favicon"""
     return app.send_static_file('favicon.ico')
 
+def published_response(name, fallback):
+    """Response with the JSON published under ``name`` and its ETag, 304 when
+    the client's If-None-Match matches; ``fallback()`` before anything is published"""
+    entry = store.get_published(name)
+    if entry is None or entry.body is None:
+        return jsonify(fallback())
+    response = app.response_class(entry.body, mimetype='application/json')
+    response.set_etag(entry.etag)
+    return response.make_conditional(request)
+
 @app.route('/api/system/stats')
 def get_system_stats():
     """Get current system statistics"""
     try:
-        return jsonify(system_monitor.get_system_stats())
+        return published_response('system', system_monitor.get_system_stats)
     except Exception as e:
         logger.error(f"Error getting system stats: {e}")
         return jsonify({'error': str(e)}), 500
@@ -121,7 +189,7 @@ def get_system_stats():
 def get_dns_stats():
     """Get current DNS statistics"""
     try:
-        return jsonify(dns_monitor.get_dns_stats())
+        return published_response('dns', dns_monitor.get_dns_stats)
     except Exception as e:
         logger.error(f"Error getting DNS stats: {e}")
         return jsonify({'error': str(e)}), 500
@@ -136,12 +204,52 @@ def get_dns_queries():
         logger.error(f"Error getting DNS queries: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/dns/top')
+def get_dns_top():
+    """Get top domains, clients and query types for a time window"""
+    try:
+        window = request.args.get('window', '1h')
+        limit = request.args.get('limit', 10, type=int)
+        return jsonify(dns_monitor.get_top(window, limit))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error getting DNS top lists: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/database/stats')
+def get_database_stats():
+    """Get database size, row counts, write queue and retention metrics"""
+    try:
+        stats = db_manager.get_database_stats()
+        stats['write_queue'] = write_queue.get_stats()
+        stats['ingest'] = dns_monitor.get_ingest_stats()
+        stats['retention'] = retention.get_stats()
+        return jsonify(stats)
+    except Exception as e:
+        logger.error(f"Error getting database stats: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/collectors')
+def get_collector_stats():
+    """Get each collector's interval and cost, and the age of the published data"""
+    try:
+        stats = monitor_app.scheduler.get_stats()
+        stats['published_age'] = store.get_stats()
+        stats['subscriptions'] = subscriptions.get_stats()
+        stats['topics'] = topic_streams.get_stats()
+        return jsonify(stats)
+    except Exception as e:
+        logger.error(f"Error getting collector stats: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/history/system')
 def get_system_history():
     """Get system monitoring history"""
     try:
         hours = request.args.get('hours', 24, type=int)
-        return jsonify(db_manager.get_system_history(hours))
+        points = request.args.get('points', DEFAULT_POINTS, type=int)
+        return jsonify(db_manager.get_system_history(hours, points))
     except Exception as e:
         logger.error(f"Error getting system history: {e}")
         return jsonify({'error': str(e)}), 500
@@ -151,33 +259,143 @@ def get_dns_history():
     """Get DNS monitoring history"""
     try:
         hours = request.args.get('hours', 24, type=int)
-        return jsonify(db_manager.get_dns_history(hours))
+        if request.args.get('metric') == 'latency':
+            return jsonify(get_latency_history(hours))
+        points = request.args.get('points', DEFAULT_POINTS, type=int)
+        return jsonify(db_manager.get_dns_history(hours, points))
     except Exception as e:
         logger.error(f"Error getting DNS history: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/history/dns/top')
+def get_dns_top_history():
+    """Get top domains and the query type distribution of any stored window"""
+    try:
+        hours = request.args.get('hours', 24, type=float)
+        limit = request.args.get('limit', 10, type=int)
+        end = to_epoch_ms(request.args['end']) if 'end' in request.args else to_epoch_ms()
+        start = to_epoch_ms(request.args['start']) if 'start' in request.args else end - int(hours * 3600 * 1000)
+        if start >= end:
+            raise ValueError("start must be before end")
+        return jsonify({
+            'start': from_epoch_ms(start),
+            'end': from_epoch_ms(end),
+            'top_domains': db_manager.get_top_domains(limit=limit, start=start, end=end),
+            'query_types': db_manager.get_query_type_stats(start=start, end=end)
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error getting DNS top history: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/history/snapshot')
+def get_snapshot():
+    """Get the stored monitoring snapshot nearest to a timestamp"""
+    try:
+        at = to_epoch_ms(request.args['at']) if 'at' in request.args else to_epoch_ms()
+        snapshot = db_manager.get_snapshot(at)
+        if snapshot is None:
+            return jsonify({'error': 'No snapshot stored'}), 404
+        return jsonify(snapshot)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error getting snapshot: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def get_latency_history(hours):
+    """Per-minute latency percentiles plus percentiles over the whole range"""
+    intervals = db_manager.get_latency_history(hours)
+    overall = LatencyHistogram()
+    for interval in intervals:
+        overall.merge(LatencyHistogram.from_dict(interval.pop('histogram')))
+    return {'intervals': intervals, 'overall': overall.get_stats()}
+
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection"""
     logger.info(f"Client connected: {request.sid}")
     emit('status', {'message': 'Connected to DNS Monitor'})
+    # Every topic at the default rate until the client subscribes otherwise
+    join_topics(subscriptions.add(request.sid))
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection"""
     logger.info(f"Client disconnected: {request.sid}")
+    subscriptions.remove(request.sid)
+
+@socketio.on('subscribe')
+def handle_subscribe(data=None):
+    """Handle a client choosing topics and their update rate"""
+    data = data or {}
+    try:
+        leave, join = subscriptions.subscribe(request.sid, data.get('topics'), data.get('rate', DEFAULT_RATE))
+    except ValueError as e:
+        emit('error', {'message': str(e)})
+        return
+    leave_topics(leave)
+    join_topics(join)
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data=None):
+    """Handle a client dropping topics"""
+    try:
+        leave = subscriptions.unsubscribe(request.sid, (data or {}).get('topics'))
+    except ValueError as e:
+        emit('error', {'message': str(e)})
+        return
+    leave_topics(leave)
+
+@socketio.on('pause_updates')
+def handle_pause_updates():
+    """Handle a client that stops displaying updates, e.g. a hidden tab"""
+    leave_topics(subscriptions.pause(request.sid))
+
+@socketio.on('resume_updates')
+def handle_resume_updates():
+    """Handle a paused client displaying updates again"""
+    join_topics(subscriptions.resume(request.sid))
+
+@socketio.on('resync')
+def handle_resync(data=None):
+    """Handle a client that missed frames of a topic"""
+    topic = (data or {}).get('topic')
+    rate = subscriptions.get_rate(request.sid, topic)
+    if rate is not None:
+        emit_keyframe(topic, rate)
+
+def join_topics(topics):
+    """Join the requesting client to (topic, rate) rooms and send their keyframes"""
+    for topic, rate in topics:
+        join_room(room_name(topic, rate))
+        emit_keyframe(topic, rate)
+
+def leave_topics(topics):
+    """Remove the requesting client from (topic, rate) rooms"""
+    for topic, rate in topics:
+        leave_room(room_name(topic, rate))
+
+def emit_keyframe(topic, rate):
+    """Send the requesting client a keyframe of the latest value of a topic"""
+    keyframe = topic_streams.keyframe(topic, rate)
+    if keyframe is not None:
+        emit('monitoring_frame', RawJSON(keyframe))
 
 @socketio.on('request_current_data')
 def handle_current_data_request():
     """Handle request for current monitoring data"""
     try:
-        system_data = system_monitor.get_system_stats()
-        dns_data = dns_monitor.get_dns_stats()
+        published = store.get_published('monitoring_data')
+        if published is not None:
+            emit('monitoring_data', RawJSON(published.text))
+            return
         
         monitoring_data = {
-            'timestamp': datetime.now().isoformat(),
-            'system': system_data,
-            'dns': dns_data
+            'timestamp': datetime.now().astimezone().isoformat(),
+            'system': system_monitor.get_system_stats(),
+            'dns': dns_monitor.get_dns_stats()
         }
         
         emit('monitoring_data', monitoring_data)
@@ -200,6 +418,7 @@ if __name__ == '__main__':
     except KeyboardInterrupt:
         logger.info("Shutting down...")
         monitor_app.stop_monitoring()
+        db_manager.close()
     except Exception as e:
         logger.error(f"Error starting server: {e}")
         sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Database Benchmark
+Compares per-call sqlite3 connections (rollback journal) with the pooled WAL
+connections used by DatabaseManager: sequential writes/sec, then history
+read latency while a writer stores a sample every 50 ms. Also reports the
+write rate of batches as flushed by the write-behind queue
+
+Usage: python3 bench_database.py [--writes 2000] [--readers 4] [--seconds 10] [--batch 10]
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'utils'))
+
+from database import DatabaseManager
+
+DOMAINS = ['google.com', 'example.com', 'github.com', 'stackoverflow.com',
+           'ubuntu.com', 'python.org', 'mozilla.org', 'docker.com']
+QUERY_TYPES = ['A', 'AAAA', 'MX', 'CNAME', 'TXT', 'NS', 'SOA', 'PTR']
+
+
+class PerCallConnections:
+    """Pool stand-in reproducing the previous behaviour: a fresh default
+    connection for every call"""
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+
+    @contextmanager
+    def _connection(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def writer(self):
+        return self._connection()
+
+    def reader(self):
+        return self._connection()
+
+    def close(self):
+        pass
+
+    def get_stats(self):
+        return {}
+
+
+def make_sample(queries=50):
+    """A monitoring sample shaped like DNSMonitorApp._monitor_loop output"""
+    now = datetime.now().isoformat()
+    return {
+        'timestamp': now,
+        'system': {
+            'cpu': {'percent': random.uniform(0, 100)},
+            'memory': {'percent': 42.0, 'used': 4 << 30, 'total': 16 << 30},
+            'disk': {'percent': 61.0, 'used': 300 << 30, 'total': 500 << 30},
+            'load_average': {'1min': 0.5, '5min': 0.4, '15min': 0.3},
+            'network': {'bytes_sent': 1 << 30, 'bytes_recv': 2 << 30,
+                        'speed': {'upload': 1000.0, 'download': 5000.0}},
+            'uptime': {'seconds': 86400}
+        },
+        'dns': {
+            'bind_status': {'process_running': True, 'service_status': {'active': True},
+                            'config_status': {'valid': True}},
+            'query_stats': {'total_queries': 100000, 'qps': 120.0,
+                            'queries_per_minute': 7200, 'queries_per_hour': 432000},
+            'response_times': {'average': 4.2},
+            'recent_queries': [{
+                'timestamp': now,
+                'client_ip': f"192.168.1.{random.randint(1, 254)}",
+                'domain': random.choice(DOMAINS),
+                'query_type': random.choice(QUERY_TYPES),
+                'response_time': random.uniform(1, 100)
+            } for _ in range(queries)],
+            'query_types': {qtype: {'count': 100, 'percentage': 12.5} for qtype in QUERY_TYPES}
+        }
+    }
+
+
+def make_manager(path, pooled):
+    manager = DatabaseManager(Path(path))
+    if not pooled:
+        manager.pool = PerCallConnections(path)
+    manager.init_database()
+    return manager
+
+
+def bench_writes(manager, writes):
+    samples = [make_sample() for _ in range(100)]
+    started = time.perf_counter()
+    for i in range(writes):
+        manager.store_monitoring_data(samples[i % len(samples)])
+    return writes / (time.perf_counter() - started)
+
+
+def bench_batched_writes(manager, writes, batch):
+    samples = [make_sample() for _ in range(batch)]
+    started = time.perf_counter()
+    for _ in range(writes // batch):
+        manager.store_monitoring_batch(samples)
+    return (writes // batch) * batch / (time.perf_counter() - started)
+
+
+def bench_reads(manager, readers, seconds):
+    stop = threading.Event()
+    latencies = []
+    lock = threading.Lock()
+
+    def write_loop():
+        sample = make_sample()
+        while not stop.is_set():
+            manager.store_monitoring_data(sample)
+            stop.wait(0.05)
+
+    def read_loop():
+        local = []
+        while not stop.is_set():
+            started = time.perf_counter()
+            manager.get_dns_history(1)
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=write_loop)]
+    threads += [threading.Thread(target=read_loop) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        'reads': len(latencies),
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000,
+        'max_ms': latencies[-1] * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writes', type=int, default=2000)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--batch', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, pooled in (('per-call connections', False), ('pooled WAL', True)):
+            path = os.path.join(tmp, f"{'pooled' if pooled else 'legacy'}.db")
+            manager = make_manager(path, pooled)
+            rate = bench_writes(manager, args.writes)
+            reads = bench_reads(manager, args.readers, args.seconds)
+            manager.close()
+            print(f"{name:>22}: {rate:8.0f} samples/s written | {reads['reads']} history reads, "
+                  f"p50 {reads['p50_ms']:.2f} ms, p99 {reads['p99_ms']:.2f} ms, max {reads['max_ms']:.2f} ms")
+
+        manager = make_manager(os.path.join(tmp, 'batched.db'), True)
+        rate = bench_batched_writes(manager, args.writes, args.batch)
+        manager.close()
+        print(f"{'pooled WAL, batched':>22}: {rate:8.0f} samples/s written in batches of {args.batch}")
+
+
+if __name__ == '__main__':
+    main()
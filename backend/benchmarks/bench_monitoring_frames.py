@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Monitoring Frames Benchmark
+Bytes per second each WebSocket client receives with monitoring_data sent
+whole every tick, as one DeltaStream and as the delta frames of every topic
+at each rate, for samples of this host and the DNS monitor (demo mode
+without BIND9)
+
+Usage: python3 bench_monitoring_frames.py [--ticks 30] [--interval 1.0]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'monitors'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'utils'))
+
+from system_monitor import SystemMonitor
+from dns_monitor import DNSMonitor
+from delta_stream import DeltaStream
+from topics import TopicStreams, RATES, LIVE_QUERIES, room_name, topic_values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ticks', type=int, default=30)
+    parser.add_argument('--interval', type=float, default=1.0)
+    args = parser.parse_args()
+
+    system_monitor = SystemMonitor()
+    dns_monitor = DNSMonitor()
+    stream = DeltaStream(window=args.ticks)
+    topic_streams = TopicStreams()
+    room_bytes = {}
+    system_monitor.collect_static()
+    disk = system_monitor.collect_disk()
+    processes = system_monitor.collect_processes()
+    full_bytes = 0
+    delta_bytes = 0
+    for tick in range(args.ticks):
+        time.sleep(args.interval)
+        # Processes every 5 ticks as in app.py
+        if tick % 5 == 0:
+            processes = system_monitor.collect_processes()
+        monitoring_data = {
+            'timestamp': datetime.now().astimezone().isoformat(),
+            'system': system_monitor.build_stats(system_monitor.collect_usage(), disk, processes),
+            'dns': dns_monitor.get_dns_stats()
+        }
+        text = json.dumps(monitoring_data, separators=(',', ':'), default=str)
+        frame = stream.advance(monitoring_data, text)
+        topics = topic_values(monitoring_data['system'], monitoring_data['dns'],
+                              system_monitor.get_system_health(monitoring_data['system']),
+                              dns_monitor.get_recent_queries(LIVE_QUERIES))
+        frames = topic_streams.advance(topics)
+        if tick:
+            full_bytes += len(text.encode('utf-8'))
+            delta_bytes += len(frame.encode('utf-8')) if frame else 0
+            for room, frame in frames:
+                room_bytes[room] = room_bytes.get(room, 0) + len(frame.encode('utf-8'))
+
+    seconds = (args.ticks - 1) * args.interval
+    print(f"{args.ticks} ticks, {args.interval} s apart")
+    print(f"  monitoring_data: {full_bytes / (args.ticks - 1):9.0f} B/tick | {full_bytes / seconds:9.0f} B/s per client")
+    print(f"  delta frames:    {delta_bytes / (args.ticks - 1):9.0f} B/tick | {delta_bytes / seconds:9.0f} B/s per client")
+    for rate in RATES:
+        total = sum(room_bytes.get(room_name(topic, rate), 0) for topic in topics)
+        print(f"  all topics at {rate:2}s: {total / seconds:9.0f} B/s per client")
+    for topic in topics:
+        print(f"    {topic:>16} at 1s: {room_bytes.get(room_name(topic, 1), 0) / seconds:9.0f} B/s")
+    print(f"  keyframe on connect: {stream.get_stats()['last_full_bytes']} B")
+
+
+if __name__ == '__main__':
+    main()
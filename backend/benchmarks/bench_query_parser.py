@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Query Parser Benchmark
+Compares the legacy per-line regex parser with QueryLineParser on a synthetic
+BIND9 query log
+
+Usage: python3 bench_query_parser.py [--lines 2000000] [--format bind|syslog]
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'monitors'))
+
+from query_parser import QueryLineParser
+
+DOMAINS = ['google.com', 'example.com', 'github.com', 'stackoverflow.com',
+           'ubuntu.com', 'python.org', 'mozilla.org', 'docker.com']
+QUERY_TYPES = ['A', 'AAAA', 'MX', 'CNAME', 'TXT', 'NS', 'SOA', 'PTR']
+
+
+def legacy_parse_timestamp(timestamp_str):
+    """Timestamp parsing as done by DNSMonitor before the parser engine"""
+    formats = ['%d-%b-%Y %H:%M:%S.%f', '%b %d %H:%M:%S', '%Y-%m-%d %H:%M:%S']
+    for fmt in formats:
+        try:
+            dt = datetime.strptime(timestamp_str, fmt)
+            if dt.year == 1900:
+                dt = dt.replace(year=datetime.now().year)
+            return dt.isoformat()
+        except ValueError:
+            continue
+    return datetime.now().isoformat()
+
+
+def legacy_parse_line(line):
+    """Line parsing as done by DNSMonitor before the parser engine"""
+    patterns = [
+        r'(\d{2}-\w{3}-\d{4} \d{2}:\d{2}:\d{2}\.\d{3}).*client (@\S+).*query: (\S+) IN (\S+)',
+        r'(\w{3} \d{2} \d{2}:\d{2}:\d{2}).*named.*client (\S+).*query: (\S+) IN (\S+)',
+        r'(\w{3} \d{2} \d{2}:\d{2}:\d{2}).*named.*client (\S+)#\d+.*query: (\S+) IN (\S+)'
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, line)
+        if match:
+            timestamp_str, client_ip, domain, query_type = match.groups()
+            client_ip = client_ip.replace('@', '').split('#')[0]
+            return (legacy_parse_timestamp(timestamp_str), client_ip, domain, query_type)
+    return None
+
+
+def generate_log(path, lines, log_format):
+    """Write a synthetic query log, 50k queries per simulated second"""
+    start = datetime.now() - timedelta(hours=1)
+    with open(path, 'w') as f:
+        for i in range(lines):
+            ts = start + timedelta(microseconds=i * 20)
+            domain = random.choice(DOMAINS)
+            query_type = random.choice(QUERY_TYPES)
+            client = f"192.168.{random.randint(0, 255)}.{random.randint(1, 254)}#{random.randint(1024, 65535)}"
+            query = (f"client @0x7f8b8c{i % 4096:06x} {client} ({domain}): "
+                     f"query: {domain} IN {query_type} +E(0)K (10.0.0.1)")
+            if log_format == 'syslog':
+                f.write(f"{ts.strftime('%b %d %H:%M:%S')} ns1 named[812]: {query}\n")
+            else:
+                f.write(f"{ts.strftime('%d-%b-%Y %H:%M:%S')}.{ts.microsecond // 1000:03d} "
+                        f"queries: info: {query}\n")
+
+
+def run(name, path, parse):
+    """Parse the whole file, returns lines per second"""
+    parsed = 0
+    total = 0
+    started = time.perf_counter()
+    with open(path) as f:
+        for line in f:
+            total += 1
+            if parse(line) is not None:
+                parsed += 1
+    elapsed = time.perf_counter() - started
+    rate = total / elapsed if elapsed > 0 else 0
+    print(f"{name:<10} {total:>10} lines  {parsed:>10} parsed  {elapsed:8.2f}s  {rate:>12,.0f} lines/s")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lines', type=int, default=2000000)
+    parser.add_argument('--format', choices=['bind', 'syslog'], default='bind')
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.log')
+    os.close(fd)
+    try:
+        print(f"Generating {args.lines} {args.format} lines...")
+        generate_log(path, args.lines, args.format)
+
+        before = run('legacy', path, legacy_parse_line)
+        after = run('parser', path, QueryLineParser().parse)
+        print(f"speedup: {after / before:.1f}x")
+    finally:
+        os.unlink(path)
+
+
+if __name__ == '__main__':
+    main()
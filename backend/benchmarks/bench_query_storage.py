@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Query Storage Benchmark
+Bytes per stored DNS query and insert throughput of the dictionary encoded
+dns_queries layout against the previous layouts: TEXT timestamps with four
+secondary indexes, and epoch milliseconds with (ts, domain)/(ts, query_type)
+indexes. Both previous layouts keep the full text of every column. Raw log
+lines are only stored with --raw-lines, as with keep_raw_lines
+
+Usage: python3 bench_query_storage.py [--queries 500000] [--batch 5000] [--domains 50000] [--clients 2000] [--raw-lines]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'utils'))
+
+from database import DatabaseManager
+from sqlite_pool import SQLitePool
+
+QUERY_TYPES = ['A', 'AAAA', 'HTTPS', 'PTR', 'MX', 'TXT', 'CNAME', 'SRV']
+TYPE_WEIGHTS = [60, 25, 6, 4, 2, 1, 1, 1]
+
+LEGACY_LAYOUTS = {
+    'TEXT timestamps, 4 indexes': ('''
+        CREATE TABLE dns_queries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            client_ip TEXT,
+            domain TEXT,
+            query_type TEXT,
+            response_time REAL,
+            raw_line TEXT,
+            seq INTEGER
+        )''', (
+        'CREATE INDEX idx_queries_timestamp ON dns_queries(timestamp)',
+        'CREATE INDEX idx_queries_domain ON dns_queries(domain)',
+        'CREATE INDEX idx_queries_type ON dns_queries(query_type)',
+        'CREATE INDEX idx_queries_client ON dns_queries(client_ip)')),
+    'epoch ms, 2 indexes': ('''
+        CREATE TABLE dns_queries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts INTEGER NOT NULL,
+            client_ip TEXT,
+            domain TEXT,
+            query_type TEXT,
+            response_time REAL,
+            raw_line TEXT,
+            seq INTEGER
+        )''', (
+        'CREATE INDEX idx_queries_ts_domain ON dns_queries(ts, domain)',
+        'CREATE INDEX idx_queries_ts_type ON dns_queries(ts, query_type)'))
+}
+
+
+def make_queries(count, domains, clients):
+    """Queries at 5k/s with a skewed domain and client popularity"""
+    names = [f"host{i}.{random.choice(['example', 'cdn', 'api', 'mail'])}{i % 997}.com"
+             for i in range(domains)]
+    addresses = [f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" for i in range(clients)]
+    start = time.time() - count / 5000.0
+    queries = []
+    for seq in range(1, count + 1):
+        ts = start + seq / 5000.0
+        domain = names[min(int(random.paretovariate(1.2)) - 1, domains - 1)]
+        client = addresses[min(int(random.paretovariate(1.5)) - 1, clients - 1)]
+        query_type = random.choices(QUERY_TYPES, TYPE_WEIGHTS)[0]
+        raw_line = (f"{datetime.fromtimestamp(ts).strftime('%d-%b-%Y %H:%M:%S.%f')[:-3]} "
+                    f"queries: info: client @0x7f3a2c00d8f0 {client}#{random.randint(1024, 65535)} "
+                    f"({domain}): query: {domain} IN {query_type} +E(0)K (10.0.0.1)")
+        queries.append({
+            'seq': seq,
+            'timestamp': datetime.fromtimestamp(ts).astimezone().isoformat(),
+            'epoch': ts,
+            'client_ip': client,
+            'domain': domain,
+            'query_type': query_type,
+            'response_time': round(random.lognormvariate(1.0, 1.0), 3),
+            'raw_line': raw_line
+        })
+    return queries
+
+
+def stored_bytes(pool):
+    with pool.writer() as conn:
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        pages = conn.execute('PRAGMA page_count').fetchone()[0]
+        free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    return (pages - free) * page_size
+
+
+def bench_legacy(path, layout, queries, batch, raw_lines):
+    table_sql, index_sqls = LEGACY_LAYOUTS[layout]
+    pool = SQLitePool(path)
+    with pool.writer() as conn:
+        conn.execute(table_sql)
+        for sql in index_sqls:
+            conn.execute(sql)
+    empty = stored_bytes(pool)
+
+    text_timestamps = layout.startswith('TEXT')
+    insert = ('INSERT INTO dns_queries ({}, client_ip, domain, query_type, response_time, raw_line, seq) '
+              'VALUES (?, ?, ?, ?, ?, ?, ?)').format('timestamp' if text_timestamps else 'ts')
+    started = time.perf_counter()
+    for i in range(0, len(queries), batch):
+        rows = [(query['timestamp'] if text_timestamps else int(query['epoch'] * 1000),
+                 query['client_ip'], query['domain'], query['query_type'],
+                 query['response_time'], query['raw_line'] if raw_lines else '', query['seq'])
+                for query in queries[i:i + batch]]
+        with pool.writer() as conn:
+            conn.executemany(insert, rows)
+    elapsed = time.perf_counter() - started
+
+    size = stored_bytes(pool) - empty
+    pool.close()
+    return size, elapsed
+
+
+def bench_dictionary(path, queries, batch, raw_lines):
+    manager = DatabaseManager(path)
+    manager.init_database()
+    empty = stored_bytes(manager.pool)
+
+    samples = []
+    for i in range(0, len(queries), batch):
+        chunk = [dict(query) for query in queries[i:i + batch]]
+        for query in chunk:
+            query.pop('epoch')
+            if not raw_lines:
+                query.pop('raw_line')
+        samples.append({'timestamp': chunk[-1]['timestamp'], 'queries': chunk})
+
+    started = time.perf_counter()
+    for sample in samples:
+        manager.store_monitoring_batch([sample])
+    elapsed = time.perf_counter() - started
+
+    size = stored_bytes(manager.pool) - empty
+    manager.close()
+    return size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=500000)
+    parser.add_argument('--batch', type=int, default=5000)
+    parser.add_argument('--domains', type=int, default=50000)
+    parser.add_argument('--clients', type=int, default=2000)
+    parser.add_argument('--raw-lines', action='store_true')
+    args = parser.parse_args()
+
+    random.seed(1)
+    queries = make_queries(args.queries, args.domains, args.clients)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = []
+        for n, layout in enumerate(LEGACY_LAYOUTS):
+            results.append((layout, *bench_legacy(os.path.join(tmp, f'legacy{n}.db'), layout,
+                                                  queries, args.batch, args.raw_lines)))
+        results.append(('dictionary encoded', *bench_dictionary(
+            os.path.join(tmp, 'dictionary.db'), queries, args.batch, args.raw_lines)))
+
+    for name, size, elapsed in results:
+        print(f"{name:>28}: {size / len(queries):7.1f} bytes/query | "
+              f"{len(queries) / elapsed:9.0f} queries/s inserted")
+
+
+if __name__ == '__main__':
+    main()
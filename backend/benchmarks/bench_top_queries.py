@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Top Queries Benchmark
+Latency of the 24h top domains and query type distribution answered from the
+per-minute aggregate tables against GROUP BY over every stored query
+
+Usage: python3 bench_top_queries.py [--queries 2000000] [--domains 50000] [--repeat 5]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'utils'))
+
+from database import DatabaseManager
+from timestamps import to_epoch_ms, from_epoch_ms
+
+QUERY_TYPES = ['A', 'AAAA', 'HTTPS', 'PTR', 'MX', 'TXT', 'CNAME', 'SRV']
+TYPE_WEIGHTS = [60, 25, 6, 4, 2, 1, 1, 1]
+
+
+def fill(manager, count, domains, batch=20000):
+    """``count`` queries spread over the last 24 hours"""
+    names = [f"host{i}.example{i % 97}.com" for i in range(domains)]
+    end = to_epoch_ms()
+    start = end - 86400 * 1000
+    step = (end - start) / count
+    for first in range(0, count, batch):
+        queries = []
+        for seq in range(first + 1, min(first + batch, count) + 1):
+            queries.append({
+                'seq': seq,
+                'timestamp': from_epoch_ms(int(start + seq * step)),
+                'client_ip': f"10.0.{seq % 16}.{seq % 251}",
+                'domain': names[min(int(random.paretovariate(1.2)) - 1, domains - 1)],
+                'query_type': random.choices(QUERY_TYPES, TYPE_WEIGHTS)[0],
+                'response_time': 1.0
+            })
+        manager.store_monitoring_batch([{'timestamp': queries[-1]['timestamp'], 'queries': queries}])
+
+
+def raw_top(manager, start, limit=10):
+    """The previous GROUP BY over every query of the window"""
+    tables = manager.partitions.covering('dns_queries', start)
+    with manager.pool.reader() as conn:
+        domains = conn.execute('''
+            SELECT domain_id, COUNT(*) as count FROM ({queries})
+            GROUP BY domain_id ORDER BY count DESC LIMIT ?
+        '''.format(queries=' UNION ALL '.join(
+            f'SELECT domain_id FROM {table} WHERE ts >= ?' for table in tables)),
+            (start,) * len(tables) + (limit,)).fetchall()
+        types = conn.execute('''
+            SELECT type_id, COUNT(*) FROM ({queries}) GROUP BY type_id
+        '''.format(queries=' UNION ALL '.join(
+            f'SELECT type_id FROM {table} WHERE ts >= ?' for table in tables)),
+            (start,) * len(tables)).fetchall()
+    return domains, types
+
+
+def timed(fn, repeat):
+    """Best wall time of ``repeat`` calls, in ms"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=2000000)
+    parser.add_argument('--domains', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = DatabaseManager(os.path.join(tmp, 'top.db'))
+        manager.init_database()
+        fill(manager, args.queries, args.domains)
+
+        stats = manager.get_database_stats()
+        print(f"{stats['dns_queries_count']} queries, {stats['domain_counts_count']} domain buckets, "
+              f"{stats['query_type_counts_count']} query type buckets")
+
+        start = to_epoch_ms() - 86400 * 1000
+        raw_ms = timed(lambda: raw_top(manager, start), args.repeat)
+        aggregate_ms = timed(lambda: (manager.get_top_domains(24), manager.get_query_type_stats(24)),
+                             args.repeat)
+        manager.close()
+
+    print(f"{'GROUP BY over queries':>24}: {raw_ms:9.1f} ms")
+    print(f"{'per-minute aggregates':>24}: {aggregate_ms:9.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
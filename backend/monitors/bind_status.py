@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BIND Status Module
+Caches BIND9 status probes with per-probe TTLs, refreshed by a background worker
+"""
+
+import os
+import glob
+import time
+import subprocess
+import threading
+import logging
+
+from named_process import NamedProcessTracker
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_GLOBS = [
+    '/etc/bind/named.conf*',
+    '/etc/named.conf',
+    '/etc/named/*.conf'
+]
+
+
+class Probe:
+    """A cached status probe"""
+
+    def __init__(self, name, func, ttl):
+        self.name = name
+        self.func = func
+        self.ttl = ttl
+        self.value = None
+        self.updated = None
+        self.duration = 0.0
+        self.runs = 0
+
+    def due(self, now):
+        return self.updated is None or now - self.updated >= self.ttl
+
+    def run(self):
+        started = time.monotonic()
+        try:
+            self.value = self.func()
+        except Exception as e:
+            logger.warning(f"Status probe {self.name} failed: {e}")
+        self.updated = time.monotonic()
+        self.duration = self.updated - started
+        self.runs += 1
+
+
+class BindStatusCache:
+    """Serves BIND9 status from cached probes so readers never fork
+
+    - process: named pid tracked through /proc, every 2s
+    - process_info: /proc/<pid> sample of the named process, every 2s
+    - service: systemctl is-active, every 10s
+    - config: named-checkconf, when a config file mtime changes (hourly otherwise)
+    - version: named -v, hourly or when the named pid changes
+    """
+
+    def __init__(self, proc_root='/proc', config_globs=None, refresh_interval=1.0):
+        self.proc_root = proc_root
+        self.process_tracker = NamedProcessTracker(proc_root)
+        self.config_globs = config_globs or DEFAULT_CONFIG_GLOBS
+        self.refresh_interval = refresh_interval
+
+        self.probes = {
+            'process': Probe('process', self._probe_process, 2),
+            'process_info': Probe('process_info', self._probe_process_info, 2),
+            'service': Probe('service', self._probe_service, 10),
+            'config': Probe('config', self._probe_config, 3600),
+            'version': Probe('version', self._probe_version, 3600)
+        }
+        self._config_signature = None
+        self._version_pid = None
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """Start the background refresher"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='bind-status')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background refresher"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing BIND status: {e}")
+            self._stop_event.wait(self.refresh_interval)
+
+    def refresh(self, force=False):
+        """Run every probe that is due"""
+        with self._lock:
+            now = time.monotonic()
+
+            signature = self._get_config_signature()
+            if signature != self._config_signature:
+                self._config_signature = signature
+                force_config = True
+            else:
+                force_config = False
+
+            for name, probe in self.probes.items():
+                if name == 'process_info' and self._get_pid() is None:
+                    probe.value = {}
+                    continue
+                if name == 'version':
+                    pid = self._get_pid()
+                    if pid != self._version_pid:
+                        self._version_pid = pid
+                        probe.updated = None
+                if force or probe.due(now) or (name == 'config' and force_config):
+                    probe.run()
+
+    def get_status(self):
+        """Get the cached BIND9 status in the bind_status payload format"""
+        if self.probes['process'].updated is None and not (self._thread and self._thread.is_alive()):
+            self.refresh()
+
+        process_running = self.probes['process'].value is not None
+        service_status = self.probes['service'].value or {
+            'active': process_running,
+            'status': 'unknown'
+        }
+
+        return {
+            'process_running': process_running,
+            'service_status': service_status,
+            'process_info': self.probes['process_info'].value or {},
+            'config_status': self.probes['config'].value or {
+                'valid': False, 'errors': 'Cannot check configuration'
+            },
+            'version': self.probes['version'].value or 'unknown'
+        }
+
+    def get_stats(self):
+        """Get probe ages and costs"""
+        now = time.monotonic()
+        return {
+            name: {
+                'age': round(now - probe.updated, 3) if probe.updated is not None else None,
+                'duration_ms': round(probe.duration * 1000, 3),
+                'runs': probe.runs
+            }
+            for name, probe in self.probes.items()
+        }
+
+    def _get_pid(self):
+        return self.probes['process'].value
+
+    def _get_config_signature(self):
+        """(path, mtime, size) of every config file, cheap to compute each refresh"""
+        signature = []
+        for pattern in self.config_globs:
+            for path in sorted(glob.glob(pattern)):
+                try:
+                    st = os.stat(path)
+                    signature.append((path, st.st_mtime_ns, st.st_size))
+                except OSError:
+                    continue
+        return tuple(signature)
+
+    def _probe_process(self):
+        return self.process_tracker.resolve()
+
+    def _probe_process_info(self):
+        return self.process_tracker.sample()
+
+    def _probe_service(self):
+        try:
+            result = subprocess.run(['systemctl', 'is-active', 'named'],
+                                    capture_output=True, text=True)
+            return {
+                'active': result.stdout.strip() == 'active',
+                'status': result.stdout.strip()
+            }
+        except OSError:
+            return None
+
+    def _probe_config(self):
+        try:
+            result = subprocess.run(['named-checkconf'], capture_output=True, text=True)
+            return {
+                'valid': result.returncode == 0,
+                'errors': result.stderr.strip() if result.stderr else None
+            }
+        except OSError:
+            return {'valid': False, 'errors': 'Cannot check configuration'}
+
+    def _probe_version(self):
+        try:
+            result = subprocess.run(['named', '-v'], capture_output=True, text=True)
+            if result.returncode == 0:
+                return result.stdout.strip()
+            return 'unknown'
+        except OSError:
+            return 'unknown'
@@ -6,43 +6,171 @@ Monitors BIND9 DNS server status and parses DNS query logs
 """
 
 import os
-import re
-import subprocess
 import json
 import time
 import random
 import logging
+import threading
 from datetime import datetime, timedelta
 from pathlib import Path
 from collections import defaultdict, deque
 
+from log_tailer import LogTailer
+from query_parser import QueryLineParser
+from query_buffer import QueryRingBuffer
+from rate_counter import QueryRateCounter
+from heavy_hitters import HeavyHitterTracker
+from bind_status import BindStatusCache
+from named_process import find_named_pids
+from stats_channel import StatsChannelCollector
+from named_stats import NamedStatsCollector
+from packet_capture import DNSPacketCapture
+from latency_histogram import LatencyTracker
+
 logger = logging.getLogger(__name__)
 
 class DNSMonitor:
-    def __init__(self):
+    def __init__(self, history_size=1000000, keep_raw_lines=False, top_epsilon=0.001,
+                 stats_channel_url=None, named_stats_file=None, named_stats_interval=60,
+                 capture_interface=None, capture_pcap=None, capture_addresses=None):
         self.bind_log_paths = [
             '/var/log/named/query.log',
             '/var/log/bind/query.log',
             '/var/log/syslog',
             '/var/log/messages'
         ]
-        self.query_history = deque(maxlen=1000)
+        self.query_history = QueryRingBuffer(history_size, keep_raw_lines=keep_raw_lines)
+        self.query_rates = QueryRateCounter()
+        self.heavy_hitters = HeavyHitterTracker(epsilon=top_epsilon)
         self.query_stats = defaultdict(int)
         self.response_times = deque(maxlen=100)
-        self.last_log_position = {}
-        self.domain_stats = defaultdict(int)
+        self.latency = LatencyTracker()
+        
+        # query_history.total as of the last get_dns_stats call
+        self.last_reported_total = 0
+        # Sequence number of the newest query handed out by drain_queries
+        self.drained_seq = 0
+        self.queries_missed = 0
+        self.lock = threading.Lock()
+        self.status_cache = BindStatusCache()
+        self.stats_collector = StatsChannelCollector(stats_channel_url) if stats_channel_url else None
+        self.named_stats = (NamedStatsCollector(named_stats_file, interval=named_stats_interval)
+                            if named_stats_file else None)
+        self.parsers = {path: QueryLineParser() for path in self.bind_log_paths}
+        self.log_tailer = LogTailer(self.bind_log_paths, self._ingest_log_lines)
+        
+        # Optional passive capture for measured response times ('any' captures every interface)
+        self.capture_interface = capture_interface
+        self.capture_pcap = capture_pcap
+        self.packet_capture = None
+        if capture_interface or capture_pcap:
+            interface = None if capture_interface in (None, 'any') else capture_interface
+            self.packet_capture = DNSPacketCapture(self._ingest_capture_result, interface=interface,
+                                                   server_addresses=capture_addresses)
         
         # Demo mode - initialize with mock data when BIND9 is not available
         self.demo_mode = False
         self._initialize_demo_data()
+    
+    def start(self):
+        """Start following the BIND9 query logs and refreshing status in the background"""
+        self.status_cache.start()
+        if self.stats_collector:
+            self.stats_collector.start()
+        if self.named_stats:
+            self.named_stats.start()
+        if not self.demo_mode:
+            self.log_tailer.start()
+        if self.packet_capture:
+            self._start_capture()
+    
+    def restore_checkpoint(self, checkpoint):
+        """Continue after a checkpoint saved with drained queries, call before start()
+
+        Query sequence numbers resume after the checkpointed one and the log
+        tailer resumes from the checkpointed file offsets, so nothing
+        persisted before a restart is read or stored again.
+        """
+        if not checkpoint:
+            return
+        with self.lock:
+            self.query_history.seq_base = checkpoint['seq']
+            self.drained_seq = checkpoint['seq']
+        self.log_tailer.set_positions(checkpoint.get('positions') or {})
+        logger.info(f"Resuming DNS query ingestion after sequence {checkpoint['seq']}")
+    
+    def drain_queries(self):
+        """Get the queries ingested since the last call and a checkpoint covering them
+        
+        Returns (queries, checkpoint), queries oldest first; the checkpoint
+        holds the sequence number of the newest query and the log positions
+        just past the lines it came from. Storing both in one transaction
+        makes persistence exactly-once across restarts.
+        """
+        # No lines are delivered while paused, so positions and seq agree
+        with self.log_tailer.paused():
+            positions = self.log_tailer.get_positions()
+            with self.lock:
+                queries, missed = self.query_history.get_since(self.drained_seq)
+                seq = self.query_history.last_seq
+                self.drained_seq = seq
+        
+        if missed:
+            self.queries_missed += missed
+            logger.warning(f"{missed} queries were overwritten in the buffer before being stored")
+        
+        return queries, {'seq': seq, 'positions': positions}
+    
+    def get_ingest_stats(self):
+        """Get query sequence and drain counters"""
+        with self.lock:
+            return {
+                'last_seq': self.query_history.last_seq,
+                'drained_seq': self.drained_seq,
+                'queries_missed': self.queries_missed
+            }
+    
+    def stop(self):
+        """Stop the background log tailer and status refresher"""
+        self.log_tailer.stop()
+        self.status_cache.stop()
+        if self.stats_collector:
+            self.stats_collector.stop()
+        if self.named_stats:
+            self.named_stats.stop()
+        if self.packet_capture:
+            self.packet_capture.stop()
+    
+    def _start_capture(self):
+        """Start live capture, or replay the configured pcap file in the background"""
+        try:
+            if self.capture_pcap:
+                thread = threading.Thread(target=self._replay_capture, name='dns-capture-replay')
+                thread.daemon = True
+                thread.start()
+            else:
+                self.packet_capture.start()
+        except OSError as e:
+            logger.error(f"Error starting DNS packet capture: {e}")
+    
+    def _replay_capture(self):
+        try:
+            stats = self.packet_capture.replay(self.capture_pcap)
+            logger.info(f"Replayed {self.capture_pcap}: {stats['matched']} answered queries")
+        except (OSError, ValueError) as e:
+            logger.error(f"Error replaying {self.capture_pcap}: {e}")
+    
+    def _ingest_capture_result(self, result):
+        """Record a query/response pair matched by the packet capture"""
+        self.response_times.append(result['latency_ms'])
+        with self.lock:
+            self.latency.record(result['timestamp'], result['latency_ms'])
         
     def _initialize_demo_data(self):
         """Initialize demo data when BIND9 is not available"""
         try:
             # Check if BIND9 is running
-            result = subprocess.run(['pgrep', '-x', 'named'], 
-                                  capture_output=True, text=True)
-            bind_running = result.returncode == 0
+            bind_running = bool(find_named_pids())
             
             if not bind_running:
                 self.demo_mode = True
@@ -61,27 +189,28 @@ class DNSMonitor:
                 
                 query_types = ['A', 'AAAA', 'MX', 'CNAME', 'TXT', 'NS', 'SOA', 'PTR']
                 
-                # Generate last 100 queries
-                now = datetime.now()
-                for i in range(100):
-                    query_time = now - timedelta(minutes=random.randint(0, 60))
+                # Generate last 100 queries, oldest first like a real log
+                now = time.time()
+                query_times = sorted(now - random.randint(0, 3600) for _ in range(100))
+                for query_time in query_times:
                     domain = random.choice(domains)
                     query_type = random.choice(query_types)
                     response_time = random.uniform(1, 100)
+                    client_ip = f"192.168.1.{random.randint(1, 254)}"
                     
-                    query = {
-                        'timestamp': query_time.isoformat(),
-                        'client_ip': f"192.168.1.{random.randint(1, 254)}",
-                        'domain': domain,
-                        'query_type': query_type,
-                        'response_time': response_time,
-                        'raw_line': f"client {query_time.strftime('%d-%b-%Y %H:%M:%S')} query: {domain} IN {query_type}"
-                    }
-                    
-                    self.query_history.append(query)
+                    self.query_history.append(
+                        query_time,
+                        client_ip,
+                        domain,
+                        query_type,
+                        response_time,
+                        f"client {datetime.fromtimestamp(query_time).strftime('%d-%b-%Y %H:%M:%S')} query: {domain} IN {query_type}"
+                    )
+                    self.query_rates.add(query_time)
+                    self.heavy_hitters.add(query_time, domain, client_ip, query_type)
                     self.query_stats[query_type] += 1
                     self.response_times.append(response_time)
-                    self.domain_stats[domain] += 1
+                    self.latency.record(query_time, response_time)
                     
                 logger.info(f"Generated {len(self.query_history)} demo DNS queries")
                 
@@ -108,20 +237,23 @@ class DNSMonitor:
             domain = random.choice(domains)
             query_type = random.choice(query_types)
             response_time = random.uniform(1, 100)
-            
-            query = {
-                'timestamp': datetime.now().isoformat(),
-                'client_ip': f"192.168.1.{random.randint(1, 254)}",
-                'domain': domain,
-                'query_type': query_type,
-                'response_time': response_time,
-                'raw_line': f"client {datetime.now().strftime('%d-%b-%Y %H:%M:%S')} query: {domain} IN {query_type}"
-            }
-            
-            self.query_history.append(query)
-            self.query_stats[query_type] += 1
+            client_ip = f"192.168.1.{random.randint(1, 254)}"
+            
+            now = time.time()
+            with self.lock:
+                self.query_history.append(
+                    now,
+                    client_ip,
+                    domain,
+                    query_type,
+                    response_time,
+                    f"client {datetime.now().strftime('%d-%b-%Y %H:%M:%S')} query: {domain} IN {query_type}"
+                )
+                self.query_rates.add(now)
+                self.heavy_hitters.add(now, domain, client_ip, query_type)
+                self.query_stats[query_type] += 1
+                self.latency.record(now, response_time)
             self.response_times.append(response_time)
-            self.domain_stats[domain] += 1
             
         except Exception as e:
             logger.error(f"Error adding demo query: {e}")
@@ -139,14 +271,20 @@ class DNSMonitor:
             # Parse recent queries
             recent_queries = self._parse_recent_queries()
             
+            # Server-side counters from the statistics channel or rndc dumps, if configured
+            channel_stats = self.stats_collector.get_stats() if self.stats_collector else None
+            named_stats = self.named_stats.get_stats() if self.named_stats else None
+            capture_stats = self.packet_capture.get_stats() if self.packet_capture else None
+            counter_stats = channel_stats or named_stats
+            
             # Calculate statistics
-            query_stats = self._calculate_query_stats()
+            query_stats = self._calculate_query_stats(counter_stats)
             
             # Get response time statistics
             response_stats = self._get_response_time_stats()
             
             # Get query type distribution
-            query_types = self._get_query_type_distribution()
+            query_types = self._get_query_type_distribution(counter_stats)
             
             # Get top queried domains
             top_domains = self._get_top_domains()
@@ -159,7 +297,10 @@ class DNSMonitor:
                 'response_times': response_stats,
                 'query_types': query_types,
                 'top_domains': top_domains,
-                'service_health': self._get_service_health()
+                'service_health': self._get_service_health(bind_status, query_stats),
+                'statistics_channel': channel_stats,
+                'named_stats': named_stats,
+                'packet_capture': capture_stats
             }
             
         except Exception as e:
@@ -167,258 +308,97 @@ class DNSMonitor:
             return {'error': str(e)}
     
     def _get_bind_status(self):
-        """Get BIND9 service status"""
+        """Get BIND9 service status from the probe cache"""
         try:
-            # Check if named process is running
-            result = subprocess.run(['pgrep', '-x', 'named'], 
-                                  capture_output=True, text=True)
-            process_running = result.returncode == 0
-            
-            # Get systemd service status
-            service_status = {}
-            try:
-                result = subprocess.run(['systemctl', 'is-active', 'named'], 
-                                      capture_output=True, text=True)
-                service_status['active'] = result.stdout.strip() == 'active'
-                service_status['status'] = result.stdout.strip()
-            except:
-                service_status['active'] = process_running
-                service_status['status'] = 'unknown'
-            
-            # Get process information
-            process_info = {}
-            if process_running:
-                try:
-                    result = subprocess.run(['ps', '-o', 'pid,ppid,cpu,mem,cmd', '-C', 'named'], 
-                                          capture_output=True, text=True)
-                    lines = result.stdout.strip().split('\n')
-                    if len(lines) > 1:
-                        headers = lines[0].split()
-                        values = lines[1].split()
-                        if len(values) >= 4:
-                            process_info = {
-                                'pid': values[0],
-                                'ppid': values[1],
-                                'cpu_percent': values[2],
-                                'memory_percent': values[3],
-                                'command': ' '.join(values[4:])
-                            }
-                except:
-                    pass
-            
-            # Check configuration
-            config_status = self._check_bind_config()
-            
-            return {
-                'process_running': process_running,
-                'service_status': service_status,
-                'process_info': process_info,
-                'config_status': config_status,
-                'version': self._get_bind_version()
-            }
-            
+            return self.status_cache.get_status()
         except Exception as e:
             logger.error(f"Error getting BIND status: {e}")
             return {'error': str(e)}
     
-    def _get_bind_version(self):
-        """Get BIND9 version"""
-        try:
-            result = subprocess.run(['named', '-v'], 
-                                  capture_output=True, text=True)
-            if result.returncode == 0:
-                return result.stdout.strip()
-            return 'unknown'
-        except:
-            return 'unknown'
-    
-    def _check_bind_config(self):
-        """Check BIND9 configuration"""
-        try:
-            result = subprocess.run(['named-checkconf'], 
-                                  capture_output=True, text=True)
-            return {
-                'valid': result.returncode == 0,
-                'errors': result.stderr.strip() if result.stderr else None
-            }
-        except:
-            return {'valid': False, 'errors': 'Cannot check configuration'}
-    
     def _parse_recent_queries(self):
         """Parse recent DNS queries from logs"""
         try:
             # If in demo mode, return recent queries from demo data
             if self.demo_mode:
                 # Return the most recent 20 queries from demo data
-                recent_queries = list(self.query_history)[-20:]
-                return sorted(recent_queries, key=lambda x: x.get('timestamp', ''), reverse=True)
-            
-            queries = []
+                with self.lock:
+                    return self.query_history.get_recent(20)
             
-            for log_path in self.bind_log_paths:
-                if os.path.exists(log_path):
-                    try:
-                        queries.extend(self._parse_log_file(log_path))
-                    except Exception as e:
-                        logger.warning(f"Error parsing {log_path}: {e}")
-                        continue
+            # Without the background tailer, read whatever is new synchronously
+            if not self.log_tailer.running:
+                self.log_tailer.poll()
             
-            # Sort by timestamp and return most recent
-            queries.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-            return queries[:50]  # Return last 50 queries
+            # Return the most recent of the queries ingested since the last call
+            with self.lock:
+                new_queries = self.query_history.total - self.last_reported_total
+                self.last_reported_total = self.query_history.total
+                return self.query_history.get_recent(min(new_queries, 50))
             
         except Exception as e:
             logger.error(f"Error parsing recent queries: {e}")
             return []
     
-    def _parse_log_file(self, log_path):
-        """Parse a specific log file for DNS queries"""
-        try:
-            queries = []
-            
-            # Get current file position
-            current_pos = self.last_log_position.get(log_path, 0)
-            
-            with open(log_path, 'r') as f:
-                # Seek to last position
-                f.seek(current_pos)
-                
-                # Read new lines
-                new_lines = f.readlines()
-                
-                # Update position
-                self.last_log_position[log_path] = f.tell()
-                
-                # Parse lines
-                for line in new_lines:
-                    query = self._parse_query_line(line)
-                    if query:
-                        queries.append(query)
-                        self.query_history.append(query)
-            
-            return queries
-            
-        except Exception as e:
-            logger.error(f"Error parsing log file {log_path}: {e}")
-            return []
-    
-    def _parse_query_line(self, line):
-        """Parse a single query line"""
-        try:
-            # BIND query log patterns
-            patterns = [
-                # Standard query log format
-                r'(\d{2}-\w{3}-\d{4} \d{2}:\d{2}:\d{2}\.\d{3}).*client (@\S+).*query: (\S+) IN (\S+)',
-                # Alternative format
-                r'(\w{3} \d{2} \d{2}:\d{2}:\d{2}).*named.*client (\S+).*query: (\S+) IN (\S+)',
-                # Syslog format
-                r'(\w{3} \d{2} \d{2}:\d{2}:\d{2}).*named.*client (\S+)#\d+.*query: (\S+) IN (\S+)'
-            ]
-            
-            for pattern in patterns:
-                match = re.search(pattern, line)
-                if match:
-                    timestamp_str, client_ip, domain, query_type = match.groups()
-                    
-                    # Clean up client IP
-                    client_ip = client_ip.replace('@', '').split('#')[0]
-                    
-                    # Parse timestamp
-                    timestamp = self._parse_timestamp(timestamp_str)
-                    
-                    query = {
-                        'timestamp': timestamp,
-                        'client_ip': client_ip,
-                        'domain': domain,
-                        'query_type': query_type,
-                        'raw_line': line.strip()
-                    }
-                    
-                    # Update statistics
-                    self.query_stats[query_type] += 1
-                    
-                    return query
-            
-            return None
-            
-        except Exception as e:
-            logger.error(f"Error parsing query line: {e}")
-            return None
-    
-    def _parse_timestamp(self, timestamp_str):
-        """Parse timestamp from log line"""
-        try:
-            # Try different timestamp formats
-            formats = [
-                '%d-%b-%Y %H:%M:%S.%f',
-                '%b %d %H:%M:%S',
-                '%Y-%m-%d %H:%M:%S'
-            ]
-            
-            for fmt in formats:
-                try:
-                    dt = datetime.strptime(timestamp_str, fmt)
-                    # Add current year for formats without year
-                    if dt.year == 1900:
-                        dt = dt.replace(year=datetime.now().year)
-                    return dt.isoformat()
-                except ValueError:
+    def _ingest_log_lines(self, log_path, lines):
+        """Parse lines delivered by the log tailer"""
+        parser = self.parsers[log_path]
+        raw = self.query_history.keep_raw_lines
+        parse = parser.parse
+        
+        with self.lock:
+            append = self.query_history.append
+            count = self.query_rates.add
+            track = self.heavy_hitters.add
+            for line in lines:
+                parsed = parse(line)
+                if parsed is None:
                     continue
-            
-            # If all formats fail, return current time
-            return datetime.now().isoformat()
-            
-        except Exception as e:
-            logger.error(f"Error parsing timestamp: {e}")
-            return datetime.now().isoformat()
+                timestamp, client_ip, domain, query_type = parsed
+                append(timestamp, client_ip, domain, query_type,
+                       raw_line=line.strip() if raw else None)
+                count(timestamp)
+                track(timestamp, domain, client_ip, query_type)
+                self.query_stats[query_type] += 1
     
-    def _calculate_query_stats(self):
+    def _calculate_query_stats(self, counter_stats=None):
         """Calculate query statistics"""
         try:
-            total_queries = len(self.query_history)
-            
-            # Calculate QPS (queries per second) over last minute
-            now = datetime.now()
-            one_minute_ago = now - timedelta(minutes=1)
-            
-            recent_queries = 0
-            for query in self.query_history:
-                try:
-                    query_time = datetime.fromisoformat(query['timestamp'])
-                    if query_time >= one_minute_ago:
-                        recent_queries += 1
-                except:
-                    continue
+            # Server-side counters include every query, logged or not
+            if counter_stats:
+                return {
+                    'total_queries': counter_stats['totals'].get('opcodes', {}).get('QUERY', 0),
+                    'qps': counter_stats['qps'],
+                    'queries_per_minute': counter_stats['queries_per_minute'],
+                    'queries_per_hour': counter_stats['queries_per_hour'],
+                    'queries_per_day': counter_stats['queries_per_day'],
+                    'source': counter_stats['source']
+                }
             
-            qps = recent_queries / 60.0
-            
-            # Calculate hourly stats
-            one_hour_ago = now - timedelta(hours=1)
-            hourly_queries = 0
-            for query in self.query_history:
-                try:
-                    query_time = datetime.fromisoformat(query['timestamp'])
-                    if query_time >= one_hour_ago:
-                        hourly_queries += 1
-                except:
-                    continue
+            with self.lock:
+                total_queries = len(self.query_history)
+                rates = self.query_rates.get_rates()
             
             return {
                 'total_queries': total_queries,
-                'qps': round(qps, 2),
-                'queries_per_minute': recent_queries,
-                'queries_per_hour': hourly_queries
+                'qps': rates['qps'],
+                'queries_per_minute': rates['queries_per_minute'],
+                'queries_per_hour': rates['queries_per_hour'],
+                'queries_per_day': rates['queries_per_day'],
+                'source': 'query-log'
             }
             
         except Exception as e:
             logger.error(f"Error calculating query stats: {e}")
-            return {'total_queries': 0, 'qps': 0, 'queries_per_minute': 0, 'queries_per_hour': 0}
+            return {'total_queries': 0, 'qps': 0, 'queries_per_minute': 0, 'queries_per_hour': 0,
+                    'queries_per_day': 0}
     
     def _get_response_time_stats(self):
         """Get response time statistics"""
         try:
+            with self.lock:
+                percentiles = self.latency.get_percentiles()
+            
             if not self.response_times:
-                return {'average': 0, 'min': 0, 'max': 0}
+                return {'average': 0, 'min': 0, 'max': 0, 'percentiles': percentiles}
             
             times = list(self.response_times)
             average = round(sum(times) / len(times), 2)
@@ -426,22 +406,33 @@ class DNSMonitor:
             return {
                 'average': average,
                 'min': round(min(times), 2),
-                'max': round(max(times), 2)
+                'max': round(max(times), 2),
+                'percentiles': percentiles
             }
             
         except Exception as e:
             logger.error(f"Error getting response time stats: {e}")
             return {'average': 0, 'min': 0, 'max': 0}
     
-    def _get_query_type_distribution(self):
+    def collect_latency_intervals(self):
+        """Complete 1 minute latency histograms not collected before, as (start epoch, histogram)"""
+        with self.lock:
+            return self.latency.pop_completed()
+    
+    def _get_query_type_distribution(self, counter_stats=None):
         """Get distribution of query types"""
         try:
-            total = sum(self.query_stats.values())
+            if counter_stats:
+                query_stats = counter_stats['totals'].get('qtypes', {})
+            else:
+                with self.lock:
+                    query_stats = dict(self.query_stats)
+            total = sum(query_stats.values())
             if total == 0:
                 return {}
             
             distribution = {}
-            for query_type, count in self.query_stats.items():
+            for query_type, count in query_stats.items():
                 distribution[query_type] = {
                     'count': count,
                     'percentage': round((count / total) * 100, 2)
@@ -454,27 +445,30 @@ class DNSMonitor:
             return {}
     
     def _get_top_domains(self, limit=10):
-        """Get top queried domains"""
+        """Get top queried domains over the last hour"""
         try:
-            domain_counts = defaultdict(int)
-            
-            for query in self.query_history:
-                domain = query.get('domain', '')
-                if domain:
-                    domain_counts[domain] += 1
-            
-            # Sort by count and return top domains
-            sorted_domains = sorted(domain_counts.items(), key=lambda x: x[1], reverse=True)
-            return [{'domain': domain, 'count': count} for domain, count in sorted_domains[:limit]]
+            with self.lock:
+                top = self.heavy_hitters.top('domains', '1h', limit)
+            return [{'domain': domain, 'count': count} for domain, count, _error in top]
             
         except Exception as e:
             logger.error(f"Error getting top domains: {e}")
             return []
     
-    def _get_service_health(self):
+    def get_top(self, window='1h', limit=10):
+        """Get top domains, clients and query type/domain pairs for a window"""
+        with self.lock:
+            return self.heavy_hitters.get_top(window, limit)
+    
+    def _get_service_health(self, bind_status=None, query_stats=None):
         """Get overall DNS service health"""
         try:
-            bind_status = self._get_bind_status()
+            if bind_status is None:
+                bind_status = self._get_bind_status()
+            if query_stats is None:
+                channel_stats = self.stats_collector.get_stats() if self.stats_collector else None
+                named_stats = self.named_stats.get_stats() if self.named_stats else None
+                query_stats = self._calculate_query_stats(channel_stats or named_stats)
             
             health = {
                 'status': 'healthy',
@@ -493,10 +487,9 @@ class DNSMonitor:
                 health['issues'].append('Configuration issues detected')
             
             # Check query load
-            stats = self._calculate_query_stats()
-            if stats.get('qps', 0) > 100:  # High load threshold
+            if query_stats.get('qps', 0) > 100:  # High load threshold
                 health['status'] = 'warning'
-                health['issues'].append(f"High query load: {stats['qps']} QPS")
+                health['issues'].append(f"High query load: {query_stats['qps']} QPS")
             
             return health
             
@@ -507,9 +500,8 @@ class DNSMonitor:
     def get_recent_queries(self, limit=100):
         """Get recent DNS queries"""
         try:
-            queries = list(self.query_history)
-            queries.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-            return queries[:limit]
+            with self.lock:
+                return self.query_history.get_recent(limit)
         except Exception as e:
             logger.error(f"Error getting recent queries: {e}")
             return []
\ No newline at end of file
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Heavy Hitters Module
+Bounded-memory top-N tracking (Space-Saving) over sliding time windows
+"""
+
+import math
+import time
+import heapq
+import logging
+
+logger = logging.getLogger(__name__)
+
+# name -> (slot width in seconds, number of slots)
+WINDOWS = {
+    '1m': (10, 6),
+    '1h': (300, 12),
+    '24h': (3600, 24)
+}
+
+# Width of the slot queries are counted into before being folded into the
+# coarser windows
+FINE_WIDTH = WINDOWS['1m'][0]
+
+DIMENSIONS = ('domains', 'clients', 'type_domains')
+
+
+class SpaceSaving:
+    """Space-Saving summary keeping at most ``capacity`` counters
+
+    Every reported count overestimates the true count by at most its
+    ``error``, and ``error <= total / capacity``. Any key with a true count
+    above ``total / capacity`` is guaranteed to be present.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.total = 0
+        # One (count, key) entry per monitored key; counts may be stale-low
+        self._heap = []
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, key, count=1, error=0):
+        """Count occurrences of a key, ``error`` carries over a prior overestimate"""
+        self.total += count
+        counts = self.counts
+        current = counts.get(key)
+        if current is not None:
+            counts[key] = current + count
+            if error:
+                self.errors[key] += error
+            return
+
+        if len(counts) < self.capacity:
+            counts[key] = count
+            self.errors[key] = error
+            heapq.heappush(self._heap, (count, key))
+            return
+
+        # Replace the minimum counter, refreshing stale heap entries on the way
+        heap = self._heap
+        while True:
+            minimum, victim = heap[0]
+            actual = counts[victim]
+            if actual == minimum:
+                break
+            heapq.heapreplace(heap, (actual, victim))
+
+        del counts[victim]
+        del self.errors[victim]
+        counts[key] = minimum + count
+        self.errors[key] = minimum + error
+        heapq.heapreplace(heap, (minimum + count, key))
+
+    def min_count(self):
+        """Smallest monitored count, the bound for keys that are not monitored"""
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def top(self, limit):
+        """Get the ``limit`` largest (key, count, error) entries"""
+        largest = heapq.nlargest(limit, self.counts.items(), key=lambda item: item[1])
+        return [(key, count, self.errors[key]) for key, count in largest]
+
+    def clear(self):
+        self.counts.clear()
+        self.errors.clear()
+        self._heap = []
+        self.total = 0
+
+
+def merge_summaries(summaries, capacity):
+    """Merge Space-Saving summaries into a new one of the given capacity"""
+    counts = {}
+    errors = {}
+    # Sum of the floors of the summaries each key was found in
+    present = {}
+    total = 0
+    floors = 0
+    for summary in summaries:
+        if not summary.total:
+            continue
+        total += summary.total
+        floor = summary.min_count()
+        floors += floor
+        for key, count in summary.counts.items():
+            counts[key] = counts.get(key, 0) + count
+            errors[key] = errors.get(key, 0) + summary.errors[key]
+            if floor:
+                present[key] = present.get(key, 0) + floor
+
+    # A key missing from a full summary may still have occurred up to its floor
+    if floors:
+        for key in counts:
+            missing = floors - present.get(key, 0)
+            counts[key] += missing
+            errors[key] += missing
+
+    merged = SpaceSaving(capacity)
+    merged.total = total
+    for key, count in heapq.nlargest(capacity, counts.items(), key=lambda item: item[1]):
+        merged.counts[key] = count
+        merged.errors[key] = errors[key]
+    merged._heap = [(count, key) for key, count in merged.counts.items()]
+    heapq.heapify(merged._heap)
+    return merged
+
+
+class SlotRing:
+    """Ring of per-slot summaries covering one window"""
+
+    def __init__(self, width, size, capacity):
+        self.width = width
+        self.size = size
+        self.capacity = capacity
+        self.slots = [SpaceSaving(capacity) for _ in range(size)]
+        self.labels = [-1] * size
+
+    def slot_for(self, timestamp):
+        """Summary for the slot containing timestamp, recycled when stale"""
+        bucket = int(timestamp // self.width)
+        index = bucket % self.size
+        if self.labels[index] != bucket:
+            self.slots[index].clear()
+            self.labels[index] = bucket
+        return self.slots[index]
+
+    def store(self, timestamp, summary):
+        """Put a complete summary in the slot containing timestamp"""
+        bucket = int(timestamp // self.width)
+        index = bucket % self.size
+        self.slots[index] = summary
+        self.labels[index] = bucket
+
+    def live(self, now):
+        """Summaries for the slots inside the window ending at now"""
+        current = int(now // self.width)
+        return [self.slots[i] for i in range(self.size)
+                if current - self.size < self.labels[i] <= current]
+
+
+class HeavyHitterTracker:
+    """Top-N domains, clients and (query type, domain) pairs for 1m/1h/24h
+
+    Queries are counted into a 10 second summary per dimension; when that
+    slot closes it is kept in the 1m ring and folded into the current slot of
+    the 1h and 24h rings, so each query costs three summary updates whatever
+    the number of windows.
+    """
+
+    def __init__(self, epsilon=0.001):
+        self.epsilon = epsilon
+        self.capacity = int(math.ceil(1.0 / epsilon))
+        self.rings = {
+            dimension: {name: SlotRing(width, size, self.capacity)
+                        for name, (width, size) in WINDOWS.items()}
+            for dimension in DIMENSIONS
+        }
+        self.current_bucket = None
+        self.current = {dimension: SpaceSaving(self.capacity) for dimension in DIMENSIONS}
+
+    def add(self, timestamp, domain, client_ip, query_type):
+        """Count one query"""
+        bucket = int(timestamp // FINE_WIDTH)
+        if self.current_bucket is None or bucket > self.current_bucket:
+            self._roll(bucket)
+
+        current = self.current
+        current['domains'].add(domain)
+        current['clients'].add(client_ip)
+        current['type_domains'].add((query_type, domain))
+
+    def _roll(self, bucket):
+        """Close the current fine slot and fold it into the coarser windows"""
+        if self.current_bucket is not None:
+            start = self.current_bucket * FINE_WIDTH
+            for dimension, summary in self.current.items():
+                if not summary.total:
+                    continue
+                rings = self.rings[dimension]
+                rings['1m'].store(start, summary)
+                for name in ('1h', '24h'):
+                    target = rings[name].slot_for(start)
+                    errors = summary.errors
+                    for key, count in summary.counts.items():
+                        target.add(key, count, errors[key])
+
+        self.current_bucket = bucket
+        self.current = {dimension: SpaceSaving(self.capacity) for dimension in DIMENSIONS}
+
+    def top(self, dimension, window='1h', limit=10, now=None):
+        """Get the top ``limit`` (key, count, error) entries for a window"""
+        if window not in WINDOWS:
+            raise ValueError(f"Unknown window: {window}")
+        if now is None:
+            now = time.time()
+
+        bucket = int(now // FINE_WIDTH)
+        if self.current_bucket is not None and bucket > self.current_bucket:
+            self._roll(bucket)
+
+        summaries = self.rings[dimension][window].live(now)
+        summaries.append(self.current[dimension])
+        return merge_summaries(summaries, self.capacity).top(limit)
+
+    def get_top(self, window='1h', limit=10, now=None):
+        """Get top domains, clients and query type/domain pairs for a window"""
+        return {
+            'window': window,
+            'error_bound': self.epsilon,
+            'domains': [
+                {'domain': key, 'count': count, 'error': error}
+                for key, count, error in self.top('domains', window, limit, now)
+            ],
+            'clients': [
+                {'client_ip': key, 'count': count, 'error': error}
+                for key, count, error in self.top('clients', window, limit, now)
+            ],
+            'query_types': [
+                {'query_type': key[0], 'domain': key[1], 'count': count, 'error': error}
+                for key, count, error in self.top('type_domains', window, limit, now)
+            ]
+        }
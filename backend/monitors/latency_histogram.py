@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Latency Histogram Module
+Fixed-memory log-linear (HDR-style) latency histograms over sliding windows
+"""
+
+import math
+import time
+from array import array
+
+# Percentiles reported for every histogram
+PERCENTILES = (('p50', 50.0), ('p90', 90.0), ('p99', 99.0), ('p999', 99.9))
+
+# name -> (ring, number of slots of that ring)
+WINDOWS = {
+    '1m': ('fine', 6),
+    '5m': ('fine', 30),
+    '1h': ('coarse', 60)
+}
+
+
+class LatencyHistogram:
+    """Log-linear histogram of latencies recorded in microseconds
+
+    Values below ``2 ** sub_bucket_bits`` microseconds get a bucket each;
+    above that every power of two is split into ``2 ** (sub_bucket_bits - 1)``
+    linear buckets, so any recorded value is reported within a relative error
+    of ``2 ** -(sub_bucket_bits - 1)`` (1.6% with the default of 7 bits).
+    Values above ``max_value_us`` are clamped into the last bucket. Memory is
+    fixed by the layout and histograms with the same layout merge by adding
+    bucket counts.
+    """
+
+    def __init__(self, sub_bucket_bits=7, max_value_us=60000000):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.max_value_us = max_value_us
+        self.half = 1 << (sub_bucket_bits - 1)
+        self.size = self._index(max_value_us) + 1
+        self.counts = array('Q', [0] * self.size)
+        self.count = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = None
+
+    def _index(self, value):
+        shift = value.bit_length() - self.sub_bucket_bits
+        if shift <= 0:
+            return value
+        return shift * self.half + (value >> shift)
+
+    def _bucket_range(self, index):
+        """(lowest, highest) microsecond value counted in a bucket"""
+        if index < 2 * self.half:
+            return index, index
+        shift = index // self.half - 1
+        lowest = (index - shift * self.half) << shift
+        return lowest, lowest + (1 << shift) - 1
+
+    def record(self, latency_ms, count=1):
+        """Record a latency given in milliseconds"""
+        value = int(latency_ms * 1000) if latency_ms > 0 else 0
+        if value > self.max_value_us:
+            value = self.max_value_us
+        self.counts[self._index(value)] += count
+        self.count += count
+        self.total_us += value * count
+        if self.min_us is None or value < self.min_us:
+            self.min_us = value
+        if self.max_us is None or value > self.max_us:
+            self.max_us = value
+
+    def merge(self, other):
+        """Add another histogram with the same layout into this one"""
+        if (other.sub_bucket_bits, other.max_value_us) != (self.sub_bucket_bits, self.max_value_us):
+            raise ValueError("Cannot merge histograms with different layouts")
+        if not other.count:
+            return self
+        counts = self.counts
+        for index, value in enumerate(other.counts):
+            if value:
+                counts[index] += value
+        self.count += other.count
+        self.total_us += other.total_us
+        if self.min_us is None or other.min_us < self.min_us:
+            self.min_us = other.min_us
+        if self.max_us is None or other.max_us > self.max_us:
+            self.max_us = other.max_us
+        return self
+
+    def clear(self):
+        if self.count:
+            self.counts = array('Q', [0] * self.size)
+        self.count = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = None
+
+    def percentile(self, percent):
+        """Latency in milliseconds at or below which ``percent`` of values fall"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(percent / 100.0 * self.count))
+        seen = 0
+        for index, value in enumerate(self.counts):
+            if value:
+                seen += value
+                if seen >= rank:
+                    lowest, highest = self._bucket_range(index)
+                    middle = (lowest + highest) // 2
+                    return min(max(middle, self.min_us), self.max_us) / 1000.0
+        return self.max_us / 1000.0
+
+    def get_stats(self):
+        """Count, average, min, max and percentiles in milliseconds"""
+        stats = {
+            'count': self.count,
+            'average': round(self.total_us / self.count / 1000.0, 3) if self.count else 0,
+            'min': round(self.min_us / 1000.0, 3) if self.count else 0,
+            'max': round(self.max_us / 1000.0, 3) if self.count else 0
+        }
+        for name, percent in PERCENTILES:
+            stats[name] = round(self.percentile(percent), 3)
+        return stats
+
+    def to_dict(self):
+        """Sparse serializable form, see from_dict"""
+        return {
+            'sub_bucket_bits': self.sub_bucket_bits,
+            'max_value_us': self.max_value_us,
+            'count': self.count,
+            'total_us': self.total_us,
+            'min_us': self.min_us,
+            'max_us': self.max_us,
+            'buckets': [[index, value] for index, value in enumerate(self.counts) if value]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a histogram serialized by to_dict (e.g. by another worker)"""
+        histogram = cls(data['sub_bucket_bits'], data['max_value_us'])
+        for index, value in data['buckets']:
+            histogram.counts[index] = value
+        histogram.count = data['count']
+        histogram.total_us = data['total_us']
+        histogram.min_us = data['min_us']
+        histogram.max_us = data['max_us']
+        return histogram
+
+    def copy(self):
+        histogram = LatencyHistogram(self.sub_bucket_bits, self.max_value_us)
+        return histogram.merge(self)
+
+
+class HistogramRing:
+    """Ring of per-slot histograms, slots are recycled when they go stale"""
+
+    def __init__(self, width, size):
+        self.width = width
+        self.size = size
+        self.slots = [LatencyHistogram() for _ in range(size)]
+        self.labels = [-1] * size
+
+    def slot_for(self, timestamp):
+        bucket = int(timestamp // self.width)
+        index = bucket % self.size
+        if self.labels[index] != bucket:
+            self.slots[index].clear()
+            self.labels[index] = bucket
+        return self.slots[index]
+
+    def merged(self, now, slots):
+        """Histogram of the ``slots`` most recent slots ending with the one containing now"""
+        current = int(now // self.width)
+        histogram = LatencyHistogram()
+        for i in range(self.size):
+            if current - slots < self.labels[i] <= current:
+                histogram.merge(self.slots[i])
+        return histogram
+
+
+class LatencyTracker:
+    """Response time percentiles for 1m/5m/1h windows
+
+    Each latency is recorded into a 10 second slot (30 kept, serving 1m and
+    5m) and a 1 minute slot (60 kept, serving 1h), so recording is two
+    bucket increments whatever the number of windows. Like the rate
+    counters, a window covers the current partial slot plus the complete
+    ones before it. Complete 1 minute histograms can be drained with
+    pop_completed for persistence.
+    """
+
+    def __init__(self):
+        self.rings = {
+            'fine': HistogramRing(10, 30),
+            'coarse': HistogramRing(60, 60)
+        }
+        self.last_completed = None
+
+    def record(self, timestamp, latency_ms):
+        """Record one response time"""
+        for ring in self.rings.values():
+            ring.slot_for(timestamp).record(latency_ms)
+
+    def histogram(self, window='1m', now=None):
+        """Merged histogram for a window"""
+        if window not in WINDOWS:
+            raise ValueError(f"Unknown window {window!r}, expected one of {', '.join(WINDOWS)}")
+        if now is None:
+            now = time.time()
+        ring, slots = WINDOWS[window]
+        return self.rings[ring].merged(now, slots)
+
+    def get_percentiles(self, now=None):
+        """Percentile stats for every window"""
+        if now is None:
+            now = time.time()
+        return {window: self.histogram(window, now).get_stats() for window in WINDOWS}
+
+    def pop_completed(self, now=None):
+        """Complete, non-empty 1 minute histograms not returned before, as (start epoch, histogram)"""
+        if now is None:
+            now = time.time()
+        ring = self.rings['coarse']
+        current = int(now // ring.width)
+        completed = []
+        for i in sorted(range(ring.size), key=lambda i: ring.labels[i]):
+            label = ring.labels[i]
+            if (self.last_completed is None or self.last_completed < label) and \
+                    0 <= label < current and ring.slots[i].count:
+                completed.append((label * ring.width, ring.slots[i].copy()))
+        self.last_completed = current - 1
+        return completed
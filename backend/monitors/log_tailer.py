@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Log Tailer Module
+Follows BIND9 query logs by inode, survives logrotate/truncation and
+delivers complete lines in bounded chunks, woken by inotify when available
+"""
+
+import os
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# inotify event masks (see <sys/inotify.h>)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM |
+              IN_MOVED_TO | IN_CREATE | IN_DELETE)
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class Inotify:
+    """Minimal ctypes wrapper around the Linux inotify API"""
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.watches = {}
+
+    def add_watch(self, directory, mask=WATCH_MASK):
+        """Watch a directory, returns the watch descriptor"""
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), directory)
+        self.watches[wd] = directory
+        return wd
+
+    def read_events(self, timeout):
+        """Wait up to timeout seconds, returns a list of (directory, name, mask)"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+
+        events = []
+        while True:
+            try:
+                buf = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            if not buf:
+                break
+
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(buf):
+                wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(buf, offset)
+                offset += _EVENT_HEADER.size
+                name = buf[offset:offset + length].rstrip(b'\0')
+                offset += length
+                events.append((self.watches.get(wd), os.fsdecode(name), mask))
+
+        return events
+
+    def close(self):
+        """Release the inotify descriptor"""
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class TailedFile:
+    """Read state for a single followed path"""
+
+    def __init__(self, path):
+        self.path = path
+        self.fh = None
+        self.dev = None
+        self.inode = None
+        self.offset = 0
+        self.carry = b''
+        # Opened at the end in the middle of a line: skip its rest
+        self.skip_partial = False
+
+    def close(self):
+        if self.fh:
+            self.fh.close()
+        self.fh = None
+        self.dev = None
+        self.inode = None
+        self.offset = 0
+        self.carry = b''
+        self.skip_partial = False
+
+
+class LogTailer:
+    """Incrementally follows a set of log files and feeds lines to a callback
+
+    The callback is invoked as ``callback(path, lines)`` with at most one
+    chunk worth of decoded lines per call, so consumers see a steady stream
+    instead of a single burst per polling interval.
+    """
+
+    def __init__(self, paths, callback, chunk_size=65536, max_chunks_per_pass=16,
+                 max_line_length=65536, poll_interval=1.0, start_at_end=True,
+                 use_inotify=True):
+        self.paths = list(paths)
+        self.callback = callback
+        self.chunk_size = chunk_size
+        self.max_chunks_per_pass = max_chunks_per_pass
+        self.max_line_length = max_line_length
+        self.poll_interval = poll_interval
+        self.start_at_end = start_at_end
+        self.use_inotify = use_inotify
+
+        self.files = {path: TailedFile(path) for path in self.paths}
+        self.lines_read = 0
+        self.bytes_read = 0
+        self.rotations = 0
+        self.truncations = 0
+
+        self._seen = set()
+        # Paths read from their end when first opened: those existing when
+        # tailing began (start() or the first poll())
+        self._at_end = None
+        self._resume = {}
+        self._lock = threading.RLock()
+        self._inotify = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start following the files in a background thread"""
+        if self.running:
+            return
+
+        self._stop_event.clear()
+        with self._lock:
+            self._note_existing()
+        if self.use_inotify:
+            self._setup_inotify()
+
+        self._thread = threading.Thread(target=self._run, name='log-tailer')
+        self._thread.daemon = True
+        self._thread.start()
+        mode = 'inotify' if self._inotify else 'polling'
+        logger.info(f"Log tailer started ({mode}) for {len(self.paths)} paths")
+
+    def stop(self):
+        """Stop the background thread and close all files"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
+        with self._lock:
+            for state in self.files.values():
+                state.close()
+
+    def poll(self, paths=None):
+        """Read whatever is available, returns the number of lines delivered"""
+        delivered = 0
+        with self._lock:
+            self._note_existing()
+            for path in (paths if paths is not None else self.paths):
+                state = self.files.get(path)
+                if state is None:
+                    continue
+                try:
+                    delivered += self._read_file(state)
+                except OSError as e:
+                    logger.warning(f"Error tailing {path}: {e}")
+                    state.close()
+        return delivered
+
+    def _note_existing(self):
+        """Remember, once, which files exist now; only they start at their end"""
+        if self._at_end is None:
+            self._at_end = {path for path in self.paths if os.path.exists(path)} if self.start_at_end else set()
+
+    def get_positions(self):
+        """Get the (dev, inode, offset) of every open file
+
+        The offset is that of the first byte not yet delivered to the
+        callback, i.e. excluding a trailing partial line. Saved positions of
+        files not reopened yet are passed through unchanged.
+        """
+        with self._lock:
+            positions = dict(self._resume)
+            for path, state in self.files.items():
+                # A line being skipped has no start to resume from yet
+                if state.fh is not None and not state.skip_partial:
+                    positions[path] = {'dev': state.dev, 'inode': state.inode,
+                                       'offset': state.offset - len(state.carry)}
+            return positions
+
+    def set_positions(self, positions):
+        """Resume files from positions saved by get_positions
+
+        Applied when a file is first opened: a file with the same device and
+        inode is read from the saved offset, a different file (rotated while
+        we were not running) from the start.
+        """
+        with self._lock:
+            self._resume = {path: position for path, position in positions.items()
+                            if path in self.files}
+
+    @contextmanager
+    def paused(self):
+        """Hold off deliveries, so positions and whatever the callback has
+        ingested can be read consistently"""
+        with self._lock:
+            yield
+
+    def get_stats(self):
+        """Get tailer counters"""
+        return {
+            'mode': 'inotify' if self._inotify else 'polling',
+            'files_open': sum(1 for state in self.files.values() if state.fh),
+            'lines_read': self.lines_read,
+            'bytes_read': self.bytes_read,
+            'rotations': self.rotations,
+            'truncations': self.truncations
+        }
+
+    def _setup_inotify(self):
+        """Watch the parent directory of each path to catch rotation"""
+        try:
+            self._inotify = Inotify()
+        except (OSError, AttributeError) as e:
+            logger.info(f"inotify unavailable, falling back to polling: {e}")
+            self._inotify = None
+            return
+
+        for directory in sorted({os.path.dirname(path) for path in self.paths}):
+            if not os.path.isdir(directory):
+                continue
+            try:
+                self._inotify.add_watch(directory)
+            except OSError as e:
+                logger.warning(f"Cannot watch {directory}: {e}")
+
+    def _run(self):
+        """Tailer thread main loop"""
+        while not self._stop_event.is_set():
+            try:
+                if self.poll() > 0:
+                    # More data may be pending, keep draining without sleeping
+                    continue
+
+                if self._inotify:
+                    self._wait_for_events()
+                else:
+                    self._stop_event.wait(self.poll_interval)
+
+            except Exception as e:
+                logger.error(f"Error in log tailer loop: {e}")
+                self._stop_event.wait(self.poll_interval)
+
+    def _wait_for_events(self):
+        """Block until a watched directory changes or the poll interval passes"""
+        # Events are only a wake-up signal: the next pass re-reads every path,
+        # which also covers queue overflow and files created under new names
+        self._inotify.read_events(self.poll_interval)
+
+    def _open(self, state, from_start):
+        """Open a path and position it, returns False if it is not readable"""
+        try:
+            fh = open(state.path, 'rb')
+        except OSError:
+            return False
+
+        st = os.fstat(fh.fileno())
+        state.fh = fh
+        state.dev = st.st_dev
+        state.inode = st.st_ino
+        state.carry = b''
+        state.offset = 0 if from_start else st.st_size
+        if state.offset:
+            fh.seek(state.offset - 1)
+            state.skip_partial = fh.read(1) != b'\n'
+        fh.seek(state.offset)
+        return True
+
+    def _seek_resume(self, state, resume):
+        """Position a freshly opened file at a saved offset if it is the same file"""
+        same_file = (resume.get('dev'), resume.get('inode')) == (state.dev, state.inode)
+        size = os.fstat(state.fh.fileno()).st_size
+        if same_file and resume.get('offset', 0) <= size:
+            state.offset = resume['offset']
+        else:
+            logger.info(f"{state.path} changed since the last checkpoint, reading it from the start")
+            state.offset = 0
+        state.skip_partial = False
+        state.fh.seek(state.offset)
+
+    def _read_file(self, state):
+        """Read up to max_chunks_per_pass chunks from one file"""
+        if state.fh is None:
+            # Files that appear after startup (or after rotation) are read from the start
+            first_open = state.path not in self._seen
+            if not self._open(state, from_start=state.path not in self._at_end):
+                return 0
+            self._seen.add(state.path)
+            self._at_end.discard(state.path)
+            resume = self._resume.pop(state.path, None)
+            if first_open and resume:
+                self._seek_resume(state, resume)
+
+        delivered = 0
+        for _ in range(self.max_chunks_per_pass):
+            data = state.fh.read(self.chunk_size)
+            if not data:
+                delivered += self._check_rotation(state)
+                return delivered
+            state.offset += len(data)
+            self.bytes_read += len(data)
+            delivered += self._deliver(state, data)
+
+        return delivered
+
+    def _deliver(self, state, data):
+        """Split a chunk into lines, keeping any trailing partial line"""
+        if state.skip_partial:
+            end = data.find(b'\n')
+            if end < 0:
+                return 0
+            state.skip_partial = False
+            data = data[end + 1:]
+        if state.carry:
+            data = state.carry + data
+        parts = data.split(b'\n')
+        state.carry = parts.pop()
+
+        if len(state.carry) > self.max_line_length:
+            logger.warning(f"Discarding oversized line fragment in {state.path}")
+            state.carry = b''
+
+        if not parts:
+            return 0
+
+        lines = [part.decode('utf-8', errors='replace') for part in parts]
+        self.lines_read += len(lines)
+        self.callback(state.path, lines)
+        return len(lines)
+
+    def _check_rotation(self, state):
+        """At EOF, detect rotation (new inode) or truncation (shrunk file)"""
+        try:
+            st = os.stat(state.path)
+        except FileNotFoundError:
+            # Rotated away and not yet recreated, keep the old handle until it is
+            return 0
+
+        if (st.st_dev, st.st_ino) != (state.dev, state.inode):
+            delivered = self._flush_carry(state)
+            state.close()
+            self.rotations += 1
+            logger.info(f"Log rotation detected for {state.path}")
+            if self._open(state, from_start=True):
+                delivered += self._read_file(state)
+            return delivered
+
+        if st.st_size < state.offset:
+            self.truncations += 1
+            logger.info(f"Log truncation detected for {state.path}")
+            state.carry = b''
+            state.skip_partial = False
+            state.offset = 0
+            state.fh.seek(0)
+
+        return 0
+
+    def _flush_carry(self, state):
+        """Deliver an unterminated last line before leaving a rotated file"""
+        if not state.carry:
+            return 0
+        line = state.carry.decode('utf-8', errors='replace')
+        state.carry = b''
+        self.lines_read += 1
+        self.callback(state.path, [line])
+        return 1
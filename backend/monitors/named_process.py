@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Named Process Module
+Tracks the BIND9 named process through /proc without spawning ps/pgrep
+"""
+
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLK_TCK = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def find_named_pids(proc_root='/proc', name='named'):
+    """Find running processes by scanning /proc/<pid>/comm"""
+    pids = []
+    try:
+        entries = os.listdir(proc_root)
+    except OSError:
+        return pids
+
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(os.path.join(proc_root, entry, 'comm')) as f:
+                if f.read().strip() == name:
+                    pids.append(int(entry))
+        except OSError:
+            continue
+    return sorted(pids)
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def read_ppid(proc_root, pid):
+    """Parent pid from /proc/<pid>/stat, None if the process is gone"""
+    try:
+        data = _read(os.path.join(proc_root, str(pid), 'stat'))
+        return int(data[data.rindex(')') + 2:].split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class NamedProcessTracker:
+    """Locates named once and samples it from /proc/<pid>
+
+    The pid is kept between samples and only re-resolved (by a full /proc
+    scan) when the process exits or the pid is reused, detected through the
+    start time field of /proc/<pid>/stat. ``proc_root`` can point at a fake
+    procfs tree.
+    """
+
+    def __init__(self, proc_root='/proc', name='named'):
+        self.proc_root = proc_root
+        self.name = name
+        self.pid = None
+        self.start_time = None
+        self.mem_total = None
+
+        # Previous (monotonic time, utime + stime ticks) for CPU deltas
+        self._last_cpu = None
+
+    def _path(self, *parts):
+        return os.path.join(self.proc_root, str(self.pid), *parts)
+
+    def _read_stat(self):
+        """Parse /proc/<pid>/stat, returns the fields after the command name"""
+        data = _read(self._path('stat'))
+        # The command name is parenthesised and may contain spaces
+        return data[data.rindex(')') + 2:].split()
+
+    def resolve(self):
+        """Get the named pid, re-scanning /proc only when the tracked one is gone"""
+        if self.pid is not None:
+            try:
+                fields = self._read_stat()
+                # fields[19] is starttime (field 22 of stat)
+                if fields[19] == self.start_time:
+                    return self.pid
+            except (OSError, ValueError, IndexError):
+                pass
+            logger.info(f"{self.name} process {self.pid} exited")
+            self.pid = None
+            self.start_time = None
+            self._last_cpu = None
+
+        pids = find_named_pids(self.proc_root, self.name)
+        if not pids:
+            return None
+
+        # Prefer the parent-most named: the others are its children, whose
+        # pids may be lower once pids wrapped around
+        parents = [pid for pid in pids if read_ppid(self.proc_root, pid) not in pids]
+        self.pid = parents[0] if parents else pids[0]
+        try:
+            self.start_time = self._read_stat()[19]
+        except (OSError, ValueError, IndexError):
+            self.pid = None
+            return None
+        logger.info(f"Tracking {self.name} process {self.pid}")
+        return self.pid
+
+    def sample(self):
+        """Read CPU, memory, thread, fd and I/O figures for the tracked process"""
+        if self.resolve() is None:
+            return {}
+
+        try:
+            fields = self._read_stat()
+            status = self._read_status()
+        except (OSError, ValueError, IndexError):
+            self.pid = None
+            return {}
+
+        ppid = int(fields[1])
+        cpu_ticks = int(fields[11]) + int(fields[12])
+        now = time.monotonic()
+        cpu_percent = 0.0
+        if self._last_cpu is not None:
+            elapsed = now - self._last_cpu[0]
+            if elapsed > 0:
+                cpu_percent = (cpu_ticks - self._last_cpu[1]) / CLK_TCK / elapsed * 100
+        self._last_cpu = (now, cpu_ticks)
+
+        rss = status.get('VmRSS', 0)
+        mem_total = self._get_mem_total()
+        open_fds, sockets = self._count_fds()
+
+        return {
+            'pid': self.pid,
+            'ppid': ppid,
+            'cpu_percent': round(cpu_percent, 2),
+            'memory_percent': round(rss / mem_total * 100, 2) if mem_total else 0,
+            'rss': rss,
+            'threads': status.get('Threads', 0),
+            'open_fds': open_fds,
+            'sockets': sockets,
+            'io': self._read_io(),
+            'command': self._read_cmdline()
+        }
+
+    def _read_status(self):
+        """Numeric fields of /proc/<pid>/status (kB values converted to bytes)"""
+        status = {}
+        for line in _read(self._path('status')).splitlines():
+            key, _, value = line.partition(':')
+            if key in ('VmRSS', 'VmSize', 'Threads'):
+                parts = value.split()
+                number = int(parts[0])
+                status[key] = number * 1024 if len(parts) > 1 and parts[1] == 'kB' else number
+        return status
+
+    def _count_fds(self):
+        """Count open descriptors and how many of them are sockets"""
+        fd_dir = self._path('fd')
+        open_fds = 0
+        sockets = 0
+        try:
+            for fd in os.listdir(fd_dir):
+                open_fds += 1
+                try:
+                    if os.readlink(os.path.join(fd_dir, fd)).startswith('socket:'):
+                        sockets += 1
+                except OSError:
+                    continue
+        except OSError:
+            # fd/ is only readable by the process owner or root
+            return None, None
+        return open_fds, sockets
+
+    def _read_io(self):
+        """read_bytes/write_bytes from /proc/<pid>/io when permitted"""
+        try:
+            io = {}
+            for line in _read(self._path('io')).splitlines():
+                key, _, value = line.partition(':')
+                if key in ('read_bytes', 'write_bytes', 'syscr', 'syscw'):
+                    io[key] = int(value)
+            return io
+        except (OSError, ValueError):
+            return {}
+
+    def _read_cmdline(self):
+        try:
+            return _read(self._path('cmdline')).replace('\0', ' ').strip()
+        except OSError:
+            return ''
+
+    def _get_mem_total(self):
+        """MemTotal in bytes, read once"""
+        if self.mem_total is None:
+            try:
+                for line in _read(os.path.join(self.proc_root, 'meminfo')).splitlines():
+                    if line.startswith('MemTotal:'):
+                        self.mem_total = int(line.split()[1]) * 1024
+                        break
+            except (OSError, ValueError):
+                self.mem_total = 0
+        return self.mem_total
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Named Stats Module
+Triggers `rndc stats` and incrementally parses the newest dump appended to
+named.stats
+"""
+
+import os
+import time
+import subprocess
+import threading
+import logging
+
+from rate_counter import QueryRateCounter
+
+logger = logging.getLogger(__name__)
+
+DUMP_START = b'+++ Statistics Dump +++'
+DUMP_END = b'--- Statistics Dump ---'
+
+# named.stats section title to the group names used by the statistics channel
+SECTION_GROUPS = {
+    'Incoming Requests': 'opcodes',
+    'Incoming Queries': 'qtypes',
+    'Outgoing Rcodes': 'rcodes',
+    'Name Server Statistics': 'nsstats',
+    'Resolver Statistics': 'resolver',
+    'Cache Statistics': 'cachestats',
+    'Socket I/O Statistics': 'sockstats'
+}
+
+DEFAULT_STATS_FILES = [
+    '/var/cache/bind/named.stats',
+    '/var/named/data/named_stats.txt',
+    '/var/named/named.stats'
+]
+
+
+def parse_dump(text):
+    """Parse one statistics dump, returns (dump epoch, {group: {name: count}})"""
+    dump_time = None
+    groups = {}
+    current = None
+
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('+++ Statistics Dump +++'):
+            try:
+                dump_time = int(line.rsplit('(', 1)[1].rstrip(')'))
+            except (IndexError, ValueError):
+                dump_time = None
+            continue
+        if line.startswith('---'):
+            break
+        if line.startswith('++ ') and line.endswith(' ++'):
+            title = line[3:-3].strip()
+            current = groups.setdefault(SECTION_GROUPS.get(title, title), {})
+            continue
+        if line.startswith('['):
+            # [View: ...] / [Common] subsections are summed into the section
+            continue
+        if current is None:
+            continue
+
+        count, _, name = line.partition(' ')
+        try:
+            current[name.strip()] = current.get(name.strip(), 0) + int(count)
+        except ValueError:
+            continue
+
+    return dump_time, groups
+
+
+class NamedStatsReader:
+    """Reads only the newest complete dump from a growing named.stats file
+
+    The byte offset just past the last parsed dump is remembered so each read
+    only covers what was appended since; the very first read scans backwards
+    from the end of the file for the last dump start marker. A file that
+    shrank (rotated or truncated) is read again from the start.
+    """
+
+    def __init__(self, path, block_size=65536):
+        self.path = path
+        self.block_size = block_size
+        self.offset = None
+        self.inode = None
+
+    def read_latest(self):
+        """Get the text of the newest complete dump appended since the last call"""
+        try:
+            with open(self.path, 'rb') as f:
+                st = os.fstat(f.fileno())
+                if st.st_ino != self.inode or (self.offset is not None and st.st_size < self.offset):
+                    self.inode = st.st_ino
+                    self.offset = None
+
+                if self.offset is None:
+                    start = self._find_last_start(f, st.st_size)
+                    if start is None:
+                        return None
+                else:
+                    start = self.offset
+
+                f.seek(start)
+                data = f.read(st.st_size - start)
+        except OSError as e:
+            logger.debug(f"Cannot read {self.path}: {e}")
+            return None
+
+        end = data.rfind(DUMP_END)
+        if end < 0:
+            # The newest dump is still being written
+            return None
+        line_end = data.find(b'\n', end)
+        end = len(data) if line_end < 0 else line_end + 1
+
+        begin = data.rfind(DUMP_START, 0, end)
+        self.offset = start + end
+        if begin < 0:
+            return None
+        return data[begin:end].decode('utf-8', errors='replace')
+
+    def _find_last_start(self, f, size):
+        """Scan backwards in blocks for the last dump start marker"""
+        position = size
+        tail = b''
+        while position > 0:
+            read_size = min(self.block_size, position)
+            position -= read_size
+            f.seek(position)
+            tail = f.read(read_size) + tail
+            index = tail.rfind(DUMP_START)
+            if index >= 0:
+                return position + index
+        return None
+
+
+class NamedStatsCollector:
+    """Runs `rndc stats` on a schedule and computes per-interval deltas
+
+    With ``trigger`` disabled the file is only read, for setups where
+    something else already runs `rndc stats`.
+    """
+
+    def __init__(self, path=None, interval=60.0, trigger=True, rndc='rndc'):
+        if path is None:
+            path = next((p for p in DEFAULT_STATS_FILES if os.path.exists(p)), DEFAULT_STATS_FILES[0])
+        self.reader = NamedStatsReader(path)
+        self.interval = interval
+        self.trigger = trigger
+        self.rndc = rndc
+
+        self.query_rates = QueryRateCounter()
+        self.latest = None
+        self.latest_time = None
+        self.deltas = {}
+        self.elapsed = None
+        self.last_error = None
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """Start the dump/parse schedule in the background"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='named-stats')
+        self._thread.daemon = True
+        self._thread.start()
+        logger.info(f"Reading BIND statistics dumps from {self.reader.path}")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.collect()
+            self._stop_event.wait(self.interval)
+
+    def collect(self):
+        """Trigger a dump (if enabled) and parse it, returns True when a new dump was read"""
+        if self.trigger:
+            try:
+                result = subprocess.run([self.rndc, 'stats'], capture_output=True, text=True, timeout=10)
+                if result.returncode != 0:
+                    self.last_error = result.stderr.strip() or f"rndc exited with {result.returncode}"
+                else:
+                    self.last_error = None
+            except (OSError, subprocess.TimeoutExpired) as e:
+                self.last_error = str(e)
+
+        text = self.reader.read_latest()
+        if text is None:
+            return False
+
+        dump_time, groups = parse_dump(text)
+        self.update(groups, dump_time or time.time())
+        return True
+
+    def update(self, groups, dump_time):
+        """Diff a parsed dump against the previous one"""
+        with self._lock:
+            deltas = {}
+            if self.latest is not None and dump_time > self.latest_time:
+                for group, counters in groups.items():
+                    previous = self.latest.get(group, {})
+                    # A counter going backwards means named restarted
+                    deltas[group] = {
+                        name: value - previous.get(name, 0) if value >= previous.get(name, 0) else value
+                        for name, value in counters.items()
+                    }
+                self.elapsed = dump_time - self.latest_time
+                queries = deltas.get('opcodes', {}).get('QUERY', 0)
+                if queries:
+                    # The dump only tells how many queries came in since the previous one
+                    self.query_rates.add_interval(self.latest_time, dump_time, queries)
+
+            self.latest = groups
+            self.latest_time = dump_time
+            self.deltas = deltas
+
+    def get_stats(self):
+        """Get the newest totals and per-interval deltas, or None before two dumps"""
+        with self._lock:
+            if self.latest is None or not self.deltas or not self.elapsed:
+                return None
+
+            # Windows ending at the newest dump: queries after it are not known yet
+            query_rates = self.query_rates.get_rates(min(self.latest_time, time.time()))
+            rates = {group: {name: round(value / self.elapsed, 2) for name, value in counters.items()}
+                     for group, counters in self.deltas.items()}
+            queries = self.deltas.get('opcodes', {}).get('QUERY', 0)
+            return {
+                'source': 'named-stats',
+                'path': self.reader.path,
+                'dump_time': self.latest_time,
+                'interval': self.elapsed,
+                'qps': rates.get('opcodes', {}).get('QUERY', 0),
+                # The rate of the last interval, which may be longer than a minute
+                'queries_per_minute': round(queries / self.elapsed * 60),
+                'queries_per_hour': query_rates['queries_per_hour'],
+                'queries_per_day': query_rates['queries_per_day'],
+                'totals': {group: dict(counters) for group, counters in self.latest.items()},
+                'deltas': {group: dict(counters) for group, counters in self.deltas.items()},
+                'rates': rates,
+                'last_error': self.last_error
+            }
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Packet Capture Module
+Passive DNS capture (AF_PACKET or pcap replay) matching queries to responses
+to measure per-query latency and rcode
+"""
+
+import socket
+import struct
+import time
+import threading
+import logging
+from collections import OrderedDict, defaultdict
+
+logger = logging.getLogger(__name__)
+
+DNS_PORT = 53
+ETH_P_ALL = 0x0003
+ETH_P_IP = 0x0800
+ETH_P_IPV6 = 0x86DD
+ETH_P_8021Q = 0x8100
+IPPROTO_UDP = 17
+ARPHRD_ETHER = 1
+ARPHRD_LOOPBACK = 772
+PACKET_OUTGOING = 4
+
+# pcap link types
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+
+RCODES = {
+    0: 'NOERROR', 1: 'FORMERR', 2: 'SERVFAIL', 3: 'NXDOMAIN',
+    4: 'NOTIMP', 5: 'REFUSED', 6: 'YXDOMAIN', 7: 'YXRRSET',
+    8: 'NXRRSET', 9: 'NOTAUTH', 10: 'NOTZONE'
+}
+
+QTYPES = {
+    1: 'A', 2: 'NS', 5: 'CNAME', 6: 'SOA', 12: 'PTR', 15: 'MX', 16: 'TXT',
+    28: 'AAAA', 33: 'SRV', 35: 'NAPTR', 43: 'DS', 46: 'RRSIG', 48: 'DNSKEY',
+    64: 'SVCB', 65: 'HTTPS', 255: 'ANY', 257: 'CAA'
+}
+
+_UDP_HEADER = struct.Struct('!HHHH')
+_DNS_HEADER = struct.Struct('!HHHHHH')
+
+
+def decode_udp(frame, linktype=LINKTYPE_ETHERNET):
+    """Extract (src_ip, src_port, dst_ip, dst_port, payload) of a UDP/53 packet, or None"""
+    if linktype == LINKTYPE_ETHERNET:
+        if len(frame) < 14:
+            return None
+        ethertype = (frame[12] << 8) | frame[13]
+        offset = 14
+        if ethertype == ETH_P_8021Q:
+            if len(frame) < 18:
+                return None
+            ethertype = (frame[16] << 8) | frame[17]
+            offset = 18
+    elif linktype == LINKTYPE_LINUX_SLL:
+        if len(frame) < 16:
+            return None
+        ethertype = (frame[14] << 8) | frame[15]
+        offset = 16
+    elif linktype == LINKTYPE_RAW:
+        if not frame:
+            return None
+        version = frame[0] >> 4
+        ethertype = ETH_P_IP if version == 4 else ETH_P_IPV6
+        offset = 0
+    else:
+        return None
+
+    if ethertype == ETH_P_IP:
+        if len(frame) < offset + 20 or frame[offset + 9] != IPPROTO_UDP:
+            return None
+        # Skip non-first fragments
+        if ((frame[offset + 6] & 0x1F) << 8 | frame[offset + 7]) != 0:
+            return None
+        header_length = (frame[offset] & 0x0F) * 4
+        src = socket.inet_ntop(socket.AF_INET, frame[offset + 12:offset + 16])
+        dst = socket.inet_ntop(socket.AF_INET, frame[offset + 16:offset + 20])
+        offset += header_length
+    elif ethertype == ETH_P_IPV6:
+        # Extension headers are not followed: UDP must be the next header
+        if len(frame) < offset + 40 or frame[offset + 6] != IPPROTO_UDP:
+            return None
+        src = socket.inet_ntop(socket.AF_INET6, frame[offset + 8:offset + 24])
+        dst = socket.inet_ntop(socket.AF_INET6, frame[offset + 24:offset + 40])
+        offset += 40
+    else:
+        return None
+
+    if len(frame) < offset + 8:
+        return None
+    src_port, dst_port, _length, _checksum = _UDP_HEADER.unpack_from(frame, offset)
+    if src_port != DNS_PORT and dst_port != DNS_PORT:
+        return None
+    return src, src_port, dst, dst_port, frame[offset + 8:]
+
+
+def decode_dns(payload):
+    """Decode (txid, is_response, rcode, qname, qtype) from a DNS message, or None"""
+    if len(payload) < 12:
+        return None
+    txid, flags, qdcount, _an, _ns, _ar = _DNS_HEADER.unpack_from(payload)
+    is_response = bool(flags & 0x8000)
+    rcode = flags & 0x000F
+
+    qname = ''
+    qtype = None
+    if qdcount:
+        labels = []
+        offset = 12
+        while offset < len(payload):
+            length = payload[offset]
+            if length == 0:
+                offset += 1
+                break
+            if length & 0xC0:
+                # Compression pointers do not occur in the question of a query
+                return txid, is_response, rcode, '', None
+            labels.append(payload[offset + 1:offset + 1 + length].decode('ascii', errors='replace'))
+            offset += 1 + length
+        qname = '.'.join(labels) or '.'
+        if offset + 2 <= len(payload):
+            code = (payload[offset] << 8) | payload[offset + 1]
+            qtype = QTYPES.get(code, f"TYPE{code}")
+
+    return txid, is_response, rcode, qname, qtype
+
+
+def read_pcap(path):
+    """Yield (timestamp, linktype, frame) from a classic libpcap file"""
+    with open(path, 'rb') as f:
+        header = f.read(24)
+        if len(header) < 24:
+            return
+        magic = header[:4]
+        if magic in (b'\xd4\xc3\xb2\xa1', b'\x4d\x3c\xb2\xa1'):
+            endian = '<'
+        elif magic in (b'\xa1\xb2\xc3\xd4', b'\xa1\xb2\x3c\x4d'):
+            endian = '>'
+        else:
+            raise ValueError(f"{path} is not a libpcap file (pcapng is not supported)")
+        nanoseconds = magic in (b'\x4d\x3c\xb2\xa1', b'\xa1\xb2\x3c\x4d')
+        divisor = 1e9 if nanoseconds else 1e6
+        linktype = struct.unpack(endian + 'I', header[20:24])[0] & 0x0FFFFFFF
+
+        record = struct.Struct(endian + 'IIII')
+        while True:
+            data = f.read(16)
+            if len(data) < 16:
+                return
+            seconds, fraction, captured, _original = record.unpack(data)
+            frame = f.read(captured)
+            if len(frame) < captured:
+                return
+            yield seconds + fraction / divisor, linktype, frame
+
+
+def normalize_address(address):
+    """Address in the form decode_udp reports it, ValueError if not an IP address"""
+    address = address.strip().split('%', 1)[0]
+    family = socket.AF_INET6 if ':' in address else socket.AF_INET
+    try:
+        return socket.inet_ntop(family, socket.inet_pton(family, address))
+    except OSError:
+        raise ValueError(f"{address!r} is not an IP address")
+
+
+def local_addresses(proc_root='/proc'):
+    """Addresses of this host's interfaces, from the local routes in
+    /proc/net/fib_trie and from /proc/net/if_inet6"""
+    addresses = set()
+    try:
+        with open(f"{proc_root}/net/fib_trie") as f:
+            address = None
+            for line in f:
+                line = line.strip()
+                if line.startswith('|--'):
+                    address = line[3:].strip()
+                elif line == '/32 host LOCAL' and address:
+                    addresses.add(address)
+    except OSError:
+        pass
+    try:
+        with open(f"{proc_root}/net/if_inet6") as f:
+            for line in f:
+                fields = line.split()
+                if fields:
+                    addresses.add(socket.inet_ntop(socket.AF_INET6, bytes.fromhex(fields[0])))
+    except (OSError, ValueError):
+        pass
+    return addresses
+
+
+class PendingQueries:
+    """Bounded table of queries waiting for a response
+
+    Keyed by (client ip, client port, txid). When full, or when a query has
+    waited longer than ``timeout`` seconds, the oldest entries are evicted and
+    counted as unanswered.
+    """
+
+    def __init__(self, capacity=65536, timeout=5.0):
+        self.capacity = capacity
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.unanswered = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, key, timestamp, qname, qtype):
+        if key in self.entries:
+            # Retransmission with the same id: measure from the latest attempt
+            del self.entries[key]
+        self.entries[key] = (timestamp, qname, qtype)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.unanswered += 1
+
+    def pop(self, key):
+        return self.entries.pop(key, None)
+
+    def expire(self, now):
+        """Drop queries older than the timeout"""
+        entries = self.entries
+        cutoff = now - self.timeout
+        while entries:
+            key, (timestamp, _qname, _qtype) = next(iter(entries.items()))
+            if timestamp >= cutoff:
+                break
+            entries.popitem(last=False)
+            self.unanswered += 1
+
+
+class DNSPacketCapture:
+    """Matches captured DNS queries and responses into per-query results
+
+    ``callback`` receives a dict with timestamp, client_ip, domain,
+    query_type, rcode and latency_ms for every answered query. Only DNS over
+    UDP is measured; TCP and fragmented responses are ignored.
+
+    Only queries to ``server_addresses`` and their responses are measured,
+    so a resolver's own queries to upstream servers are left out. Live
+    capture defaults to the addresses of this host's interfaces, re-read
+    every minute; a replay without addresses measures every query.
+    """
+
+    def __init__(self, callback, interface=None, capacity=65536, timeout=5.0, server_addresses=None,
+                 proc_root='/proc'):
+        self.callback = callback
+        self.interface = interface
+        self.pending = PendingQueries(capacity, timeout)
+        self.configured_addresses = None
+        if server_addresses is not None:
+            self.configured_addresses = frozenset(normalize_address(address) for address in server_addresses
+                                                  if address.strip())
+        self.server_addresses = self.configured_addresses
+        self.proc_root = proc_root
+        self.packets = 0
+        self.queries = 0
+        self.upstream = 0
+        self.matched = 0
+        self.unmatched_responses = 0
+        self.rcodes = defaultdict(int)
+
+        self._last_expire = 0.0
+        self._addresses_read = 0.0
+        self._lock = threading.Lock()
+        self._socket = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def process(self, timestamp, frame, linktype=LINKTYPE_ETHERNET):
+        """Feed one captured frame"""
+        self.packets += 1
+        udp = decode_udp(frame, linktype)
+        if udp is None:
+            return
+        src, src_port, dst, dst_port, payload = udp
+        dns = decode_dns(payload)
+        if dns is None:
+            return
+        txid, is_response, rcode, qname, qtype = dns
+
+        result = None
+        servers = self.server_addresses
+        with self._lock:
+            if servers is not None and (dst if not is_response else src) not in servers:
+                # Traffic of other servers, such as named's own queries upstream
+                self.upstream += 1
+            elif not is_response and dst_port == DNS_PORT:
+                self.queries += 1
+                self.pending.add((src, src_port, txid), timestamp, qname, qtype)
+            elif is_response and src_port == DNS_PORT:
+                query = self.pending.pop((dst, dst_port, txid))
+                if query is None:
+                    self.unmatched_responses += 1
+                else:
+                    self.matched += 1
+                    rcode_name = RCODES.get(rcode, str(rcode))
+                    self.rcodes[rcode_name] += 1
+                    query_time, query_name, query_type = query
+                    result = {
+                        'timestamp': timestamp,
+                        'client_ip': dst,
+                        'domain': query_name,
+                        'query_type': query_type,
+                        'rcode': rcode_name,
+                        'latency_ms': (timestamp - query_time) * 1000.0
+                    }
+
+            if timestamp - self._last_expire >= 1.0:
+                self.pending.expire(timestamp)
+                self._last_expire = timestamp
+
+        if result is not None:
+            self.callback(result)
+
+    def replay(self, path):
+        """Process a pcap file with its original timestamps, returns the stats"""
+        for timestamp, linktype, frame in read_pcap(path):
+            self.process(timestamp, frame, linktype)
+        return self.get_stats()
+
+    def start(self):
+        """Start live capture on an AF_PACKET socket (needs CAP_NET_RAW)"""
+        self._socket = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        if self.interface:
+            self._socket.bind((self.interface, 0))
+        self._socket.settimeout(1.0)
+        self._refresh_addresses()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='dns-capture')
+        self._thread.daemon = True
+        self._thread.start()
+        logger.info(f"Capturing DNS traffic on {self.interface or 'all interfaces'}")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._socket:
+            self._socket.close()
+            self._socket = None
+
+    def _refresh_addresses(self):
+        """Measure queries to this host's current addresses, unless configured"""
+        if self.configured_addresses is None:
+            self.server_addresses = frozenset(local_addresses(self.proc_root)) or None
+        self._addresses_read = time.monotonic()
+
+    def _run(self):
+        recv = self._socket.recvfrom
+        while not self._stop_event.is_set():
+            if time.monotonic() - self._addresses_read >= 60:
+                self._refresh_addresses()
+            try:
+                frame, address = recv(65535)
+            except socket.timeout:
+                continue
+            except OSError as e:
+                logger.error(f"Capture socket error: {e}")
+                break
+            _ifname, _proto, pkttype, hatype = address[:4]
+            if hatype == ARPHRD_LOOPBACK and pkttype == PACKET_OUTGOING:
+                # Loopback traffic is seen twice, once per direction
+                continue
+            # Ethernet and loopback frames carry an Ethernet header, tun devices do not
+            linktype = LINKTYPE_ETHERNET if hatype in (ARPHRD_ETHER, ARPHRD_LOOPBACK) else LINKTYPE_RAW
+            self.process(time.time(), frame, linktype)
+
+    def get_stats(self):
+        """Get capture counters"""
+        with self._lock:
+            return {
+                'packets': self.packets,
+                'queries': self.queries,
+                'upstream': self.upstream,
+                'matched': self.matched,
+                'pending': len(self.pending),
+                'unanswered': self.pending.unanswered,
+                'unmatched_responses': self.unmatched_responses,
+                'rcodes': dict(self.rcodes)
+            }
+
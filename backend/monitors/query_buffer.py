@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Query Buffer Module
+Columnar, array-backed ring buffer holding recent DNS queries
+"""
+
+import math
+import logging
+from array import array
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class StringInterner:
+    """Maps repeated strings (domains, query types, clients) to small integer ids
+
+    Each id counts the rows referencing it. A string is forgotten when its
+    last row is released, and its id is reused.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+        self.refs = array('L')
+        self.free = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def intern(self, value):
+        """Get the id of a string for one more row, assigning a new one on first sight"""
+        ident = self.ids.get(value)
+        if ident is None:
+            if self.free:
+                ident = self.free.pop()
+                self.strings[ident] = value
+                self.refs[ident] = 1
+            else:
+                ident = len(self.strings)
+                self.strings.append(value)
+                self.refs.append(1)
+            self.ids[value] = ident
+        else:
+            self.refs[ident] += 1
+        return ident
+
+    def release(self, ident):
+        """Drop one row's reference to an id"""
+        refs = self.refs[ident] - 1
+        self.refs[ident] = refs
+        if not refs:
+            del self.ids[self.strings[ident]]
+            self.strings[ident] = None
+            self.free.append(ident)
+
+    def lookup(self, ident):
+        return self.strings[ident]
+
+
+class QueryRingBuffer:
+    """Fixed-capacity ring of recent queries stored column by column
+
+    Each query costs a float timestamp, three 32-bit string ids and a 32-bit
+    response time (~24 bytes) instead of a dict of strings. Raw log lines are
+    only kept when ``keep_raw_lines`` is set. An overwritten row releases
+    its interned strings, so memory stays bounded by the capacity rather than
+    by the number of distinct names ever seen.
+
+    Every query gets a sequence number, one more than the previous query's,
+    starting after ``seq_base``. Consumers that persist queries remember the
+    last sequence number they stored and ask for everything after it, so
+    each query is delivered exactly once.
+    """
+
+    def __init__(self, capacity=1000000, keep_raw_lines=False):
+        self.capacity = capacity
+        self.keep_raw_lines = keep_raw_lines
+
+        self.timestamps = array('d')
+        self.domain_ids = array('I')
+        self.type_ids = array('I')
+        self.client_ids = array('I')
+        self.response_times = array('f')
+        self.raw_lines = [] if keep_raw_lines else None
+
+        self.domains = StringInterner()
+        self.query_types = StringInterner()
+        self.clients = StringInterner()
+
+        # Index of the next slot to overwrite once the ring is full
+        self.head = 0
+        # Number of queries ever appended
+        self.total = 0
+        # Sequence number of the query before the first one appended
+        self.seq_base = 0
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def last_seq(self):
+        """Sequence number of the newest query"""
+        return self.seq_base + self.total
+
+    def append(self, timestamp, client_ip, domain, query_type, response_time=None, raw_line=None):
+        """Add a query, overwriting the oldest one when full"""
+        rt = math.nan if response_time is None else response_time
+        domain_id = self.domains.intern(domain)
+        type_id = self.query_types.intern(query_type)
+        client_id = self.clients.intern(client_ip)
+
+        if len(self.timestamps) < self.capacity:
+            self.timestamps.append(timestamp)
+            self.domain_ids.append(domain_id)
+            self.type_ids.append(type_id)
+            self.client_ids.append(client_id)
+            self.response_times.append(rt)
+            if self.raw_lines is not None:
+                self.raw_lines.append(raw_line)
+        else:
+            i = self.head
+            # Interned before releasing, so a repeated name keeps its id
+            self.domains.release(self.domain_ids[i])
+            self.query_types.release(self.type_ids[i])
+            self.clients.release(self.client_ids[i])
+            self.timestamps[i] = timestamp
+            self.domain_ids[i] = domain_id
+            self.type_ids[i] = type_id
+            self.client_ids[i] = client_id
+            self.response_times[i] = rt
+            if self.raw_lines is not None:
+                self.raw_lines[i] = raw_line
+            self.head = (i + 1) % self.capacity
+
+        self.total += 1
+
+    def _newest_index(self):
+        """Slot of the most recently appended query"""
+        if len(self.timestamps) < self.capacity:
+            return len(self.timestamps) - 1
+        return (self.head - 1) % self.capacity
+
+    def iter_indexes(self, limit=None):
+        """Yield slot indexes from newest to oldest"""
+        size = len(self.timestamps)
+        count = size if limit is None else min(limit, size)
+        i = self._newest_index()
+        for _ in range(count):
+            yield i
+            i = i - 1 if i > 0 else size - 1
+
+    def get_query(self, i, seq=None):
+        """Build the API dict for one slot"""
+        rt = self.response_times[i]
+        query = {
+            'seq': seq,
+            'timestamp': datetime.fromtimestamp(self.timestamps[i]).astimezone().isoformat(),
+            'client_ip': self.clients.lookup(self.client_ids[i]),
+            'domain': self.domains.lookup(self.domain_ids[i]),
+            'query_type': self.query_types.lookup(self.type_ids[i]),
+            'response_time': None if math.isnan(rt) else round(rt, 2)
+        }
+        if self.raw_lines is not None:
+            query['raw_line'] = self.raw_lines[i]
+        return query
+
+    def get_recent(self, limit=100):
+        """Get the most recent queries, newest first"""
+        seq = self.last_seq
+        return [self.get_query(i, seq - n) for n, i in enumerate(self.iter_indexes(limit))]
+
+    def get_since(self, seq):
+        """Get the queries with a sequence number above seq, oldest first
+
+        Returns (queries, missed) where missed counts the queries after seq
+        that were already overwritten.
+        """
+        wanted = max(0, self.last_seq - seq)
+        available = min(wanted, len(self))
+        queries = self.get_recent(available)
+        queries.reverse()
+        return queries, wanted - available
+
+    def count_since(self, cutoff):
+        """Count queries with a timestamp >= cutoff, scanning back from the newest
+
+        Queries are appended in log order, so the scan stops at the first
+        older entry.
+        """
+        timestamps = self.timestamps
+        count = 0
+        for i in self.iter_indexes():
+            if timestamps[i] < cutoff:
+                break
+            count += 1
+        return count
+
+    def memory_usage(self):
+        """Approximate bytes held by the columns (excluding interned strings)"""
+        size = sum(col.itemsize * len(col) for col in (
+            self.timestamps, self.domain_ids, self.type_ids, self.client_ids, self.response_times))
+        if self.raw_lines is not None:
+            size += sum(len(line) for line in self.raw_lines if line)
+        return size
+
+    def get_stats(self):
+        """Get buffer statistics"""
+        return {
+            'capacity': self.capacity,
+            'size': len(self),
+            'total_appended': self.total,
+            'distinct_domains': len(self.domains),
+            'distinct_clients': len(self.clients),
+            'column_bytes': self.memory_usage()
+        }
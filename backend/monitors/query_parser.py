@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Query Parser Module
+Single-pass parser for BIND9 query log lines with per-file format detection
+"""
+
+import re
+import time
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+MONTHS = {
+    'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+    'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12
+}
+
+# Timestamp layouts found at the start of query log lines
+FORMAT_BIND = 'bind'        # 17-Oct-2026 10:00:00.123 (named "queries" channel)
+FORMAT_SYSLOG = 'syslog'    # Oct 17 10:00:00 host named[123]: ...
+FORMAT_ISO = 'iso'          # 2026-10-17T10:00:00.123456+00:00 host named[123]: ...
+
+FORMAT_PATTERNS = (
+    (FORMAT_BIND, re.compile(r'\d{2}-[A-Z][a-z]{2}-\d{4} \d{2}:\d{2}:\d{2}')),
+    (FORMAT_SYSLOG, re.compile(r'[A-Z][a-z]{2} [ \d]\d \d{2}:\d{2}:\d{2}')),
+    (FORMAT_ISO, re.compile(r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}')),
+)
+
+QUERY_MARKER = ' query: '
+CLIENT_MARKER = 'client '
+
+
+class QueryLineParser:
+    """Parses query log lines from one file
+
+    The timestamp layout is detected from the first recognisable line and then
+    read at fixed offsets; query fields are located with ``str.find``/``split``
+    instead of regular expressions. ``parse`` returns a tuple of
+    ``(epoch_seconds, client_ip, domain, query_type)`` or ``None``.
+    """
+
+    def __init__(self):
+        self.format = None
+        self.lines_parsed = 0
+        self.lines_skipped = 0
+
+        # One-entry timestamp cache: consecutive lines share the same second
+        self._ts_key = None
+        self._ts_base = 0.0
+
+    def detect_format(self, line):
+        """Detect the timestamp layout of a line, returns the format name or None"""
+        for name, pattern in FORMAT_PATTERNS:
+            if pattern.match(line):
+                return name
+        return None
+
+    def parse_lines(self, lines):
+        """Parse a batch of lines, returns the list of parsed queries"""
+        parse = self.parse
+        parsed = []
+        for line in lines:
+            query = parse(line)
+            if query is not None:
+                parsed.append(query)
+        return parsed
+
+    def parse(self, line):
+        """Parse a single query line"""
+        idx = line.find(QUERY_MARKER)
+        if idx < 0:
+            self.lines_skipped += 1
+            return None
+
+        # "<domain> IN <type> <flags> ..."
+        fields = line[idx + 8:].split(' ', 3)
+        if len(fields) < 3 or fields[1] != 'IN':
+            self.lines_skipped += 1
+            return None
+
+        # "client [@0x7f...] <ip>#<port> [(<name>)]: query: ..."
+        cidx = line.rfind(CLIENT_MARKER, 0, idx)
+        if cidx < 0:
+            self.lines_skipped += 1
+            return None
+        client = line[cidx + 7:idx].split(' ', 2)
+        token = client[1] if client[0].startswith('@') and len(client) > 1 else client[0]
+        client_ip = token.split('#', 1)[0].rstrip(':')
+
+        timestamp = self._parse_timestamp(line)
+
+        self.lines_parsed += 1
+        return (timestamp, client_ip, fields[0], fields[2])
+
+    def _parse_timestamp(self, line):
+        """Read the timestamp at the detected fixed offsets"""
+        fmt = self.format
+        if fmt is None or not self._matches_layout(fmt, line):
+            fmt = self.detect_format(line)
+            if fmt is None:
+                return time.time()
+            if self.format != fmt:
+                logger.debug(f"Detected {fmt} query log format")
+                self.format = fmt
+
+        try:
+            if fmt == FORMAT_BIND:
+                base = self._cached_base(line[:20], self._bind_base)
+                if line[20:21] == '.':
+                    return base + int(line[21:24]) / 1000.0
+                return base
+
+            if fmt == FORMAT_SYSLOG:
+                return self._cached_base(line[:15], self._syslog_base)
+
+            end = line.find(' ', 19) if line[10:11] == ' ' else line.find(' ')
+            token = line[:end] if end > 0 else line
+            fraction = ''
+            tail = token[19:]
+            if tail.startswith('.'):
+                end = 1
+                while end < len(tail) and tail[end].isdigit():
+                    end += 1
+                fraction = tail[:end]
+                tail = tail[end:]
+            base = self._cached_base(token[:19] + tail, self._iso_base)
+            return base + float(fraction) if len(fraction) > 1 else base
+
+        except (ValueError, KeyError, OverflowError):
+            return time.time()
+
+    @staticmethod
+    def _matches_layout(fmt, line):
+        """Cheap positional check that a line still has the detected layout"""
+        if fmt == FORMAT_BIND:
+            return line[2:3] == '-' and line[6:7] == '-' and line[11:12] == ' '
+        if fmt == FORMAT_SYSLOG:
+            return line[3:4] == ' ' and line[6:7] == ' ' and line[9:10] == ':'
+        return line[4:5] == '-' and line[7:8] == '-' and line[13:14] == ':'
+
+    def _cached_base(self, key, convert):
+        """Epoch seconds for a whole-second timestamp key"""
+        if key != self._ts_key:
+            self._ts_base = convert(key)
+            self._ts_key = key
+        return self._ts_base
+
+    @staticmethod
+    def _bind_base(key):
+        # 17-Oct-2026 10:00:00
+        return time.mktime((int(key[7:11]), MONTHS[key[3:6]], int(key[0:2]),
+                            int(key[12:14]), int(key[15:17]), int(key[18:20]),
+                            0, 0, -1))
+
+    def _syslog_base(self, key):
+        # Oct 17 10:00:00 (no year: use the current one, or last year for
+        # December lines read in January)
+        month = MONTHS[key[0:3]]
+        now = datetime.now()
+        year = now.year
+        if month > now.month + 1:
+            year -= 1
+        return time.mktime((year, month, int(key[4:6]),
+                            int(key[7:9]), int(key[10:12]), int(key[13:15]),
+                            0, 0, -1))
+
+    @staticmethod
+    def _iso_base(key):
+        # 2026-10-17T10:00:00[+00:00]
+        return datetime.fromisoformat(key.replace(' ', 'T', 1)).timestamp()
+
+    def get_stats(self):
+        """Get parser counters"""
+        return {
+            'format': self.format,
+            'lines_parsed': self.lines_parsed,
+            'lines_skipped': self.lines_skipped
+        }
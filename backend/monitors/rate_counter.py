@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rate Counter Module
+Time-bucketed sliding window counters for query rates
+"""
+
+import math
+import time
+from array import array
+
+
+class BucketRing:
+    """Ring of fixed-width time buckets with a running total
+
+    Bucket ``b`` holds events whose timestamp satisfies
+    ``b * width <= ts < (b + 1) * width``. The window at time ``now`` is the
+    ``size`` most recent buckets, i.e. the current (partial) bucket plus the
+    ``size - 1`` complete ones before it, so it spans between
+    ``(size - 1) * width`` and ``size * width`` seconds. Events older than
+    the window are ignored; adding and reading are O(1) amortised.
+    """
+
+    def __init__(self, width, size):
+        self.width = width
+        self.size = size
+        self.counts = array('q', [0] * size)
+        self.labels = array('q', [-1] * size)
+        self.newest = -1
+        self.total = 0
+
+    def _advance(self, bucket):
+        """Expire buckets that fall out of the window ending at bucket"""
+        if bucket <= self.newest:
+            return
+        if bucket - self.newest >= self.size:
+            for i in range(self.size):
+                self.counts[i] = 0
+                self.labels[i] = -1
+            self.total = 0
+        else:
+            for b in range(self.newest + 1, bucket + 1):
+                slot = b % self.size
+                self.total -= self.counts[slot]
+                self.counts[slot] = 0
+                self.labels[slot] = b
+        self.newest = bucket
+
+    def add(self, timestamp, count=1):
+        """Count events at a timestamp"""
+        bucket = int(timestamp // self.width)
+        self._advance(bucket)
+        if bucket <= self.newest - self.size:
+            return
+        slot = bucket % self.size
+        if self.labels[slot] != bucket:
+            self.labels[slot] = bucket
+        self.counts[slot] += count
+        self.total += count
+
+    def add_interval(self, start, end, count):
+        """Count events spread evenly over [start, end)"""
+        if end <= start:
+            self.add(end, count)
+            return
+        duration = end - start
+        first = int(start // self.width)
+        last = int(math.ceil(end / self.width)) - 1
+        # Buckets before the window ending at ``end`` would be ignored anyway
+        first = max(first, last - self.size + 1)
+        # Rounded cumulative shares, so the bucket counts add up to ``count``
+        added = round(count * (max(first * self.width, start) - start) / duration)
+        for bucket in range(first, last + 1):
+            share = round(count * (min((bucket + 1) * self.width, end) - start) / duration)
+            if share > added:
+                self.add(bucket * self.width, share - added)
+                added = share
+
+    def sum(self, now=None):
+        """Total events in the window ending at now"""
+        if now is None:
+            now = time.time()
+        self._advance(int(now // self.width))
+        return self.total
+
+    def series(self, now=None):
+        """Per-bucket counts, oldest first, for the window ending at now"""
+        if now is None:
+            now = time.time()
+        current = int(now // self.width)
+        self._advance(current)
+        values = []
+        for b in range(current - self.size + 1, current + 1):
+            slot = b % self.size
+            values.append(self.counts[slot] if self.labels[slot] == b else 0)
+        return values
+
+
+class QueryRateCounter:
+    """Per-second (60s), per-minute (60m) and per-hour (24h) query counters
+
+    Updated once per ingested query; every read is constant time regardless
+    of query volume. See BucketRing for the exact window semantics: e.g.
+    ``per_minute`` counts the current second plus the 59 before it.
+    """
+
+    def __init__(self):
+        self.seconds = BucketRing(1, 60)
+        self.minutes = BucketRing(60, 60)
+        self.hours = BucketRing(3600, 24)
+
+    def add(self, timestamp, count=1):
+        """Record queries seen at a timestamp
+
+        A timestamp ahead of the clock (a skewed log line) is counted as now,
+        so it cannot move the windows forward and expire the current counts.
+        """
+        now = time.time()
+        if timestamp > now:
+            timestamp = now
+        self.seconds.add(timestamp, count)
+        self.minutes.add(timestamp, count)
+        self.hours.add(timestamp, count)
+
+    def add_interval(self, start, end, count):
+        """Record queries spread evenly over [start, end), clamped to now as in ``add``"""
+        now = time.time()
+        end = min(end, now)
+        start = min(start, end)
+        self.seconds.add_interval(start, end, count)
+        self.minutes.add_interval(start, end, count)
+        self.hours.add_interval(start, end, count)
+
+    def get_rates(self, now=None):
+        """Get per-minute, per-hour and per-day counts plus QPS over the last minute"""
+        if now is None:
+            now = time.time()
+        per_minute = self.seconds.sum(now)
+        return {
+            'qps': round(per_minute / 60.0, 2),
+            'queries_per_minute': per_minute,
+            'queries_per_hour': self.minutes.sum(now),
+            'queries_per_day': self.hours.sum(now)
+        }
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Statistics Channel Module
+Polls BIND9 statistics-channels (JSON v1 / XML v3) and turns cumulative
+counters into rates
+"""
+
+import json
+import time
+import threading
+import logging
+import urllib.error
+import urllib.request
+import xml.etree.ElementTree as ET
+
+from rate_counter import QueryRateCounter
+
+logger = logging.getLogger(__name__)
+
+# Counter groups that are cumulative and get converted to rates
+COUNTER_GROUPS = ('opcodes', 'rcodes', 'qtypes', 'nsstats', 'sockstats', 'resolver', 'cachestats')
+
+# XML v3 <counters type="..."> to normalized group
+XML_SERVER_COUNTERS = {
+    'opcode': 'opcodes',
+    'rcode': 'rcodes',
+    'qtype': 'qtypes',
+    'nsstat': 'nsstats',
+    'sockstat': 'sockstats'
+}
+XML_VIEW_COUNTERS = {
+    'resstats': 'resolver',
+    'cachestats': 'cachestats'
+}
+
+
+def _add_counters(target, counters):
+    for name, value in counters.items():
+        try:
+            target[name] = target.get(name, 0) + int(value)
+        except (TypeError, ValueError):
+            continue
+
+
+def parse_json_stats(document):
+    """Normalize a /json/v1 statistics document"""
+    data = json.loads(document) if isinstance(document, (str, bytes)) else document
+    stats = {group: {} for group in COUNTER_GROUPS}
+    for group in ('opcodes', 'rcodes', 'qtypes', 'nsstats', 'sockstats'):
+        _add_counters(stats[group], data.get(group, {}))
+
+    # Resolver and cache statistics are per view, summed here
+    for view in data.get('views', {}).values():
+        resolver = view.get('resolver', {})
+        _add_counters(stats['resolver'], resolver.get('stats', {}))
+        _add_counters(stats['cachestats'], resolver.get('cachestats', {}))
+
+    memory = data.get('memory', {})
+    stats['memory'] = {key: value for key, value in memory.items() if isinstance(value, int)}
+    stats['boot_time'] = data.get('boot-time')
+    stats['config_time'] = data.get('config-time')
+    return stats
+
+
+def parse_xml_stats(document):
+    """Normalize a /xml/v3 statistics document"""
+    root = ET.fromstring(document)
+    stats = {group: {} for group in COUNTER_GROUPS}
+
+    server = root.find('server')
+    if server is not None:
+        for counters in server.findall('counters'):
+            group = XML_SERVER_COUNTERS.get(counters.get('type'))
+            if group:
+                _add_counters(stats[group], {c.get('name'): c.text for c in counters.findall('counter')})
+        stats['boot_time'] = server.findtext('boot-time')
+        stats['config_time'] = server.findtext('config-time')
+
+    for view in root.findall('views/view'):
+        for counters in view.findall('counters'):
+            group = XML_VIEW_COUNTERS.get(counters.get('type'))
+            if group:
+                _add_counters(stats[group], {c.get('name'): c.text for c in counters.findall('counter')})
+
+    stats['memory'] = {}
+    summary = root.find('memory/summary')
+    if summary is not None:
+        for item in summary:
+            try:
+                stats['memory'][item.tag] = int(item.text)
+            except (TypeError, ValueError):
+                continue
+    return stats
+
+
+class StatsChannelCollector:
+    """Polls a BIND9 statistics channel and keeps counter rates
+
+    ``fmt`` is ``json``, ``xml`` or ``auto`` (JSON first, falling back to XML
+    for servers built without JSON support). Rates are per second over the
+    last poll interval; a counter that goes backwards (named restarted or
+    statistics reset) restarts its baseline instead of producing a negative
+    rate. Query counts are also accumulated into a QueryRateCounter so
+    per-minute/hour figures are available without query logging.
+
+    Once the last successful poll is older than ``stale_after`` seconds
+    (three intervals by default) no stats are reported, rather than the
+    rates of the last poll.
+    """
+
+    def __init__(self, url='http://127.0.0.1:8053', fmt='auto', interval=5.0, timeout=2.0, stale_after=None):
+        self.url = url.rstrip('/')
+        self.fmt = fmt
+        self.interval = interval
+        self.timeout = timeout
+        self.stale_after = stale_after if stale_after is not None else 3 * interval
+
+        self.query_rates = QueryRateCounter()
+        self.latest = None
+        self.rates = {}
+        self.last_error = None
+        self.polls = 0
+
+        self._previous = None
+        self._previous_time = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """Start polling in the background"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='stats-channel')
+        self._thread.daemon = True
+        self._thread.start()
+        logger.info(f"Polling BIND statistics channel at {self.url}")
+
+    def stop(self):
+        """Stop polling"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.poll()
+            self._stop_event.wait(self.interval)
+
+    def fetch(self):
+        """Download and normalize one statistics document"""
+        if self.fmt in ('json', 'auto'):
+            try:
+                return parse_json_stats(self._get('/json/v1'))
+            except (urllib.error.HTTPError, ValueError) as e:
+                # Not found or not JSON: named was built without JSON support
+                if self.fmt == 'json':
+                    raise
+                logger.debug(f"JSON statistics unavailable, trying XML: {e}")
+                self.fmt = 'xml'
+        return parse_xml_stats(self._get('/xml/v3'))
+
+    def _get(self, path):
+        with urllib.request.urlopen(self.url + path, timeout=self.timeout) as response:
+            return response.read()
+
+    def poll(self):
+        """Fetch a sample and update rates, returns False on failure"""
+        try:
+            stats = self.fetch()
+        except Exception as e:
+            if self.last_error != str(e):
+                logger.warning(f"Error polling statistics channel {self.url}: {e}")
+            self.last_error = str(e)
+            return False
+
+        self.update(stats, time.time())
+        self.last_error = None
+        return True
+
+    def update(self, stats, now):
+        """Diff a normalized sample against the previous one"""
+        with self._lock:
+            self.polls += 1
+            previous = self._previous
+            if previous is not None and previous.get('boot_time') != stats.get('boot_time'):
+                # named restarted: counters started again from zero
+                previous = None
+
+            rates = {}
+            if previous is not None:
+                elapsed = now - self._previous_time
+                for group in COUNTER_GROUPS:
+                    group_rates = {}
+                    for name, value in stats[group].items():
+                        delta = max(0, value - previous[group].get(name, 0))
+                        group_rates[name] = round(delta / elapsed, 2) if elapsed > 0 else 0
+                        if group == 'opcodes' and name == 'QUERY' and delta:
+                            self.query_rates.add_interval(self._previous_time, now, delta)
+                    rates[group] = group_rates
+
+            self._previous = stats
+            self._previous_time = now
+            self.latest = stats
+            self.rates = rates
+
+    def get_stats(self, now=None):
+        """Get the latest totals and rates, or None before the first two
+        samples and once polls have failed for ``stale_after`` seconds"""
+        if now is None:
+            now = time.time()
+        with self._lock:
+            if self.latest is None or not self.rates or now - self._previous_time > self.stale_after:
+                return None
+
+            query_rates = self.query_rates.get_rates(now)
+            return {
+                'source': 'statistics-channel',
+                'url': self.url,
+                'format': self.fmt,
+                'qps': self.rates['opcodes'].get('QUERY', 0),
+                'queries_per_minute': query_rates['queries_per_minute'],
+                'queries_per_hour': query_rates['queries_per_hour'],
+                'queries_per_day': query_rates['queries_per_day'],
+                'totals': {group: dict(self.latest[group]) for group in COUNTER_GROUPS},
+                'rates': {group: dict(values) for group, values in self.rates.items()},
+                'memory': dict(self.latest.get('memory', {})),
+                'boot_time': self.latest.get('boot_time'),
+                'config_time': self.latest.get('config_time'),
+                'last_error': self.last_error
+            }
@@ -7,39 +7,102 @@ Collects real-time system information including CPU, memory, disk, network stats
 
 import psutil
 import time
+import threading
 import logging
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Static data (CPU count and frequency range, boot time, interfaces) is
+# refreshed this often, in seconds, by get_system_stats
+STATIC_INTERVAL = 60
+
+# Calls of get_system_stats closer together than this share one sample, so
+# readers don't shorten the CPU measurement windows
+MIN_SAMPLE_INTERVAL = 0.5
+
 class SystemMonitor:
-    def __init__(self):
+    """Samples system statistics without blocking
+
+    CPU usage is the change in ``cpu_times`` since the previous sample, and
+    per-process usage comes from ``psutil.Process`` handles kept between
+    samples, so each has a baseline (a process is listed from its second
+    sample on).
+
+    The ``collect_*`` methods each gather the part of the payload that
+    changes at one rate, for a scheduler to run at their own intervals;
+    ``build_stats`` assembles their latest results. ``get_system_stats``
+    does both at once, refreshing static data every ``static_interval``.
+    """
+
+    def __init__(self, static_interval=STATIC_INTERVAL):
+        self.static_interval = static_interval
+        self.static = {}
+        self.static_updated = None
         self.boot_time = psutil.boot_time()
+        
         self.last_network_io = psutil.net_io_counters()
         self.last_disk_io = psutil.disk_io_counters()
-        self.last_check_time = time.time()
+        self.last_check_time = time.monotonic()
+        
+        # (total, idle) cpu_times of the previous sample
+        self._last_cpu = None
+        self.cpu_percent = 0.0
+        
+        # pid -> {'process', 'create_time', 'name', 'username'}
+        self._processes = {}
+        
+        self._last_stats = None
+        self._sample_time = None
+        self._lock = threading.Lock()
+        
+        # Baselines, so the first sample already covers the time since start
+        self._get_cpu_percent()
+        self._get_top_processes()
         
     def get_system_stats(self):
         """Get comprehensive system statistics"""
+        with self._lock:
+            if self._last_stats is not None and time.monotonic() - self._sample_time < MIN_SAMPLE_INTERVAL:
+                return self._last_stats
+        
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
         try:
-            current_time = time.time()
+            if self.static_updated is None or time.monotonic() - self.static_updated >= self.static_interval:
+                self.collect_static()
+            stats = self.build_stats(self.collect_usage(), self.collect_disk(), self.collect_processes())
+            stats['collection'].update({
+                'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+                'cpu_ms': round((time.thread_time() - cpu_started) * 1000, 3)
+            })
+        except Exception as e:
+            logger.error(f"Error getting system stats: {e}")
+            return {'error': str(e)}
+        
+        with self._lock:
+            self._last_stats = stats
+            self._sample_time = time.monotonic()
+        return stats
+    
+    def collect_usage(self):
+        """CPU, memory, swap, I/O counters, network speeds and load"""
+        with self._lock:
+            current_time = time.monotonic()
             
             # CPU information
-            cpu_percent = psutil.cpu_percent(interval=0.1)
-            cpu_count = psutil.cpu_count()
+            cpu_percent = self._get_cpu_percent()
             cpu_freq = psutil.cpu_freq()
             
             # Memory information
             memory = psutil.virtual_memory()
             swap = psutil.swap_memory()
             
-            # Disk information
-            disk_usage = psutil.disk_usage('/')
+            # Disk I/O information
             disk_io = psutil.disk_io_counters()
             
             # Network information
             network_io = psutil.net_io_counters()
-            network_interfaces = self._get_network_interfaces()
             
             # Calculate network speeds
             time_delta = current_time - self.last_check_time
@@ -48,28 +111,14 @@ class SystemMonitor:
             # System load
             load_avg = psutil.getloadavg()
             
-            # System uptime
-            uptime = current_time - self.boot_time
-            
-            # Process information
-            processes = self._get_top_processes()
-            
             # Update last values
             self.last_network_io = network_io
             self.last_disk_io = disk_io
             self.last_check_time = current_time
             
             return {
-                'timestamp': datetime.now().isoformat(),
-                'cpu': {
-                    'percent': cpu_percent,
-                    'count': cpu_count,
-                    'frequency': {
-                        'current': cpu_freq.current if cpu_freq else 0,
-                        'min': cpu_freq.min if cpu_freq else 0,
-                        'max': cpu_freq.max if cpu_freq else 0
-                    }
-                },
+                'cpu_percent': cpu_percent,
+                'cpu_frequency': cpu_freq.current if cpu_freq else 0,
                 'memory': {
                     'total': memory.total,
                     'available': memory.available,
@@ -85,46 +134,109 @@ class SystemMonitor:
                     'free': swap.free,
                     'percent': swap.percent
                 },
-                'disk': {
-                    'total': disk_usage.total,
-                    'used': disk_usage.used,
-                    'free': disk_usage.free,
-                    'percent': disk_usage.percent,
-                    'io': {
-                        'read_bytes': disk_io.read_bytes if disk_io else 0,
-                        'write_bytes': disk_io.write_bytes if disk_io else 0,
-                        'read_count': disk_io.read_count if disk_io else 0,
-                        'write_count': disk_io.write_count if disk_io else 0
-                    }
+                'disk_io': {
+                    'read_bytes': disk_io.read_bytes if disk_io else 0,
+                    'write_bytes': disk_io.write_bytes if disk_io else 0,
+                    'read_count': disk_io.read_count if disk_io else 0,
+                    'write_count': disk_io.write_count if disk_io else 0
                 },
                 'network': {
                     'bytes_sent': network_io.bytes_sent,
                     'bytes_recv': network_io.bytes_recv,
                     'packets_sent': network_io.packets_sent,
                     'packets_recv': network_io.packets_recv,
-                    'speed': network_speeds,
-                    'interfaces': network_interfaces
+                    'speed': network_speeds
                 },
                 'load_average': {
                     '1min': load_avg[0],
                     '5min': load_avg[1],
                     '15min': load_avg[2]
-                },
-                'uptime': {
-                    'seconds': uptime,
-                    'boot_time': self.boot_time
-                },
-                'processes': processes
+                }
             }
-            
-        except Exception as e:
-            logger.error(f"Error getting system stats: {e}")
-            return {'error': str(e)}
+    
+    def collect_disk(self):
+        """Usage of the root file system"""
+        disk_usage = psutil.disk_usage('/')
+        return {
+            'total': disk_usage.total,
+            'used': disk_usage.used,
+            'free': disk_usage.free,
+            'percent': disk_usage.percent
+        }
+    
+    def collect_processes(self):
+        """Top processes by CPU usage since the previous call"""
+        with self._lock:
+            return self._get_top_processes()
+    
+    def collect_static(self):
+        """CPU count and frequency range, boot time and network interfaces"""
+        with self._lock:
+            self._refresh_static(time.monotonic())
+            return self.static
+    
+    def build_stats(self, usage, disk, processes):
+        """Assemble the system payload from the latest collected parts"""
+        static = self.static
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'cpu': {
+                'percent': usage['cpu_percent'],
+                'count': static.get('cpu_count'),
+                'frequency': {
+                    'current': usage['cpu_frequency'],
+                    'min': static.get('cpu_freq_min', 0),
+                    'max': static.get('cpu_freq_max', 0)
+                }
+            },
+            'memory': usage['memory'],
+            'swap': usage['swap'],
+            'disk': dict(disk, io=usage['disk_io']),
+            'network': dict(usage['network'], interfaces=static.get('interfaces', {})),
+            'load_average': usage['load_average'],
+            'uptime': {
+                'seconds': time.time() - self.boot_time,
+                'boot_time': self.boot_time
+            },
+            'processes': processes,
+            'collection': {
+                'processes_tracked': len(self._processes),
+                'static_age': round(time.monotonic() - self.static_updated, 1) if self.static_updated else None
+            }
+        }
+    
+    def _refresh_static(self, now):
+        """Re-read the rarely changing values"""
+        cpu_freq = psutil.cpu_freq()
+        self.static = {
+            'cpu_count': psutil.cpu_count(),
+            'cpu_freq_min': cpu_freq.min if cpu_freq else 0,
+            'cpu_freq_max': cpu_freq.max if cpu_freq else 0,
+            'interfaces': self._get_network_interfaces()
+        }
+        self.boot_time = psutil.boot_time()
+        self.static_updated = now
+    
+    def _get_cpu_percent(self):
+        """System-wide CPU usage since the previous call, from cpu_times deltas"""
+        times = psutil.cpu_times()
+        # As psutil.cpu_percent: iowait counts as idle, guest time is already
+        # part of user time
+        idle = times.idle + getattr(times, 'iowait', 0)
+        total = sum(times) - getattr(times, 'guest', 0) - getattr(times, 'guest_nice', 0)
+        if self._last_cpu is not None:
+            total_delta = total - self._last_cpu[0]
+            if total_delta > 0:
+                busy = 1 - (idle - self._last_cpu[1]) / total_delta
+                self.cpu_percent = round(min(max(busy * 100, 0.0), 100.0), 1)
+        self._last_cpu = (total, idle)
+        return self.cpu_percent
     
     def _get_network_interfaces(self):
         """Get network interface information"""
         try:
             interfaces = {}
+            if_stats = psutil.net_if_stats()
             for name, addrs in psutil.net_if_addrs().items():
                 interfaces[name] = {
                     'addresses': [],
@@ -140,16 +252,14 @@ class SystemMonitor:
                     })
                 
                 # Get interface statistics
-                try:
-                    stats = psutil.net_if_stats()[name]
+                stats = if_stats.get(name)
+                if stats:
                     interfaces[name]['stats'] = {
                         'isup': stats.isup,
                         'duplex': stats.duplex,
                         'speed': stats.speed,
                         'mtu': stats.mtu
                     }
-                except:
-                    pass
                     
             return interfaces
         except Exception as e:
@@ -174,14 +284,31 @@ class SystemMonitor:
             return {'upload': 0, 'download': 0}
     
     def _get_top_processes(self, limit=10):
-        """Get top processes by CPU usage"""
+        """Get top processes by CPU usage since the previous call"""
         try:
             processes = []
-            for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent', 'username']):
+            tracked = {}
+            for pid in psutil.pids():
                 try:
-                    processes.append(proc.info)
+                    entry = self._processes.get(pid)
+                    if entry is not None:
+                        proc = entry['process']
+                        with proc.oneshot():
+                            # A changed start time means the pid was reused
+                            if proc.create_time() == entry['create_time']:
+                                processes.append({
+                                    'pid': pid,
+                                    'name': entry['name'],
+                                    'cpu_percent': proc.cpu_percent(None),
+                                    'memory_percent': proc.memory_percent(),
+                                    'username': entry['username']
+                                })
+                                tracked[pid] = entry
+                                continue
+                    tracked[pid] = self._track_process(pid)
                 except (psutil.NoSuchProcess, psutil.AccessDenied):
                     pass
+            self._processes = tracked
             
             # Sort by CPU usage
             processes.sort(key=lambda x: x.get('cpu_percent', 0), reverse=True)
@@ -190,10 +317,27 @@ class SystemMonitor:
             logger.error(f"Error getting top processes: {e}")
             return []
     
-    def get_system_health(self):
-        """Get overall system health status"""
+    def _track_process(self, pid):
+        """Handle of a newly seen process with its static details and CPU baseline"""
+        proc = psutil.Process(pid)
+        with proc.oneshot():
+            try:
+                username = proc.username()
+            except (psutil.AccessDenied, KeyError):
+                username = None
+            entry = {
+                'process': proc,
+                'create_time': proc.create_time(),
+                'name': proc.name(),
+                'username': username
+            }
+            proc.cpu_percent(None)
+        return entry
+    
+    def get_system_health(self, stats=None):
+        """Get overall system health status, of ``stats`` or a new sample"""
         try:
-            stats = self.get_system_stats()
+            stats = stats or self.get_system_stats()
             
             # Define health thresholds
             health_status = {
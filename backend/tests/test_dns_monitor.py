@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DNS Monitor Tests
+Service health judged on the same query rate as the rest of the stats
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'monitors'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'utils'))
+
+from dns_monitor import DNSMonitor
+
+RUNNING = {'process_running': True, 'config_status': {'valid': True}}
+
+
+class FakeCounters:
+    """get_stats of a statistics channel collector seeing ``qps`` queries per second"""
+
+    def __init__(self, qps):
+        self.qps = qps
+
+    def get_stats(self):
+        return {
+            'source': 'statistics-channel',
+            'qps': self.qps,
+            'queries_per_minute': self.qps * 60,
+            'queries_per_hour': self.qps * 3600,
+            'queries_per_day': self.qps * 86400,
+            'totals': {'opcodes': {'QUERY': 1000000}, 'qtypes': {'A': 1000000}}
+        }
+
+
+class FakeStatusCache:
+
+    def get_status(self):
+        return RUNNING
+
+
+class ServiceHealthTest(unittest.TestCase):
+
+    def setUp(self):
+        self.monitor = DNSMonitor(history_size=1000)
+        self.monitor.status_cache = FakeStatusCache()
+
+    def test_high_server_side_rate_is_reported(self):
+        self.monitor.stats_collector = FakeCounters(qps=500)
+        stats = self.monitor.get_dns_stats()
+        self.assertEqual(stats['query_stats']['source'], 'statistics-channel')
+        self.assertEqual(stats['service_health']['status'], 'warning')
+        self.assertEqual(stats['service_health']['issues'], ['High query load: 500 QPS'])
+
+    def test_health_without_query_stats_uses_the_counters(self):
+        self.monitor.stats_collector = FakeCounters(qps=500)
+        health = self.monitor._get_service_health(RUNNING)
+        self.assertEqual(health['issues'], ['High query load: 500 QPS'])
+
+    def test_low_server_side_rate_is_healthy(self):
+        self.monitor.stats_collector = FakeCounters(qps=20)
+        stats = self.monitor.get_dns_stats()
+        self.assertEqual(stats['service_health'], {'status': 'healthy', 'issues': []})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON Delta Tests
+Deltas of newest-first lists, and patching them back
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'utils'))
+
+from json_delta import diff, patch
+
+
+class JSONDeltaTest(unittest.TestCase):
+
+    def assert_round_trip(self, old, new):
+        delta = diff(old, new)
+        self.assertEqual(patch(old, delta), new)
+        return delta
+
+    def test_items_added_at_the_front(self):
+        old = {'queries': [{'id': 3}, {'id': 2}, {'id': 1}, {'id': 0}]}
+        new = {'queries': [{'id': 5}, {'id': 4}, {'id': 3}, {'id': 2}, {'id': 1}]}
+        delta = self.assert_round_trip(old, new)
+        self.assertEqual(delta, {'h': {'queries': [[{'id': 5}, {'id': 4}], 3]}})
+
+    def test_list_mostly_new_is_sent_whole(self):
+        old = {'queries': [3, 2, 1]}
+        new = {'queries': [6, 5, 4, 3]}
+        self.assertEqual(self.assert_round_trip(old, new), {'s': {'queries': [6, 5, 4, 3]}})
+        # As many new items as kept ones
+        new = {'queries': [5, 4, 3, 2]}
+        self.assertEqual(self.assert_round_trip(old, new), {'s': {'queries': [5, 4, 3, 2]}})
+
+    def test_other_list_changes_are_sent_whole(self):
+        old = {'queries': [3, 2, 1]}
+        self.assertEqual(self.assert_round_trip(old, {'queries': [4, 3, 1]}), {'s': {'queries': [4, 3, 1]}})
+        self.assertEqual(self.assert_round_trip({'queries': []}, {'queries': [1]}), {'s': {'queries': [1]}})
+        # True == 1, but the types differ
+        self.assertEqual(self.assert_round_trip({'flags': [1, 0]}, {'flags': [2, True, 0]}),
+                         {'s': {'flags': [2, True, 0]}})
+
+    def test_nested_and_removed_keys(self):
+        old = {'system': {'cpu': {'percent': 5.0}, 'uptime': 10}, 'gone': 1}
+        new = {'system': {'cpu': {'percent': 7.5}, 'uptime': 10}}
+        self.assertEqual(self.assert_round_trip(old, new),
+                         {'p': {'system': {'p': {'cpu': {'s': {'percent': 7.5}}}}}, 'd': ['gone']})
+        self.assertEqual(diff(new, new), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
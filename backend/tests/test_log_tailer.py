@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Log Tailer Tests
+Where files are first read from, depending on whether they existed at startup
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'monitors'))
+
+from log_tailer import LogTailer
+
+
+class LogTailerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.lines = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def write(self, name, text, mode='a'):
+        with open(self.path(name), mode) as f:
+            f.write(text)
+
+    def tailer(self, *names):
+        return LogTailer([self.path(name) for name in names],
+                         lambda path, lines: self.lines.extend(lines), use_inotify=False)
+
+    def test_existing_file_starts_at_end(self):
+        self.write('query.log', 'old 1\nold 2\n')
+        tailer = self.tailer('query.log')
+        tailer.poll()
+        self.write('query.log', 'new 1\n')
+        tailer.poll()
+        self.assertEqual(self.lines, ['new 1'])
+
+    def test_partial_last_line_is_skipped(self):
+        self.write('query.log', 'old 1\nold pa')
+        tailer = self.tailer('query.log')
+        tailer.poll()
+        self.assertNotIn(self.path('query.log'), tailer.get_positions())
+        self.write('query.log', 'rtial\nnew 1\n')
+        tailer.poll()
+        self.assertEqual(self.lines, ['new 1'])
+
+    def test_file_created_later_is_read_from_start(self):
+        tailer = self.tailer('query.log')
+        tailer.poll()
+        self.write('query.log', 'first\nsecond\nthi')
+        tailer.poll()
+        self.write('query.log', 'rd\n')
+        tailer.poll()
+        self.assertEqual(self.lines, ['first', 'second', 'third'])
+
+    def test_start_at_end_disabled(self):
+        self.write('query.log', 'old 1\n')
+        tailer = LogTailer([self.path('query.log')], lambda path, lines: self.lines.extend(lines),
+                           start_at_end=False, use_inotify=False)
+        tailer.poll()
+        self.assertEqual(self.lines, ['old 1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
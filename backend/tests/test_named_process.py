@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Named Process Tests
+Samples of the named process read from the fake procfs tree in fixtures/procfs
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'monitors'))
+
+import named_process
+from named_process import NamedProcessTracker, find_named_pids
+
+FIXTURE_PROCFS = os.path.join(os.path.dirname(__file__), 'fixtures', 'procfs')
+
+
+class NamedProcessTest(unittest.TestCase):
+
+    def setUp(self):
+        # A copy, so tests can make processes exit or use CPU
+        self.directory = tempfile.mkdtemp()
+        self.proc_root = os.path.join(self.directory, 'proc')
+        shutil.copytree(FIXTURE_PROCFS, self.proc_root, symlinks=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def set_stat_field(self, pid, index, value):
+        """Replace field ``index`` (counted after the command name) of /proc/<pid>/stat"""
+        path = os.path.join(self.proc_root, str(pid), 'stat')
+        with open(path) as f:
+            data = f.read()
+        head, _, tail = data.rpartition(') ')
+        fields = tail.split()
+        fields[index] = str(value)
+        with open(path, 'w') as f:
+            f.write(f"{head}) {' '.join(fields)}\n")
+
+    def test_find_named_pids(self):
+        self.assertEqual(find_named_pids(self.proc_root), [1234, 1240])
+        self.assertEqual(find_named_pids(self.proc_root, '(sd-pam)'), [2001])
+        self.assertEqual(find_named_pids(os.path.join(self.directory, 'missing')), [])
+
+    def test_sample(self):
+        tracker = NamedProcessTracker(self.proc_root)
+        sample = tracker.sample()
+        self.assertEqual(tracker.start_time, '4321')
+        self.assertEqual(sample, {
+            'pid': 1234,
+            'ppid': 1,
+            'cpu_percent': 0.0,
+            'memory_percent': round(20480 / 8048576 * 100, 2),
+            'rss': 20480 * 1024,
+            'threads': 9,
+            'open_fds': 4,
+            'sockets': 2,
+            'io': {'read_bytes': 4096000, 'write_bytes': 1228800, 'syscr': 8841, 'syscw': 2210},
+            'command': '/usr/sbin/named -f -u bind'
+        })
+
+    def test_cpu_percent_from_utime_and_stime(self):
+        tracker = NamedProcessTracker(self.proc_root)
+        with mock.patch.object(named_process.time, 'monotonic', side_effect=[100.0, 102.0]):
+            tracker.sample()
+            # utime 150 -> 250 and stime 75 -> 125 ticks over 2 seconds
+            self.set_stat_field(1234, 11, 250)
+            self.set_stat_field(1234, 12, 125)
+            sample = tracker.sample()
+        self.assertEqual(sample['cpu_percent'], round(150 / named_process.CLK_TCK / 2 * 100, 2))
+
+    def test_exited_process_is_replaced(self):
+        tracker = NamedProcessTracker(self.proc_root)
+        self.assertEqual(tracker.resolve(), 1234)
+        shutil.rmtree(os.path.join(self.proc_root, '1234'))
+        sample = tracker.sample()
+        self.assertEqual(sample['pid'], 1240)
+        self.assertEqual(sample['ppid'], 1234)
+        self.assertEqual(tracker.start_time, '4400')
+
+    def test_parent_is_preferred_over_a_child_with_a_lower_pid(self):
+        # A worker forked after the pids wrapped around
+        shutil.copytree(os.path.join(self.proc_root, '1240'), os.path.join(self.proc_root, '1100'))
+        self.assertEqual(find_named_pids(self.proc_root), [1100, 1234, 1240])
+        tracker = NamedProcessTracker(self.proc_root)
+        self.assertEqual(tracker.resolve(), 1234)
+        self.assertEqual(tracker.start_time, '4321')
+
+    def test_reused_pid_is_detected_by_start_time(self):
+        tracker = NamedProcessTracker(self.proc_root)
+        tracker.sample()
+        self.assertIsNotNone(tracker._last_cpu)
+        self.set_stat_field(1234, 19, 9000)
+        self.assertEqual(tracker.resolve(), 1234)
+        self.assertEqual(tracker.start_time, '9000')
+        self.assertIsNone(tracker._last_cpu)
+
+    def test_parenthesised_command_and_missing_files(self):
+        # No io, fd or cmdline for this process
+        tracker = NamedProcessTracker(self.proc_root, name='(sd-pam)')
+        sample = tracker.sample()
+        self.assertEqual(sample['pid'], 2001)
+        self.assertEqual(sample['ppid'], 1)
+        self.assertEqual(tracker.start_time, '900')
+        self.assertEqual(sample['rss'], 7200 * 1024)
+        self.assertEqual(sample['threads'], 1)
+        self.assertEqual((sample['open_fds'], sample['sockets']), (None, None))
+        self.assertEqual(sample['io'], {})
+        self.assertEqual(sample['command'], '')
+
+
+if __name__ == '__main__':
+    unittest.main()
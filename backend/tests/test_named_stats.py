@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Named Stats Tests
+Rates of successive `rndc stats` dumps from fixtures/named_stats
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'monitors'))
+
+from named_stats import NamedStatsCollector, parse_dump
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'named_stats')
+
+
+def load_dump(name):
+    with open(os.path.join(FIXTURES, name)) as f:
+        return parse_dump(f.read())
+
+
+class NamedStatsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.collector = NamedStatsCollector(os.path.join(FIXTURES, 'named.stats'), trigger=False)
+
+    def feed(self, name):
+        dump_time, groups = load_dump(name)
+        self.collector.update(groups, dump_time)
+        return dump_time
+
+    def test_parse_dump(self):
+        dump_time, groups = load_dump('dump_1.txt')
+        self.assertEqual(dump_time, 1700000000)
+        self.assertEqual(groups['opcodes'], {'QUERY': 15000, 'NOTIFY': 4})
+        self.assertEqual(groups['qtypes'], {'A': 11000, 'AAAA': 3000, 'PTR': 1000})
+        self.assertEqual(groups['rcodes'], {'NOERROR': 14000, 'NXDOMAIN': 1000})
+        # Views are summed into their section
+        self.assertEqual(groups['cachestats'], {'cache hits': 7510})
+        self.assertEqual(groups['resolver']['IPv4 queries sent'], 640)
+        self.assertEqual(groups['Outgoing Queries'], {'A': 512, 'AAAA': 128})
+
+    def test_rates_between_two_dumps(self):
+        self.feed('dump_1.txt')
+        self.assertIsNone(self.collector.get_stats())
+        self.feed('dump_2.txt')
+        stats = self.collector.get_stats()
+        self.assertEqual(stats['interval'], 300)
+        self.assertEqual(stats['qps'], 10.0)
+        self.assertEqual(stats['queries_per_minute'], 600)
+        self.assertEqual(stats['queries_per_hour'], 3000)
+        self.assertEqual(stats['queries_per_day'], 3000)
+        self.assertEqual(stats['deltas']['qtypes'], {'A': 2100, 'AAAA': 600, 'PTR': 300})
+        self.assertEqual(stats['rates']['qtypes'], {'A': 7.0, 'AAAA': 2.0, 'PTR': 1.0})
+        self.assertEqual(stats['deltas']['opcodes']['NOTIFY'], 0)
+        self.assertEqual(stats['totals']['opcodes']['QUERY'], 18000)
+
+    def test_queries_are_spread_over_the_interval(self):
+        self.feed('dump_1.txt')
+        dump_time = self.feed('dump_2.txt')
+        # Every second of the interval got its share, not only the dump's
+        seconds = self.collector.query_rates.seconds.series(dump_time - 1)
+        self.assertEqual(seconds, [10] * 60)
+        minutes = self.collector.query_rates.minutes.series(dump_time - 1)
+        self.assertEqual(sum(minutes), 3000)
+        self.assertLessEqual(max(minutes), 600)
+
+    def test_named_restart(self):
+        self.feed('dump_1.txt')
+        self.feed('dump_2.txt')
+        # Counters went back to zero in between, so the new values are the deltas
+        self.feed('restart.txt')
+        stats = self.collector.get_stats()
+        self.assertEqual(stats['deltas']['opcodes'], {'QUERY': 600, 'NOTIFY': 0})
+        self.assertEqual(stats['deltas']['qtypes'], {'A': 440, 'AAAA': 120, 'PTR': 40})
+        self.assertEqual(stats['qps'], 2.0)
+        self.assertEqual(stats['queries_per_minute'], 120)
+        self.assertEqual(stats['queries_per_hour'], 3600)
+        self.assertEqual(stats['queries_per_day'], 3600)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Packet Capture Tests
+Generated DNS frames written to a pcap file and replayed through the matcher
+"""
+
+import os
+import sys
+import socket
+import struct
+import shutil
+import tempfile
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'monitors'))
+
+from packet_capture import (DNSPacketCapture, decode_udp, local_addresses, LINKTYPE_ETHERNET,
+                            LINKTYPE_LINUX_SLL, LINKTYPE_RAW, ETH_P_IP, ETH_P_IPV6, ETH_P_8021Q, IPPROTO_UDP)
+
+FIXTURE_PROCFS = os.path.join(os.path.dirname(__file__), 'fixtures', 'procfs')
+
+SERVER = '192.0.2.53'
+SERVER6 = '2001:db8::53'
+UPSTREAM = '198.51.100.1'
+
+
+def dns_message(txid, qname, qtype, response=False, rcode=0):
+    """DNS message with one question (qtype as a number)"""
+    flags = (0x8180 if response else 0x0100) | rcode
+    question = b''.join(bytes([len(label)]) + label.encode('ascii') for label in qname.split('.'))
+    return struct.pack('!HHHHHH', txid, flags, 1, 1 if response else 0, 0, 0) + question + b'\0' + \
+        struct.pack('!HH', qtype, 1)
+
+
+def udp(src_port, dst_port, payload):
+    return struct.pack('!HHHH', src_port, dst_port, 8 + len(payload), 0) + payload
+
+
+def ipv4(src, dst, segment, protocol=IPPROTO_UDP):
+    header = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(segment), 0, 0, 64, protocol, 0,
+                         socket.inet_pton(socket.AF_INET, src), socket.inet_pton(socket.AF_INET, dst))
+    return header + segment
+
+
+def ipv6(src, dst, segment):
+    header = struct.pack('!IHBB16s16s', 6 << 28, len(segment), IPPROTO_UDP, 64,
+                         socket.inet_pton(socket.AF_INET6, src), socket.inet_pton(socket.AF_INET6, dst))
+    return header + segment
+
+
+def ethernet(ethertype, packet, vlan=None):
+    header = b'\x02\x00\x00\x00\x00\x01\x02\x00\x00\x00\x00\x02'
+    if vlan is not None:
+        header += struct.pack('!HH', ETH_P_8021Q, vlan)
+    return header + struct.pack('!H', ethertype) + packet
+
+
+def linux_sll(ethertype, packet):
+    return struct.pack('!HHH8sH', 0, 1, 6, b'\x02\x00\x00\x00\x00\x01\x00\x00', ethertype) + packet
+
+
+def query(client, port, txid, qname, qtype=1, vlan=None):
+    return ethernet(ETH_P_IP, ipv4(client, SERVER, udp(port, 53, dns_message(txid, qname, qtype))), vlan)
+
+
+def response(client, port, txid, qname, qtype=1, rcode=0, vlan=None):
+    payload = dns_message(txid, qname, qtype, response=True, rcode=rcode)
+    return ethernet(ETH_P_IP, ipv4(SERVER, client, udp(53, port, payload)), vlan)
+
+
+def write_pcap(path, records, linktype=LINKTYPE_ETHERNET):
+    """Classic little-endian microsecond pcap of (timestamp, frame) records"""
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<IHHiIII', 0xA1B2C3D4, 2, 4, 0, 0, 65535, linktype))
+        for timestamp, frame in records:
+            seconds = int(timestamp)
+            microseconds = round((timestamp - seconds) * 1e6)
+            f.write(struct.pack('<IIII', seconds, microseconds, len(frame), len(frame)))
+            f.write(frame)
+
+
+class PacketCaptureTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.results = []
+        self.capture = DNSPacketCapture(self.results.append)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def replay(self, records, linktype=LINKTYPE_ETHERNET):
+        path = os.path.join(self.directory, 'capture.pcap')
+        write_pcap(path, records, linktype)
+        return self.capture.replay(path)
+
+    def assert_results(self, expected):
+        """Compare results as (client_ip, domain, query_type, rcode, latency_ms)"""
+        self.assertEqual(len(self.results), len(expected))
+        for result, (client_ip, domain, query_type, rcode, latency_ms) in zip(self.results, expected):
+            self.assertEqual((result['client_ip'], result['domain'], result['query_type'], result['rcode']),
+                             (client_ip, domain, query_type, rcode))
+            self.assertAlmostEqual(result['latency_ms'], latency_ms, places=3)
+
+    def test_queries_are_paired_with_their_responses(self):
+        stats = self.replay([
+            (1000.000000, query('10.0.0.5', 40000, 1, 'www.example.com')),
+            # Same txid from another client, answered first
+            (1000.001000, query('10.0.0.6', 40000, 1, 'example.org', qtype=28)),
+            (1000.004000, response('10.0.0.6', 40000, 1, 'example.org', qtype=28, rcode=3)),
+            (1000.012500, response('10.0.0.5', 40000, 1, 'www.example.com')),
+            # Same client and txid from another port, on a VLAN
+            (1000.020000, query('10.0.0.5', 40001, 1, 'mail.example.com', qtype=15, vlan=10)),
+            (1000.020750, response('10.0.0.5', 40001, 1, 'mail.example.com', qtype=15, rcode=2, vlan=10)),
+        ])
+        self.assert_results([
+            ('10.0.0.6', 'example.org', 'AAAA', 'NXDOMAIN', 3.0),
+            ('10.0.0.5', 'www.example.com', 'A', 'NOERROR', 12.5),
+            ('10.0.0.5', 'mail.example.com', 'MX', 'SERVFAIL', 0.75),
+        ])
+        self.assertEqual(self.results[1]['timestamp'], 1000.0125)
+        self.assertEqual(stats, {
+            'packets': 6,
+            'queries': 3,
+            'upstream': 0,
+            'matched': 3,
+            'pending': 0,
+            'unanswered': 0,
+            'unmatched_responses': 0,
+            'rcodes': {'NOERROR': 1, 'NXDOMAIN': 1, 'SERVFAIL': 1}
+        })
+
+    def test_retransmission_is_measured_from_the_latest_attempt(self):
+        self.replay([
+            (1000.100000, query('10.0.0.5', 40000, 7, 'slow.example.com')),
+            (1000.300000, query('10.0.0.5', 40000, 7, 'slow.example.com')),
+            (1000.310000, response('10.0.0.5', 40000, 7, 'slow.example.com')),
+        ])
+        self.assert_results([('10.0.0.5', 'slow.example.com', 'A', 'NOERROR', 10.0)])
+
+    def test_unanswered_and_unmatched(self):
+        stats = self.replay([
+            (1000.000000, query('10.0.0.5', 40000, 1, 'lost.example.com')),
+            # Not DNS: TCP to port 53 and UDP between other ports
+            (1000.001000, ethernet(ETH_P_IP, ipv4('10.0.0.5', SERVER, udp(40000, 53, b''), protocol=6))),
+            (1000.002000, ethernet(ETH_P_IP, ipv4('10.0.0.5', SERVER, udp(40000, 123, b'\0' * 48)))),
+            # DNS traffic after the timeout expires the query, so its late response is unmatched
+            (1005.500000, response('10.0.0.7', 40000, 9, 'unknown.example.com')),
+            (1006.000000, response('10.0.0.5', 40000, 1, 'lost.example.com')),
+        ])
+        self.assertEqual(self.results, [])
+        self.assertEqual(stats['packets'], 5)
+        self.assertEqual(stats['queries'], 1)
+        self.assertEqual(stats['matched'], 0)
+        self.assertEqual(stats['pending'], 0)
+        self.assertEqual(stats['unanswered'], 1)
+        self.assertEqual(stats['unmatched_responses'], 2)
+
+    def upstream_records(self):
+        """A client query answered after the server resolved it upstream"""
+        upstream_query = dns_message(0x4242, 'www.example.com', 1)
+        upstream_response = dns_message(0x4242, 'www.example.com', 1, response=True)
+        return [
+            (1000.000000, query('10.0.0.5', 40000, 1, 'www.example.com')),
+            (1000.001000, ethernet(ETH_P_IP, ipv4(SERVER, UPSTREAM, udp(33000, 53, upstream_query)))),
+            (1000.031000, ethernet(ETH_P_IP, ipv4(UPSTREAM, SERVER, udp(53, 33000, upstream_response)))),
+            (1000.035000, response('10.0.0.5', 40000, 1, 'www.example.com')),
+        ]
+
+    def test_upstream_queries_are_left_out(self):
+        self.capture = DNSPacketCapture(self.results.append, server_addresses=[SERVER, SERVER6])
+        stats = self.replay(self.upstream_records())
+        self.assert_results([('10.0.0.5', 'www.example.com', 'A', 'NOERROR', 35.0)])
+        self.assertEqual((stats['queries'], stats['upstream'], stats['matched']), (1, 2, 1))
+        self.assertEqual((stats['pending'], stats['unmatched_responses']), (0, 0))
+
+    def test_replay_without_addresses_measures_every_query(self):
+        stats = self.replay(self.upstream_records())
+        self.assertEqual(stats['queries'], 2)
+        self.assertEqual(stats['upstream'], 0)
+        self.assertEqual(sorted(result['client_ip'] for result in self.results), ['10.0.0.5', SERVER])
+
+    def test_live_capture_defaults_to_the_interface_addresses(self):
+        addresses = {'127.0.0.1', SERVER, '::1', SERVER6, 'fe80::fc:ff:fe00:1'}
+        self.assertEqual(local_addresses(FIXTURE_PROCFS), addresses)
+        capture = DNSPacketCapture(self.results.append, proc_root=FIXTURE_PROCFS)
+        self.assertIsNone(capture.server_addresses)
+        capture._refresh_addresses()
+        self.assertEqual(capture.server_addresses, addresses)
+        # Configured addresses are kept as given, in decode_udp's notation
+        capture = DNSPacketCapture(self.results.append, server_addresses=['2001:DB8:0::53', ' 192.0.2.53', ''],
+                                   proc_root=FIXTURE_PROCFS)
+        capture._refresh_addresses()
+        self.assertEqual(capture.server_addresses, {SERVER6, SERVER})
+
+    def test_linux_sll_capture(self):
+        frames = [(1000.0, query('10.0.0.5', 40000, 3, 'example.net')),
+                  (1000.0025, response('10.0.0.5', 40000, 3, 'example.net'))]
+        # Same IP packets behind a cooked capture header instead of Ethernet
+        self.replay([(timestamp, linux_sll(ETH_P_IP, frame[14:])) for timestamp, frame in frames],
+                    LINKTYPE_LINUX_SLL)
+        self.assert_results([('10.0.0.5', 'example.net', 'A', 'NOERROR', 2.5)])
+
+    def test_raw_ipv6_capture(self):
+        client = '2001:db8::5'
+        self.replay([
+            (1000.0, ipv6(client, SERVER6, udp(40000, 53, dns_message(4, 'example.com', 28)))),
+            (1000.0015, ipv6(SERVER6, client, udp(53, 40000, dns_message(4, 'example.com', 28, response=True)))),
+        ], LINKTYPE_RAW)
+        self.assert_results([(client, 'example.com', 'AAAA', 'NOERROR', 1.5)])
+
+    def test_decode_udp_rejects_non_first_fragments(self):
+        packet = bytearray(ipv4('10.0.0.5', SERVER, udp(40000, 53, dns_message(1, 'example.com', 1))))
+        self.assertIsNotNone(decode_udp(ethernet(ETH_P_IP, bytes(packet))))
+        # Fragment offset 185 (1480 bytes)
+        packet[6:8] = struct.pack('!H', 185)
+        self.assertIsNone(decode_udp(ethernet(ETH_P_IP, bytes(packet))))
+        self.assertIsNone(decode_udp(ethernet(ETH_P_IPV6, b'\0' * 20)))
+
+
+if __name__ == '__main__':
+    unittest.main()
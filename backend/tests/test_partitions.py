@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Partitions Tests
+Day partitions are listed to readers only once the writer has committed them
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'utils'))
+
+from database import DatabaseManager
+from partitions import DAY_MS, partition_name
+from timestamps import from_epoch_ms
+
+# 2024-01-01T00:00:00Z
+DAY = 19723
+
+
+def make_sample(ts):
+    return {
+        'timestamp': from_epoch_ms(ts),
+        'system': {'cpu': {'percent': 12}, 'memory': {'percent': 40}},
+        'dns': {'bind_status': {'process_running': True}, 'query_stats': {'total_queries': 100}}
+    }
+
+
+class PartitionSetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db = DatabaseManager(os.path.join(self.directory, 'dns_monitor.db'))
+        self.db.init_database()
+        self.merge_rollups = self.db._merge_rollups
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.directory)
+
+    def read_partitions(self):
+        """Rows of every listed system_monitoring partition, read as the history endpoints do"""
+        with self.db.pool.reader() as conn:
+            return {name: conn.execute(f'SELECT COUNT(*) FROM {name}').fetchone()[0]
+                    for name in self.db.partitions.covering('system_monitoring')}
+
+    def test_new_day_is_listed_after_the_commit(self):
+        seen = []
+
+        def merge_rollups(conn, rows):
+            # The writer has created the new day's partition but not committed yet
+            seen.append(self.read_partitions())
+            self.merge_rollups(conn, rows)
+
+        self.db._merge_rollups = merge_rollups
+        self.assertTrue(self.db.store_monitoring_batch([make_sample(DAY * DAY_MS - 1000)]))
+        self.assertTrue(self.db.store_monitoring_batch([make_sample((DAY + 1) * DAY_MS + 1000)]))
+        first, second = partition_name('system_monitoring', DAY - 1), partition_name('system_monitoring', DAY + 1)
+        self.assertEqual(seen, [{}, {first: 1}])
+        self.assertEqual(self.read_partitions(), {first: 1, second: 1})
+
+    def test_rolled_back_day_is_not_listed(self):
+        def merge_rollups(conn, rows):
+            raise RuntimeError("disk full")
+
+        self.db._merge_rollups = merge_rollups
+        self.assertFalse(self.db.store_monitoring_batch([make_sample(DAY * DAY_MS)]))
+        self.assertEqual(self.read_partitions(), {})
+        self.assertEqual(self.db.partitions.get_stats()['days']['dns_monitoring'], 0)
+
+        # The retried batch creates the partition again
+        self.db._merge_rollups = self.merge_rollups
+        self.assertTrue(self.db.store_monitoring_batch([make_sample(DAY * DAY_MS)]))
+        self.assertEqual(self.read_partitions(), {partition_name('system_monitoring', DAY): 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Query Buffer Tests
+Interned strings of the query ring buffer as rows are overwritten
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'monitors'))
+
+from query_buffer import QueryRingBuffer
+
+
+class QueryRingBufferTest(unittest.TestCase):
+
+    def test_overwritten_rows_release_their_strings(self):
+        buffer = QueryRingBuffer(capacity=100)
+        for n in range(10000):
+            buffer.append(1000.0 + n, f'10.0.{n % 7}.{n % 251}', f'host{n}.example.com', 'A')
+        # Only the names of the live rows are kept, and their ids are reused
+        self.assertEqual(len(buffer.domains), 100)
+        self.assertEqual(len(buffer.domains.strings), 101)
+        self.assertLessEqual(len(buffer.clients), 100)
+        self.assertEqual(len(buffer.query_types), 1)
+        self.assertEqual([query['domain'] for query in buffer.get_recent(3)],
+                         ['host9999.example.com', 'host9998.example.com', 'host9997.example.com'])
+
+    def test_repeated_names_keep_their_id(self):
+        buffer = QueryRingBuffer(capacity=3)
+        for n, domain in enumerate(['a.example', 'b.example', 'a.example', 'a.example', 'c.example', 'a.example']):
+            buffer.append(1000.0 + n, '10.0.0.5', domain, 'AAAA' if n % 2 else 'A')
+        self.assertEqual(sorted(buffer.domains.ids), ['a.example', 'c.example'])
+        self.assertEqual(buffer.domains.refs[buffer.domains.ids['a.example']], 2)
+        self.assertEqual([(query['domain'], query['query_type']) for query in buffer.get_recent()],
+                         [('a.example', 'AAAA'), ('c.example', 'A'), ('a.example', 'AAAA')])
+        self.assertEqual(buffer.get_stats()['distinct_domains'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rate Counter Tests
+QueryRateCounter windows against the query history scan they replaced
+"""
+
+import os
+import sys
+import copy
+import time
+import random
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'monitors'))
+
+from rate_counter import BucketRing, QueryRateCounter
+from query_buffer import QueryRingBuffer
+
+# Fixed past start, so no timestamp is ahead of the clock
+START = 1700000000.25
+
+
+def window_start(ring, now):
+    """First second of the window of ``ring`` ending at ``now``"""
+    return (int(now // ring.width) - ring.size + 1) * ring.width
+
+
+def scanned_rates(counter, timestamps, now):
+    """The rates as the query history scan computed them, over each ring's window"""
+    history = QueryRingBuffer(len(timestamps) + 1)
+    for timestamp in sorted(timestamps):
+        history.append(timestamp, '10.0.0.5', 'example.com', 'A')
+    per_minute = history.count_since(window_start(counter.seconds, now))
+    return {
+        'qps': round(per_minute / 60.0, 2),
+        'queries_per_minute': per_minute,
+        'queries_per_hour': history.count_since(window_start(counter.minutes, now)),
+        'queries_per_day': history.count_since(window_start(counter.hours, now))
+    }
+
+
+def query_times(count, seed):
+    """Timestamps in log order: bursts, quiet periods and gaps longer than a day"""
+    rng = random.Random(seed)
+    timestamps = []
+    timestamp = START
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.002:
+            timestamp += rng.uniform(3600, 30 * 3600)
+        elif roll < 0.02:
+            timestamp += rng.uniform(60, 900)
+        else:
+            timestamp += rng.expovariate(0.5)
+        timestamps.append(timestamp)
+    return timestamps
+
+
+class QueryRateCounterTest(unittest.TestCase):
+
+    def assert_matches_scan(self, arrivals, checks=40):
+        counter = QueryRateCounter()
+        step = max(1, len(arrivals) // checks)
+        for n, timestamp in enumerate(arrivals, 1):
+            counter.add(timestamp)
+            if n % step == 0 or n == len(arrivals):
+                seen = arrivals[:n]
+                now = max(seen)
+                self.assertEqual(counter.get_rates(now), scanned_rates(counter, seen, now), f"after {n} queries")
+                # Reading later, after the windows rolled over without new queries (on a
+                # copy, as reading moves the windows forward)
+                for later in (now + 59.5, now + 61, now + 3599, now + 7200, now + 86400 * 2):
+                    self.assertEqual(copy.deepcopy(counter).get_rates(later), scanned_rates(counter, seen, later))
+
+    def test_in_order(self):
+        self.assert_matches_scan(query_times(4000, seed=1))
+
+    def test_out_of_order(self):
+        # Lines of several logs interleaved, up to 5 seconds apart
+        rng = random.Random(2)
+        arrivals = [timestamp - rng.uniform(0, 5) for timestamp in query_times(4000, seed=3)]
+        self.assertNotEqual(arrivals, sorted(arrivals))
+        self.assert_matches_scan(arrivals)
+
+    def test_queries_older_than_the_window_are_ignored(self):
+        counter = QueryRateCounter()
+        counter.add(START + 7200)
+        counter.add(START + 7200 - 61)
+        counter.add(START)
+        rates = counter.get_rates(START + 7200)
+        self.assertEqual(rates['queries_per_minute'], 1)
+        self.assertEqual(rates['queries_per_hour'], 2)
+        self.assertEqual(rates['queries_per_day'], 3)
+
+    def test_future_timestamp_is_clamped(self):
+        counter = QueryRateCounter()
+        now = time.time()
+        for i in range(100):
+            counter.add(now - 30 + i * 0.25)
+        # A line two hours ahead does not expire the last minute and hour
+        counter.add(now + 7200)
+        rates = counter.get_rates()
+        self.assertEqual(rates['queries_per_minute'], 101)
+        self.assertEqual(rates['queries_per_hour'], 101)
+        self.assertEqual(rates['queries_per_day'], 101)
+
+    def test_add_interval(self):
+        ring = BucketRing(60, 60)
+        ring.add_interval(START + 10.5, START + 200.25, 1000)
+        series = ring.series(START + 200.25)
+        self.assertEqual(sum(series), 1000)
+        self.assertEqual(len([count for count in series if count]), 4)
+        # Only the part of a long interval inside the window is kept
+        ring = BucketRing(1, 60)
+        ring.add_interval(1700000000, 1700086400, 86400)
+        self.assertEqual(ring.series(1700086399.5), [1] * 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
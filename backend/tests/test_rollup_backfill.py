@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rollup Backfill Tests
+System and DNS rows stored before the rollups existed are rolled up at startup
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'utils'))
+
+from database import DatabaseManager
+from rollups import rollup_rows
+from timestamps import from_epoch_ms, epoch_ms_ago
+
+
+def make_samples(count, start_ms, step_ms=1000):
+    samples = []
+    for i in range(count):
+        samples.append({
+            'timestamp': from_epoch_ms(start_ms + i * step_ms),
+            'system': {
+                'cpu': {'percent': 10 + i % 7},
+                'memory': {'percent': 40 + i % 3},
+                'disk': {'percent': 55},
+                'load_average': {'1min': 0.5 + i % 4 / 4},
+                'network': {'speed': {'upload': 100 * i, 'download': 300 + i}},
+                'uptime': {'seconds': 86400 + i}
+            },
+            'dns': {
+                'bind_status': {
+                    'process_running': i % 50 != 3,
+                    'service_status': {'active': True},
+                    'config_status': {'valid': True}
+                },
+                'query_stats': {'total_queries': 1000 + 5 * i, 'qps': 5, 'queries_per_minute': 300,
+                                'queries_per_hour': 18000},
+                'response_times': {'average': 1.5 + i % 5}
+            }
+        })
+    return samples
+
+
+class RollupBackfillTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.directory, 'dns_monitor.db')
+        self.db = self.open()
+        # Three hours of samples ending 10 minutes ago, 20 seconds apart
+        self.start = epoch_ms_ago(3 * 3600 + 600) // 3600000 * 3600000
+        self.samples = make_samples(540, self.start, 20000)
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.directory)
+
+    def open(self):
+        db = DatabaseManager(self.db_path)
+        db.init_database()
+        return db
+
+    def reopen(self):
+        self.db.close()
+        self.db = self.open()
+
+    def rollups(self):
+        with self.db.pool.reader() as conn:
+            rows = conn.execute('''
+                SELECT source, tier, ts, metric, min, max, sum, count, last, last_time
+                FROM metric_rollups ORDER BY source, tier, ts, metric
+            ''').fetchall()
+        return [row[:6] + (round(row[6], 6),) + row[7:] for row in rows]
+
+    def drop_rollups(self):
+        with self.db.pool.writer() as conn:
+            conn.execute('DELETE FROM metric_rollups')
+
+    def test_rows_stored_before_the_rollups_are_rolled_up(self):
+        self.assertTrue(self.db.store_monitoring_batch(self.samples))
+        expected = self.rollups()
+        self.assertTrue(expected)
+        self.drop_rollups()
+        self.reopen()
+        self.assertEqual(self.rollups(), expected)
+        history = self.db.get_rollup_history('system', 3600, hours=4)
+        self.assertEqual(len(history), 3)
+
+    def test_rows_older_than_the_oldest_bucket_are_added(self):
+        self.assertTrue(self.db.store_monitoring_batch(self.samples))
+        expected = self.rollups()
+        # Rolled up as written after the upgrade: the last hour only
+        self.drop_rollups()
+        with self.db.pool.writer() as conn:
+            self.db._merge_rollups(conn, rollup_rows(self.samples[360:]))
+        self.reopen()
+        self.assertEqual(self.rollups(), expected)
+
+    def test_backfill_runs_once(self):
+        self.assertTrue(self.db.store_monitoring_batch(self.samples))
+        self.drop_rollups()
+        self.reopen()
+        expected = self.rollups()
+        self.reopen()
+        self.assertEqual(self.rollups(), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Statistics Channel Tests
+Recorded JSON v1 and XML v3 statistics documents from fixtures/stats_channel
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'monitors'))
+
+from stats_channel import StatsChannelCollector, parse_json_stats, parse_xml_stats, COUNTER_GROUPS
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'stats_channel')
+
+# Poll times of the recorded documents
+POLL_1 = 1714554000.0
+POLL_2 = POLL_1 + 10
+POLL_RESTART = POLL_1 + 20
+
+PARSERS = {'json': parse_json_stats, 'xml': parse_xml_stats}
+
+
+def load_stats(name, fmt):
+    with open(os.path.join(FIXTURES, f"{name}.{fmt}"), 'rb') as f:
+        return PARSERS[fmt](f.read())
+
+
+class StatsChannelTest(unittest.TestCase):
+
+    def collector(self, fmt, *polls):
+        collector = StatsChannelCollector(fmt=fmt, interval=5.0)
+        for name, now in polls:
+            collector.update(load_stats(name, fmt), now)
+        return collector
+
+    def test_parse(self):
+        for fmt in PARSERS:
+            with self.subTest(fmt=fmt):
+                stats = load_stats('stats_1', fmt)
+                self.assertEqual(stats['opcodes']['QUERY'], 120000)
+                self.assertEqual(stats['qtypes'], {'A': 80000, 'AAAA': 30000, 'PTR': 6000, 'MX': 1000, 'TXT': 3000})
+                self.assertEqual(stats['rcodes']['NXDOMAIN'], 9700)
+                self.assertEqual(stats['nsstats']['Requestv4'], 120012)
+                self.assertEqual(stats['sockstats']['UDP4Open'], 40000)
+                # Resolver and cache counters summed over the views
+                self.assertEqual(stats['resolver'], {'Queryv4': 40000, 'Responsev4': 39990, 'NXDOMAIN': 12})
+                self.assertEqual(stats['cachestats'], {'CacheHits': 70000, 'CacheMisses': 40000, 'QueryHits': 35000})
+                self.assertEqual(stats['memory']['InUse'], 20971520)
+                self.assertNotIn('contexts', stats['memory'])
+                self.assertEqual(stats['boot_time'], '2024-05-01T08:00:00.123Z')
+
+    def test_json_and_xml_agree(self):
+        for name in ('stats_1', 'stats_2', 'stats_restart'):
+            json_stats = load_stats(name, 'json')
+            xml_stats = load_stats(name, 'xml')
+            for group in COUNTER_GROUPS:
+                self.assertEqual(json_stats[group], xml_stats[group], f"{name} {group}")
+
+    def test_rates_between_polls(self):
+        for fmt in PARSERS:
+            with self.subTest(fmt=fmt):
+                collector = self.collector(fmt, ('stats_1', POLL_1))
+                self.assertIsNone(collector.get_stats(POLL_1))
+                collector.update(load_stats('stats_2', fmt), POLL_2)
+                stats = collector.get_stats(POLL_2)
+                self.assertEqual(stats['qps'], 50.0)
+                self.assertEqual(stats['rates']['qtypes'], {'A': 34.0, 'AAAA': 12.0, 'PTR': 3.0, 'MX': 0.0, 'TXT': 1.0})
+                self.assertEqual(stats['rates']['rcodes']['NXDOMAIN'], 5.0)
+                self.assertEqual(stats['rates']['cachestats']['CacheHits'], 30.0)
+                self.assertEqual(stats['totals']['opcodes']['QUERY'], 120500)
+                self.assertEqual(stats['queries_per_minute'], 500)
+                self.assertEqual(stats['queries_per_hour'], 500)
+                self.assertIsNone(stats['last_error'])
+
+    def test_named_restart(self):
+        for fmt in PARSERS:
+            with self.subTest(fmt=fmt):
+                collector = self.collector(fmt, ('stats_1', POLL_1), ('stats_2', POLL_2))
+                # The counters went back to zero: no rates until the next poll
+                collector.update(load_stats('stats_restart', fmt), POLL_RESTART)
+                self.assertIsNone(collector.get_stats(POLL_RESTART))
+                restarted = load_stats('stats_restart', fmt)
+                restarted['opcodes']['QUERY'] += 100
+                collector.update(restarted, POLL_RESTART + 5)
+                stats = collector.get_stats(POLL_RESTART + 5)
+                self.assertEqual(stats['qps'], 20.0)
+                self.assertEqual(stats['boot_time'], '2024-05-01T09:00:15.500Z')
+                self.assertEqual(stats['queries_per_minute'], 600)
+
+    def test_counter_going_backwards_without_restart(self):
+        collector = self.collector('json', ('stats_2', POLL_1))
+        collector.update(load_stats('stats_1', 'json'), POLL_2)
+        rates = collector.get_stats(POLL_2)['rates']
+        self.assertEqual(rates['opcodes']['QUERY'], 0)
+        self.assertEqual(rates['qtypes']['A'], 0)
+
+    def test_stale_after_failed_polls(self):
+        collector = self.collector('json', ('stats_1', POLL_1), ('stats_2', POLL_2))
+        collector.last_error = 'Connection refused'
+        self.assertEqual(collector.get_stats(POLL_2 + 15)['last_error'], 'Connection refused')
+        # Three intervals without a successful poll
+        self.assertIsNone(collector.get_stats(POLL_2 + 15.5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Write Behind Tests
+No drained query is lost when the queue is full or a batch fails to store
+"""
+
+import os
+import sys
+import time
+import threading
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'utils'))
+
+from write_behind import WriteBehindQueue, carry_queries, POLICY_BLOCK, POLICY_DROP_OLDEST
+
+
+def make_samples(count, queries_per_sample=3):
+    """Samples as DNSMonitorApp queues them, each with its drained queries and checkpoint"""
+    samples = []
+    seq = 0
+    for i in range(count):
+        queries = []
+        for _ in range(queries_per_sample):
+            seq += 1
+            queries.append({'seq': seq, 'domain': f"host{seq}.example.com", 'query_type': 'A'})
+        samples.append({
+            'timestamp': f"2024-01-01T00:00:{i % 60:02d}Z",
+            'system': {'cpu': {'percent': i}},
+            'queries': queries,
+            'checkpoint': {'seq': seq, 'positions': {'/var/log/named/query.log': seq * 80}}
+        })
+    return samples, seq
+
+
+class FlakyStore:
+    """write_batch that fails its first ``failures`` calls and takes ``delay`` seconds"""
+
+    def __init__(self, failures=0, delay=0.0):
+        self.failures = failures
+        self.delay = delay
+        self.calls = 0
+        self.seqs = []
+        self.checkpoint = None
+        self.lock = threading.Lock()
+
+    def write_batch(self, samples):
+        time.sleep(self.delay)
+        with self.lock:
+            self.calls += 1
+            if self.calls <= self.failures:
+                return False
+            for sample in samples:
+                self.seqs.extend(query['seq'] for query in sample.get('queries', []))
+                checkpoint = sample.get('checkpoint')
+                if checkpoint and (self.checkpoint is None or checkpoint['seq'] > self.checkpoint['seq']):
+                    self.checkpoint = checkpoint
+            return True
+
+
+class WriteBehindQueueTest(unittest.TestCase):
+
+    def assert_all_stored(self, store, last_seq):
+        self.assertEqual(sorted(store.seqs), list(range(1, last_seq + 1)))
+        self.assertEqual(len(store.seqs), len(set(store.seqs)))
+        self.assertEqual(store.checkpoint['seq'], last_seq)
+
+    def run_queue(self, store, policy, samples):
+        queue = WriteBehindQueue(store.write_batch, flush_interval=0.005, flush_rows=1000, capacity=3,
+                                 policy=policy, block_timeout=0.001, retry_interval=0.01)
+        queue.start()
+        for sample in samples:
+            queue.put(sample)
+        # Let the failed batches be retried before stopping
+        deadline = time.monotonic() + 5
+        while (queue.get_stats()['depth'] or store.calls <= store.failures) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        queue.stop()
+        return queue.get_stats()
+
+    def test_evicted_samples_keep_their_queries(self):
+        queue = WriteBehindQueue(lambda batch: True, capacity=1)
+        samples, last_seq = make_samples(5)
+        for sample in samples:
+            queue.put(sample)
+        self.assertEqual(len(queue.queue), 1)
+        kept, rows = queue.queue[0]
+        self.assertEqual([query['seq'] for query in kept['queries']], list(range(1, last_seq + 1)))
+        self.assertEqual(kept['checkpoint']['seq'], last_seq)
+        self.assertEqual(queue.get_stats()['dropped'], 4)
+        self.assertEqual(rows, queue.pending_rows)
+
+    def test_carried_queries_are_capped(self):
+        queue = WriteBehindQueue(lambda batch: True, capacity=2, max_carried=10)
+        samples, last_seq = make_samples(8)
+        for sample in samples:
+            queue.put(sample)
+        # The head sample kept the newest of the queries it carried, the rest are counted
+        head = queue.queue[0][0]
+        self.assertEqual([query['seq'] for query in head['queries']], list(range(12, 22)))
+        self.assertEqual([query['seq'] for query in queue.queue[1][0]['queries']], [22, 23, 24])
+        self.assertEqual(head['checkpoint']['seq'], 21)
+        stats = queue.get_stats()
+        self.assertEqual((stats['dropped'], stats['dropped_queries']), (6, last_seq - 10 - 3))
+        self.assertEqual(stats['pending_rows'], sum(rows for _sample, rows in queue.queue))
+
+    def test_carried_queries_stay_in_sequence_order(self):
+        older, newer = make_samples(2)[0]
+        for sample, other in ((newer, older), (older, newer)):
+            merged, overflow = carry_queries(sample, other)
+            self.assertEqual([query['seq'] for query in merged['queries']], [1, 2, 3, 4, 5, 6])
+            self.assertEqual(merged['checkpoint']['seq'], 6)
+            self.assertEqual(merged['system'], sample['system'])
+            self.assertEqual(overflow, 0)
+
+    def test_drop_oldest_with_failing_store(self):
+        store = FlakyStore(failures=3, delay=0.01)
+        samples, last_seq = make_samples(200)
+        stats = self.run_queue(store, POLICY_DROP_OLDEST, samples)
+        self.assertGreater(stats['dropped'], 0)
+        self.assertGreater(stats['requeued'], 0)
+        self.assert_all_stored(store, last_seq)
+
+    def test_block_with_failing_store(self):
+        store = FlakyStore(failures=3, delay=0.01)
+        samples, last_seq = make_samples(200)
+        stats = self.run_queue(store, POLICY_BLOCK, samples)
+        self.assertGreater(stats['dropped'], 0)
+        self.assertGreater(stats['requeued'], 0)
+        self.assert_all_stored(store, last_seq)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,103 +5,72 @@ Database Manager Module
 Handles SQLite database operations for storing historical monitoring data
 """
 
-import sqlite3
 import json
 import logging
-from datetime import datetime, timedelta
 from pathlib import Path
 
+from sqlite_pool import SQLitePool
+from schema import TABLES, PARTITIONED_TABLES, create_table_sql, create_index_sqls
+from partitions import PartitionSet, DAY_MS, partition_day, partition_name
+from migrate_schema import SchemaMigration
+from query_encoding import QueryEncoder, LAST_SEEN_GRANULARITY_MS, unpack_ip
+from query_aggregates import AGGREGATES, MINUTE_MS, count_rows, split_window
+from snapshots import SnapshotEncoder, decode_snapshot
+from timestamps import to_epoch_ms, from_epoch_ms, epoch_ms_ago
+from rollups import (TIERS, TIER_RETENTION_DAYS, SOURCES, choose_resolution, rollup_rows,
+                     rollup_stored_rows, pivot_rows)
+
 logger = logging.getLogger(__name__)
 
+# Raw table of each rollup source
+ROLLUP_SOURCES = {'system': 'system_monitoring', 'dns': 'dns_monitoring'}
+
 class DatabaseManager:
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, snapshot_interval=0):
         if db_path is None:
             db_path = Path(__file__).parent.parent / 'data' / 'dns_monitor.db'
         
-        self.db_path = db_path
+        self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.pool = SQLitePool(self.db_path)
+        self.encoder = QueryEncoder()
+        self.partitions = PartitionSet()
+        
+        # Full monitoring data is only kept as sampled snapshots, if enabled
+        self.snapshots = SnapshotEncoder(snapshot_interval) if snapshot_interval > 0 else None
+    
+    def close(self):
+        """Close the pooled connections"""
+        self.pool.close()
         
     def init_database(self):
         """Initialize the database with required tables"""
         try:
-            conn = sqlite3.connect(str(self.db_path))
-            cursor = conn.cursor()
-            
-            # Create system monitoring table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS system_monitoring (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    cpu_percent REAL,
-                    memory_percent REAL,
-                    memory_used INTEGER,
-                    memory_total INTEGER,
-                    disk_percent REAL,
-                    disk_used INTEGER,
-                    disk_total INTEGER,
-                    load_avg_1min REAL,
-                    load_avg_5min REAL,
-                    load_avg_15min REAL,
-                    network_bytes_sent INTEGER,
-                    network_bytes_recv INTEGER,
-                    network_upload_speed REAL,
-                    network_download_speed REAL,
-                    uptime REAL,
-                    raw_data TEXT
-                )
-            ''')
-            
-            # Create DNS monitoring table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS dns_monitoring (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    bind_running BOOLEAN,
-                    service_active BOOLEAN,
-                    total_queries INTEGER,
-                    qps REAL,
-                    queries_per_minute INTEGER,
-                    queries_per_hour INTEGER,
-                    avg_response_time REAL,
-                    config_valid BOOLEAN,
-                    raw_data TEXT
-                )
-            ''')
-            
-            # Create DNS queries table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS dns_queries (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    client_ip TEXT,
-                    domain TEXT,
-                    query_type TEXT,
-                    response_time REAL,
-                    raw_line TEXT
-                )
-            ''')
-            
-            # Create query statistics table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS query_statistics (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    query_type TEXT,
-                    count INTEGER,
-                    percentage REAL
-                )
-            ''')
-            
-            # Create indexes for better performance
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_system_timestamp ON system_monitoring(timestamp)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_dns_timestamp ON dns_monitoring(timestamp)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_queries_timestamp ON dns_queries(timestamp)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_queries_domain ON dns_queries(domain)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_queries_type ON dns_queries(query_type)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_queries_client ON dns_queries(client_ip)')
-            
-            conn.commit()
-            conn.close()
+            # Convert tables written by older versions
+            migration = SchemaMigration(self.pool, pause=0)
+            pending = migration.pending_tables()
+            if pending:
+                logger.info(f"Migrating {', '.join(pending)} to the current schema")
+                migration.run()
+            
+            self._enable_incremental_vacuum()
+            
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+                
+                # Create tables and the indexes serving the history queries;
+                # partitioned tables get a table per day as rows arrive
+                for table in TABLES:
+                    if table in PARTITIONED_TABLES:
+                        continue
+                    cursor.execute(create_table_sql(table))
+                    for sql in create_index_sqls(table):
+                        cursor.execute(sql)
+                
+                self.partitions.load(conn)
+            
+            self._backfill_aggregates()
+            self._backfill_rollups()
             
             logger.info(f"Database initialized successfully at {self.db_path}")
             
@@ -109,26 +78,95 @@ class DatabaseManager:
             logger.error(f"Error initializing database: {e}")
             raise
     
+    def _backfill_aggregates(self):
+        """Build the per-minute query counts of queries stored before the
+        aggregate tables existed, in one transaction"""
+        sources = self.partitions.covering('dns_queries')
+        if not sources or any(self.partitions.covering(table) for table in AGGREGATES):
+            return
+        
+        logger.info("Building per-minute query counts of the stored queries")
+        created = set()
+        try:
+            with self.pool.writer() as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                for source in sources:
+                    oldest, newest = conn.execute(f'SELECT MIN(ts), MAX(ts) FROM {source}').fetchone()
+                    if oldest is None:
+                        continue
+                    for day in range(partition_day(oldest), partition_day(newest) + 1):
+                        for table, column in AGGREGATES.items():
+                            partition = self.partitions.ensure(conn, table, day, created)
+                            conn.execute(f'''
+                                INSERT INTO {partition} (ts, {column}, count)
+                                SELECT ts / {MINUTE_MS} * {MINUTE_MS} AS minute, {column}, COUNT(*)
+                                FROM {source}
+                                WHERE ts >= ? AND ts < ? AND {column} IS NOT NULL
+                                GROUP BY minute, {column}
+                                ON CONFLICT(ts, {column}) DO UPDATE SET count = count + excluded.count
+                            ''', (day * DAY_MS, (day + 1) * DAY_MS))
+            self.partitions.add(created)
+        except Exception as e:
+            logger.error(f"Error building query aggregates: {e}")
+    
+    def _backfill_rollups(self):
+        """Roll up the system and DNS rows stored before the rollups existed
+        
+        Each tier takes the rows it still keeps that are older than its
+        oldest bucket. Newer rows were merged as they were written.
+        """
+        now = to_epoch_ms()
+        try:
+            with self.pool.writer() as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                for source, table in ROLLUP_SOURCES.items():
+                    ranges = {}
+                    for tier in TIERS:
+                        oldest = conn.execute(
+                            'SELECT MIN(ts) FROM metric_rollups WHERE source = ? AND tier = ?', (source, tier)
+                        ).fetchone()[0]
+                        start = now - TIER_RETENTION_DAYS[tier] * DAY_MS
+                        if oldest is None or oldest > start:
+                            ranges[tier] = (start, oldest)
+                    if not ranges:
+                        continue
+                    
+                    start = min(start for start, _end in ranges.values())
+                    ends = [end for _start, end in ranges.values()]
+                    end = None if None in ends else max(ends)
+                    columns = ', '.join(SOURCES[source])
+                    for partition in self.partitions.covering(table, start, end):
+                        if end is None:
+                            rows = conn.execute(f'SELECT ts, {columns} FROM {partition} WHERE ts >= ?', (start,))
+                        else:
+                            rows = conn.execute(f'SELECT ts, {columns} FROM {partition} WHERE ts >= ? AND ts < ?',
+                                                (start, end))
+                        buckets = rollup_stored_rows(source, rows, ranges)
+                        if buckets:
+                            logger.info(f"Rolling up the {source} rows of {partition}")
+                            self._merge_rollups(conn, buckets)
+        except Exception as e:
+            logger.error(f"Error building rollups of the stored rows: {e}")
+    
     def store_monitoring_data(self, monitoring_data):
         """Store monitoring data in the database"""
-        try:
-            conn = sqlite3.connect(str(self.db_path))
-            cursor = conn.cursor()
-            
-            timestamp = monitoring_data.get('timestamp', datetime.now().isoformat())
-            
-            # Store system data
+        self.store_monitoring_batch([monitoring_data])
+    
+    def store_monitoring_batch(self, samples):
+        """Store several monitoring samples in one transaction, returns True on success"""
+        system_rows = []
+        dns_rows = []
+        query_rows = []
+        statistics_rows = []
+        latest_checkpoint = None
+        for monitoring_data in samples:
+            ts = to_epoch_ms(monitoring_data.get('timestamp'))
+            
+            # System data
             system_data = monitoring_data.get('system', {})
             if system_data:
-                cursor.execute('''
-                    INSERT INTO system_monitoring (
-                        timestamp, cpu_percent, memory_percent, memory_used, memory_total,
-                        disk_percent, disk_used, disk_total, load_avg_1min, load_avg_5min,
-                        load_avg_15min, network_bytes_sent, network_bytes_recv,
-                        network_upload_speed, network_download_speed, uptime, raw_data
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    timestamp,
+                system_rows.append((
+                    ts,
                     system_data.get('cpu', {}).get('percent', 0),
                     system_data.get('memory', {}).get('percent', 0),
                     system_data.get('memory', {}).get('used', 0),
@@ -143,25 +181,18 @@ class DatabaseManager:
                     system_data.get('network', {}).get('bytes_recv', 0),
                     system_data.get('network', {}).get('speed', {}).get('upload', 0),
                     system_data.get('network', {}).get('speed', {}).get('download', 0),
-                    system_data.get('uptime', {}).get('seconds', 0),
-                    json.dumps(system_data)
+                    system_data.get('uptime', {}).get('seconds', 0)
                 ))
             
-            # Store DNS data
+            # DNS data
             dns_data = monitoring_data.get('dns', {})
             if dns_data:
                 bind_status = dns_data.get('bind_status', {})
                 query_stats = dns_data.get('query_stats', {})
                 response_times = dns_data.get('response_times', {})
                 
-                cursor.execute('''
-                    INSERT INTO dns_monitoring (
-                        timestamp, bind_running, service_active, total_queries, qps,
-                        queries_per_minute, queries_per_hour, avg_response_time,
-                        config_valid, raw_data
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    timestamp,
+                dns_rows.append((
+                    ts,
                     bind_status.get('process_running', False),
                     bind_status.get('service_status', {}).get('active', False),
                     query_stats.get('total_queries', 0),
@@ -169,73 +200,234 @@ class DatabaseManager:
                     query_stats.get('queries_per_minute', 0),
                     query_stats.get('queries_per_hour', 0),
                     response_times.get('average', 0),
-                    bind_status.get('config_status', {}).get('valid', True),
-                    json.dumps(dns_data)
+                    bind_status.get('config_status', {}).get('valid', True)
                 ))
                 
-                # Store recent queries
-                recent_queries = dns_data.get('recent_queries', [])
-                for query in recent_queries:
-                    cursor.execute('''
-                        INSERT INTO dns_queries (
-                            timestamp, client_ip, domain, query_type, response_time, raw_line
-                        ) VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (
-                        query.get('timestamp', timestamp),
-                        query.get('client_ip', ''),
-                        query.get('domain', ''),
-                        query.get('query_type', ''),
-                        query.get('response_time', 0),
-                        query.get('raw_line', '')
-                    ))
-                
-                # Store query type statistics
-                query_types = dns_data.get('query_types', {})
-                for query_type, stats in query_types.items():
-                    cursor.execute('''
-                        INSERT INTO query_statistics (
-                            timestamp, query_type, count, percentage
-                        ) VALUES (?, ?, ?, ?)
-                    ''', (
-                        timestamp,
+                # Query type statistics
+                for query_type, stats in dns_data.get('query_types', {}).items():
+                    statistics_rows.append((
+                        ts,
                         query_type,
                         stats.get('count', 0),
                         stats.get('percentage', 0)
                     ))
             
-            conn.commit()
-            conn.close()
+            # Queries drained from the monitor, each carrying its sequence number
+            for query in monitoring_data.get('queries', []):
+                query_rows.append((
+                    to_epoch_ms(query['timestamp']) if query.get('timestamp') else ts,
+                    query['seq'],
+                    query.get('client_ip', ''),
+                    query.get('domain', ''),
+                    query.get('query_type', ''),
+                    query.get('response_time'),
+                    query.get('raw_line')
+                ))
+            
+            checkpoint = monitoring_data.get('checkpoint')
+            if checkpoint and (latest_checkpoint is None or checkpoint['seq'] >= latest_checkpoint['seq']):
+                latest_checkpoint = checkpoint
+        
+        snapshot_rows = []
+        if self.snapshots:
+            snapshot_rows = self.snapshots.encode(
+                (to_epoch_ms(sample.get('timestamp')),
+                 {'system': sample.get('system', {}), 'dns': sample.get('dns', {})})
+                for sample in samples)
+        
+        created = set()
+        try:
+            with self.pool.writer() as conn:
+                # One transaction, so that a rollback also drops new partitions
+                conn.execute('BEGIN IMMEDIATE')
+                for partition, rows in self.partitions.split(conn, 'system_monitoring', system_rows, created):
+                    conn.executemany('''
+                        INSERT INTO {table} (
+                            ts, cpu_percent, memory_percent, memory_used, memory_total,
+                            disk_percent, disk_used, disk_total, load_avg_1min, load_avg_5min,
+                            load_avg_15min, network_bytes_sent, network_bytes_recv,
+                            network_upload_speed, network_download_speed, uptime
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    '''.format(table=partition), rows)
+                
+                for partition, rows in self.partitions.split(conn, 'dns_monitoring', dns_rows, created):
+                    conn.executemany('''
+                        INSERT INTO {table} (
+                            ts, bind_running, service_active, total_queries, qps,
+                            queries_per_minute, queries_per_hour, avg_response_time,
+                            config_valid
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    '''.format(table=partition), rows)
+                
+                if query_rows:
+                    # Skip anything at or below the stored checkpoint, e.g. a
+                    # batch retried after its transaction had committed
+                    row = conn.execute('SELECT seq FROM ingest_checkpoint WHERE name = ?',
+                                       ('dns_queries',)).fetchone()
+                    if row is not None:
+                        query_rows = [query for query in query_rows if query[1] > row[0]]
+                    query_rows, line_rows = self.encoder.encode(conn, query_rows)
+                    for partition, rows in self.partitions.split(conn, 'dns_queries', query_rows, created):
+                        conn.executemany('''
+                            INSERT OR REPLACE INTO {table} (
+                                ts, seq, client_id, domain_id, type_id, response_us
+                            ) VALUES (?, ?, ?, ?, ?, ?)
+                        '''.format(table=partition), rows)
+                    for partition, rows in self.partitions.split(conn, 'dns_query_lines', line_rows, created):
+                        conn.executemany('''
+                            INSERT OR REPLACE INTO {table} (ts, seq, raw_line) VALUES (?, ?, ?)
+                        '''.format(table=partition), rows)
+                    
+                    # Add the batch to the per-minute domain / query type counts
+                    for table, count_table_rows in count_rows(query_rows).items():
+                        column = AGGREGATES[table]
+                        for partition, rows in self.partitions.split(conn, table, count_table_rows, created):
+                            conn.executemany(f'''
+                                INSERT INTO {partition} (ts, {column}, count) VALUES (?, ?, ?)
+                                ON CONFLICT(ts, {column}) DO UPDATE SET count = count + excluded.count
+                            ''', rows)
+                
+                # Merge this batch into the 10s/1m/5m/1h rollup buckets
+                self._merge_rollups(conn, rollup_rows(samples))
+                
+                if latest_checkpoint:
+                    conn.execute('''
+                        INSERT INTO ingest_checkpoint (name, seq, positions, updated)
+                        VALUES (?, ?, ?, ?)
+                        ON CONFLICT(name) DO UPDATE SET
+                            seq = MAX(seq, excluded.seq),
+                            positions = CASE WHEN excluded.seq >= seq THEN excluded.positions ELSE positions END,
+                            updated = excluded.updated
+                    ''', (
+                        'dns_queries',
+                        latest_checkpoint['seq'],
+                        json.dumps(latest_checkpoint.get('positions', {})),
+                        to_epoch_ms()
+                    ))
+                
+                for partition, rows in self.partitions.split(conn, 'query_statistics', statistics_rows, created):
+                    conn.executemany('''
+                        INSERT OR REPLACE INTO {table} (
+                            ts, query_type, count, percentage
+                        ) VALUES (?, ?, ?, ?)
+                    '''.format(table=partition), rows)
+                
+                conn.executemany('INSERT OR REPLACE INTO snapshots (ts, keyframe, data) VALUES (?, ?, ?)',
+                                 snapshot_rows)
+            self.partitions.add(created)
+            
+            return True
             
         except Exception as e:
+            # Ids and snapshots of the rolled back transaction are gone
+            self.encoder.clear()
+            if self.snapshots:
+                self.snapshots.reset()
             logger.error(f"Error storing monitoring data: {e}")
-            if conn:
-                conn.close()
+            return False
     
-    def get_system_history(self, hours=24):
-        """Get system monitoring history"""
+    def _merge_rollups(self, conn, rows):
+        """Merge partial aggregates from ``rollup_rows`` into the stored buckets"""
+        conn.executemany('''
+            INSERT INTO metric_rollups (
+                source, tier, ts, metric, min, max, sum, count, last, last_time
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(source, tier, ts, metric) DO UPDATE SET
+                min = MIN(min, excluded.min),
+                max = MAX(max, excluded.max),
+                sum = sum + excluded.sum,
+                count = count + excluded.count,
+                last = CASE WHEN excluded.last_time >= last_time THEN excluded.last ELSE last END,
+                last_time = MAX(last_time, excluded.last_time)
+        ''', rows)
+    
+    def _enable_incremental_vacuum(self):
+        """Switch a database created without incremental auto-vacuum, once
+        
+        New databases get it from the pool; older files need a VACUUM, which
+        rewrites the whole file.
+        """
+        with self.pool.writer() as conn:
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+                return
+            logger.info("Switching the database to incremental auto-vacuum, rewriting it once")
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+    
+    def get_checkpoint(self, name='dns_queries'):
+        """Get the stored ingestion checkpoint ({'seq', 'positions'}) or None"""
         try:
-            conn = sqlite3.connect(str(self.db_path))
-            cursor = conn.cursor()
+            with self.pool.reader() as conn:
+                row = conn.execute('SELECT seq, positions FROM ingest_checkpoint WHERE name = ?',
+                                   (name,)).fetchone()
             
-            start_time = (datetime.now() - timedelta(hours=hours)).isoformat()
+            if row is None:
+                return None
+            return {'seq': row[0], 'positions': json.loads(row[1]) if row[1] else {}}
             
-            cursor.execute('''
-                SELECT timestamp, cpu_percent, memory_percent, disk_percent,
-                       load_avg_1min, network_upload_speed, network_download_speed,
-                       uptime
-                FROM system_monitoring
-                WHERE timestamp >= ?
-                ORDER BY timestamp
-            ''', (start_time,))
+        except Exception as e:
+            logger.error(f"Error getting ingestion checkpoint: {e}")
+            return None
+    
+    def store_latency_histograms(self, histograms, interval=60):
+        """Store (start epoch, LatencyHistogram) pairs covering ``interval`` seconds each"""
+        if not histograms:
+            return
+        try:
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+                
+                for start, histogram in histograms:
+                    stats = histogram.get_stats()
+                    cursor.execute('''
+                        INSERT INTO latency_histograms (
+                            ts, interval, count, p50, p90, p99, p999, max, histogram
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', (
+                        to_epoch_ms(start),
+                        interval,
+                        stats['count'],
+                        stats['p50'],
+                        stats['p90'],
+                        stats['p99'],
+                        stats['p999'],
+                        stats['max'],
+                        json.dumps(histogram.to_dict())
+                    ))
             
-            results = cursor.fetchall()
-            conn.close()
+        except Exception as e:
+            logger.error(f"Error storing latency histograms: {e}")
+    
+    def get_system_history(self, hours=24, points=None):
+        """Get system monitoring history, from a rollup tier when ``points`` asks for fewer rows"""
+        try:
+            resolution = choose_resolution(hours * 3600, points)
+            if resolution > 1:
+                return self.get_rollup_history('system', resolution, hours)
+            
+            with self.pool.reader() as conn:
+                cursor = conn.cursor()
+                
+                start_time = epoch_ms_ago(hours * 3600)
+                
+                # Partitions come oldest first, so results stay in time order
+                results = []
+                for table in self.partitions.covering('system_monitoring', start_time):
+                    cursor.execute('''
+                        SELECT ts, cpu_percent, memory_percent, disk_percent,
+                               load_avg_1min, network_upload_speed, network_download_speed,
+                               uptime
+                        FROM {table}
+                        WHERE ts >= ?
+                        ORDER BY ts
+                    '''.format(table=table), (start_time,))
+                    results.extend(cursor.fetchall())
             
             # Format results
             history = []
             for row in results:
                 history.append({
-                    'timestamp': row[0],
+                    'timestamp': from_epoch_ms(row[0]),
                     'cpu_percent': row[1],
                     'memory_percent': row[2],
                     'disk_percent': row[3],
@@ -251,31 +443,35 @@ class DatabaseManager:
             logger.error(f"Error getting system history: {e}")
             return []
     
-    def get_dns_history(self, hours=24):
-        """Get DNS monitoring history"""
+    def get_dns_history(self, hours=24, points=None):
+        """Get DNS monitoring history, from a rollup tier when ``points`` asks for fewer rows"""
         try:
-            conn = sqlite3.connect(str(self.db_path))
-            cursor = conn.cursor()
-            
-            start_time = (datetime.now() - timedelta(hours=hours)).isoformat()
+            resolution = choose_resolution(hours * 3600, points)
+            if resolution > 1:
+                return self.get_rollup_history('dns', resolution, hours)
             
-            cursor.execute('''
-                SELECT timestamp, bind_running, service_active, total_queries,
-                       qps, queries_per_minute, queries_per_hour, avg_response_time,
-                       config_valid
-                FROM dns_monitoring
-                WHERE timestamp >= ?
-                ORDER BY timestamp
-            ''', (start_time,))
-            
-            results = cursor.fetchall()
-            conn.close()
+            with self.pool.reader() as conn:
+                cursor = conn.cursor()
+                
+                start_time = epoch_ms_ago(hours * 3600)
+                
+                results = []
+                for table in self.partitions.covering('dns_monitoring', start_time):
+                    cursor.execute('''
+                        SELECT ts, bind_running, service_active, total_queries,
+                               qps, queries_per_minute, queries_per_hour, avg_response_time,
+                               config_valid
+                        FROM {table}
+                        WHERE ts >= ?
+                        ORDER BY ts
+                    '''.format(table=table), (start_time,))
+                    results.extend(cursor.fetchall())
             
             # Format results
             history = []
             for row in results:
                 history.append({
-                    'timestamp': row[0],
+                    'timestamp': from_epoch_ms(row[0]),
                     'bind_running': row[1],
                     'service_active': row[2],
                     'total_queries': row[3],
@@ -292,61 +488,194 @@ class DatabaseManager:
             logger.error(f"Error getting DNS history: {e}")
             return []
     
-    def get_query_history(self, hours=24, limit=1000):
-        """Get DNS query history"""
+    def get_rollup_history(self, source, tier, hours=24):
+        """Get one history point per ``tier`` second bucket with min/max per metric"""
         try:
-            conn = sqlite3.connect(str(self.db_path))
-            cursor = conn.cursor()
+            with self.pool.reader() as conn:
+                cursor = conn.cursor()
+                
+                start_time = epoch_ms_ago(hours * 3600) // (tier * 1000) * (tier * 1000)
+                
+                cursor.execute('''
+                    SELECT ts, metric, min, max, sum, count, last
+                    FROM metric_rollups
+                    WHERE source = ? AND tier = ? AND ts >= ?
+                    ORDER BY ts
+                ''', (source, tier, start_time))
+                
+                results = cursor.fetchall()
+            
+            return pivot_rows(source, tier, results)
             
-            start_time = (datetime.now() - timedelta(hours=hours)).isoformat()
+        except Exception as e:
+            logger.error(f"Error getting {source} rollup history: {e}")
+            return []
+    
+    def get_snapshot(self, at):
+        """Get the stored snapshot nearest to ``at`` (epoch ms), None if there is none"""
+        try:
+            with self.pool.reader() as conn:
+                cursor = conn.cursor()
+                
+                before = cursor.execute('SELECT MAX(ts) FROM snapshots WHERE ts <= ?', (at,)).fetchone()[0]
+                after = cursor.execute('SELECT MIN(ts) FROM snapshots WHERE ts >= ?', (at,)).fetchone()[0]
+                if before is None and after is None:
+                    return None
+                if after is None or (before is not None and at - before <= after - at):
+                    ts = before
+                else:
+                    ts = after
+                
+                # Replay the deltas from the preceding keyframe
+                keyframe = cursor.execute('SELECT MAX(ts) FROM snapshots WHERE keyframe = 1 AND ts <= ?',
+                                          (ts,)).fetchone()[0]
+                if keyframe is None:
+                    return None
+                cursor.execute('''
+                    SELECT keyframe, data
+                    FROM snapshots
+                    WHERE ts >= ? AND ts <= ?
+                    ORDER BY ts
+                ''', (keyframe, ts))
+                
+                results = cursor.fetchall()
             
-            cursor.execute('''
-                SELECT timestamp, client_ip, domain, query_type, response_time
-                FROM dns_queries
-                WHERE timestamp >= ?
-                ORDER BY timestamp DESC
-                LIMIT ?
-            ''', (start_time, limit))
+            snapshot = decode_snapshot(results)
+            snapshot['timestamp'] = from_epoch_ms(ts)
+            return snapshot
             
-            results = cursor.fetchall()
-            conn.close()
+        except Exception as e:
+            logger.error(f"Error getting snapshot: {e}")
+            return None
+    
+    def get_latency_history(self, hours=24):
+        """Get per-interval latency percentiles with their serialized histograms"""
+        try:
+            with self.pool.reader() as conn:
+                cursor = conn.cursor()
+                
+                start_time = epoch_ms_ago(hours * 3600)
+                
+                cursor.execute('''
+                    SELECT ts, interval, count, p50, p90, p99, p999, max, histogram
+                    FROM latency_histograms
+                    WHERE ts >= ?
+                    ORDER BY ts
+                ''', (start_time,))
+                
+                results = cursor.fetchall()
             
             # Format results
             history = []
             for row in results:
                 history.append({
-                    'timestamp': row[0],
-                    'client_ip': row[1],
-                    'domain': row[2],
-                    'query_type': row[3],
-                    'response_time': row[4]
+                    'timestamp': from_epoch_ms(row[0]),
+                    'interval': row[1],
+                    'count': row[2],
+                    'p50': row[3],
+                    'p90': row[4],
+                    'p99': row[5],
+                    'p999': row[6],
+                    'max': row[7],
+                    'histogram': json.loads(row[8])
                 })
             
             return history
             
         except Exception as e:
-            logger.error(f"Error getting query history: {e}")
+            logger.error(f"Error getting latency history: {e}")
             return []
     
-    def get_top_domains(self, hours=24, limit=10):
-        """Get top queried domains"""
+    def get_query_history(self, hours=24, limit=1000):
+        """Get DNS query history"""
         try:
-            conn = sqlite3.connect(str(self.db_path))
-            cursor = conn.cursor()
+            with self.pool.reader() as conn:
+                cursor = conn.cursor()
+                
+                start_time = epoch_ms_ago(hours * 3600)
+                
+                # Newest partition first, until ``limit`` rows are found
+                results = []
+                for table in reversed(self.partitions.covering('dns_queries', start_time)):
+                    cursor.execute('''
+                        SELECT q.ts, c.address, d.name, t.name, q.response_us
+                        FROM {table} q
+                        LEFT JOIN clients c ON c.id = q.client_id
+                        LEFT JOIN domains d ON d.id = q.domain_id
+                        LEFT JOIN query_types t ON t.id = q.type_id
+                        WHERE q.ts >= ?
+                        ORDER BY q.ts DESC
+                        LIMIT ?
+                    '''.format(table=table), (start_time, limit - len(results)))
+                    results.extend(cursor.fetchall())
+                    if len(results) >= limit:
+                        break
             
-            start_time = (datetime.now() - timedelta(hours=hours)).isoformat()
+            # Format results
+            history = []
+            for row in results:
+                history.append({
+                    'timestamp': from_epoch_ms(row[0]),
+                    'client_ip': unpack_ip(row[1]) if row[1] is not None else '',
+                    'domain': row[2] or '',
+                    'query_type': row[3] or '',
+                    'response_time': row[4] / 1000.0 if row[4] is not None else None
+                })
+            
+            return history
+            
+        except Exception as e:
+            logger.error(f"Error getting query history: {e}")
+            return []
+    
+    def _window_counts(self, aggregate, start_time, end_time):
+        """SELECT of (id, count) rows for the queries in [start_time, end_time)
+        and its parameters: whole minutes come from the ``aggregate`` table,
+        the partial minutes at either end from dns_queries"""
+        column = AGGREGATES[aggregate]
+        minutes, partial_ranges = split_window(start_time, end_time)
+        selects = []
+        params = []
+        if minutes:
+            for table in self.partitions.covering(aggregate, *minutes):
+                selects.append(f'SELECT {column} AS id, count FROM {table} WHERE ts >= ? AND ts < ?')
+                params.extend(minutes)
+        for low, high in partial_ranges:
+            for table in self.partitions.covering('dns_queries', low, high):
+                selects.append(f'SELECT {column} AS id, 1 AS count FROM {table} '
+                               f'WHERE ts >= ? AND ts < ? AND {column} IS NOT NULL')
+                params.extend((low, high))
+        return ' UNION ALL '.join(selects), params
+    
+    def get_top_domains(self, hours=24, limit=10, start=None, end=None):
+        """Get top queried domains of the last ``hours``, or of [start, end)
+        in epoch ms"""
+        try:
+            end_time = to_epoch_ms() if end is None else end
+            start_time = end_time - hours * 3600 * 1000 if start is None else start
             
-            cursor.execute('''
-                SELECT domain, COUNT(*) as count
-                FROM dns_queries
-                WHERE timestamp >= ? AND domain != ''
-                GROUP BY domain
-                ORDER BY count DESC
-                LIMIT ?
-            ''', (start_time, limit))
+            counts, params = self._window_counts('domain_counts', start_time, end_time)
+            if not counts:
+                return []
             
-            results = cursor.fetchall()
-            conn.close()
+            with self.pool.reader() as conn:
+                cursor = conn.cursor()
+                
+                # Sum ids first, names are only looked up for the winners
+                cursor.execute(f'''
+                    SELECT d.name, top.count
+                    FROM (
+                        SELECT id, SUM(count) as count
+                        FROM ({counts})
+                        GROUP BY id
+                        ORDER BY count DESC
+                        LIMIT ?
+                    ) top
+                    JOIN domains d ON d.id = top.id
+                    ORDER BY top.count DESC
+                ''', params + [limit])
+                
+                results = cursor.fetchall()
             
             # Format results
             top_domains = []
@@ -362,24 +691,32 @@ class DatabaseManager:
             logger.error(f"Error getting top domains: {e}")
             return []
     
-    def get_query_type_stats(self, hours=24):
-        """Get query type statistics"""
+    def get_query_type_stats(self, hours=24, start=None, end=None):
+        """Get query type statistics of the last ``hours``, or of [start, end)
+        in epoch ms"""
         try:
-            conn = sqlite3.connect(str(self.db_path))
-            cursor = conn.cursor()
+            end_time = to_epoch_ms() if end is None else end
+            start_time = end_time - hours * 3600 * 1000 if start is None else start
             
-            start_time = (datetime.now() - timedelta(hours=hours)).isoformat()
+            counts, params = self._window_counts('query_type_counts', start_time, end_time)
+            if not counts:
+                return {}
             
-            cursor.execute('''
-                SELECT query_type, COUNT(*) as count
-                FROM dns_queries
-                WHERE timestamp >= ? AND query_type != ''
-                GROUP BY query_type
-                ORDER BY count DESC
-            ''', (start_time,))
-            
-            results = cursor.fetchall()
-            conn.close()
+            with self.pool.reader() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute(f'''
+                    SELECT t.name, totals.count
+                    FROM (
+                        SELECT id, SUM(count) as count
+                        FROM ({counts})
+                        GROUP BY id
+                    ) totals
+                    JOIN query_types t ON t.id = totals.id
+                    ORDER BY totals.count DESC
+                ''', params)
+                
+                results = cursor.fetchall()
             
             # Calculate percentages
             total = sum(row[1] for row in results)
@@ -398,68 +735,151 @@ class DatabaseManager:
             logger.error(f"Error getting query type stats: {e}")
             return {}
     
-    def cleanup_old_data(self, days=30):
-        """Clean up old monitoring data"""
+    def cleanup_old_data(self, days=30, query_days=7):
+        """Clean up old monitoring data, returns {'dropped_partitions', 'deleted_rows'}
+
+        Day partitions holding only expired rows are dropped whole. Legacy
+        unpartitioned tables are emptied an hour of data per transaction and
+        dropped once empty.
+        """
+        summary = {'dropped_partitions': 0, 'deleted_rows': 0}
         try:
-            conn = sqlite3.connect(str(self.db_path))
-            cursor = conn.cursor()
-            
-            cutoff_time = (datetime.now() - timedelta(days=days)).isoformat()
-            
-            # Clean up old system monitoring data
-            cursor.execute('DELETE FROM system_monitoring WHERE timestamp < ?', (cutoff_time,))
-            
-            # Clean up old DNS monitoring data
-            cursor.execute('DELETE FROM dns_monitoring WHERE timestamp < ?', (cutoff_time,))
-            
-            # Clean up old DNS queries (keep more recent data)
-            query_cutoff = (datetime.now() - timedelta(days=7)).isoformat()
-            cursor.execute('DELETE FROM dns_queries WHERE timestamp < ?', (query_cutoff,))
-            
-            # Clean up old query statistics
-            cursor.execute('DELETE FROM query_statistics WHERE timestamp < ?', (cutoff_time,))
+            cutoff_time = epoch_ms_ago(days * 86400)
+            
+            # DNS queries are kept for a shorter time
+            query_cutoff = epoch_ms_ago(query_days * 86400)
+            
+            cutoffs = {
+                'system_monitoring': cutoff_time,
+                'dns_monitoring': cutoff_time,
+                'query_statistics': cutoff_time,
+                'dns_queries': query_cutoff,
+                'dns_query_lines': query_cutoff,
+                'domain_counts': query_cutoff,
+                'query_type_counts': query_cutoff
+            }
+            for table, cutoff in cutoffs.items():
+                for day in self.partitions.expired(table, cutoff):
+                    # Forgotten first so readers stop routing to it
+                    self.partitions.discard(table, day)
+                    with self.pool.writer() as conn:
+                        conn.execute(f'DROP TABLE IF EXISTS {partition_name(table, day)}')
+                    summary['dropped_partitions'] += 1
+                if self.partitions.has_legacy(table):
+                    summary['deleted_rows'] += self._expire_legacy_rows(table, cutoff)
+            
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+                
+                # Clean up dictionary entries no remaining query or count refers
+                # to; the oldest kept partition starts at the day of the cutoff
+                dictionary_cutoff = partition_day(query_cutoff) * DAY_MS - LAST_SEEN_GRANULARITY_MS
+                for table in ('domains', 'clients', 'query_types'):
+                    cursor.execute(f'DELETE FROM {table} WHERE last_seen < ?', (dictionary_cutoff,))
+                    summary['deleted_rows'] += cursor.rowcount
+                self.encoder.clear()
+                
+                # Clean up old snapshots, keeping the keyframe the first
+                # remaining deltas are based on
+                cursor.execute('''
+                    DELETE FROM snapshots
+                    WHERE ts < (SELECT MAX(ts) FROM snapshots WHERE keyframe = 1 AND ts <= ?)
+                ''', (cutoff_time,))
+                summary['deleted_rows'] += cursor.rowcount
+                
+                # Clean up old latency histograms
+                cursor.execute('DELETE FROM latency_histograms WHERE ts < ?', (cutoff_time,))
+                summary['deleted_rows'] += cursor.rowcount
+                
+                # Clean up rollups, coarser tiers are kept longer (sources are
+                # listed so the delete can use the primary key)
+                for tier, retention_days in TIER_RETENTION_DAYS.items():
+                    tier_cutoff = epoch_ms_ago(retention_days * 86400)
+                    cursor.execute('''
+                        DELETE FROM metric_rollups
+                        WHERE source IN ('system', 'dns') AND tier = ? AND ts < ?
+                    ''', (tier, tier_cutoff))
+                    summary['deleted_rows'] += cursor.rowcount
             
-            conn.commit()
-            conn.close()
+            if summary['dropped_partitions']:
+                # Return the freed pages to the file system
+                with self.pool.writer() as conn:
+                    conn.execute('PRAGMA incremental_vacuum').fetchall()
             
-            logger.info(f"Cleaned up data older than {days} days")
+            logger.info(f"Cleaned up data older than {days} days (queries: {query_days} days): "
+                        f"{summary['dropped_partitions']} partitions dropped, "
+                        f"{summary['deleted_rows']} rows deleted")
             
         except Exception as e:
             logger.error(f"Error cleaning up old data: {e}")
+        
+        return summary
+    
+    def _expire_legacy_rows(self, table, cutoff, step=3600 * 1000):
+        """Delete rows of a legacy unpartitioned table older than ``cutoff``
+        ``step`` ms at a time, dropping the table once it is empty"""
+        deleted = 0
+        while True:
+            with self.pool.writer() as conn:
+                oldest = conn.execute(f'SELECT MIN(ts) FROM {table}').fetchone()[0]
+                if oldest is None:
+                    self.partitions.discard(table)
+                    conn.execute(f'DROP TABLE {table}')
+                    return deleted
+                if oldest >= cutoff:
+                    return deleted
+                cursor = conn.execute(f'DELETE FROM {table} WHERE ts < ?', (min(cutoff, oldest + step),))
+                deleted += cursor.rowcount
     
     def get_database_stats(self):
         """Get database statistics"""
         try:
-            conn = sqlite3.connect(str(self.db_path))
-            cursor = conn.cursor()
-            
-            stats = {}
-            
-            # Get table row counts
-            tables = ['system_monitoring', 'dns_monitoring', 'dns_queries', 'query_statistics']
-            for table in tables:
-                cursor.execute(f'SELECT COUNT(*) FROM {table}')
-                stats[f'{table}_count'] = cursor.fetchone()[0]
-            
-            # Get database size
-            cursor.execute("SELECT page_count * page_size as size FROM pragma_page_count(), pragma_page_size()")
-            stats['database_size'] = cursor.fetchone()[0]
-            
-            # Get oldest and newest timestamps
-            cursor.execute('SELECT MIN(timestamp), MAX(timestamp) FROM system_monitoring')
-            result = cursor.fetchone()
-            stats['oldest_system_data'] = result[0]
-            stats['newest_system_data'] = result[1]
-            
-            cursor.execute('SELECT MIN(timestamp), MAX(timestamp) FROM dns_queries')
-            result = cursor.fetchone()
-            stats['oldest_query_data'] = result[0]
-            stats['newest_query_data'] = result[1]
+            with self.pool.reader() as conn:
+                cursor = conn.cursor()
+                
+                stats = {}
+                
+                # Get table row counts, summed over partitions
+                tables = ['system_monitoring', 'dns_monitoring', 'dns_queries', 'query_statistics',
+                          'latency_histograms', 'dns_query_lines', 'domains', 'clients',
+                          'domain_counts', 'query_type_counts', 'snapshots']
+                for table in tables:
+                    count = 0
+                    names = self.partitions.covering(table) if table in PARTITIONED_TABLES else [table]
+                    for name in names:
+                        cursor.execute(f'SELECT COUNT(*) FROM {name}')
+                        count += cursor.fetchone()[0]
+                    stats[f'{table}_count'] = count
+                
+                # Get database size
+                cursor.execute("SELECT page_count * page_size as size FROM pragma_page_count(), pragma_page_size()")
+                stats['database_size'] = cursor.fetchone()[0]
+                
+                # Get oldest and newest timestamps
+                oldest, newest = self._time_range(cursor, 'system_monitoring')
+                stats['oldest_system_data'] = from_epoch_ms(oldest)
+                stats['newest_system_data'] = from_epoch_ms(newest)
+                
+                oldest, newest = self._time_range(cursor, 'dns_queries')
+                stats['oldest_query_data'] = from_epoch_ms(oldest)
+                stats['newest_query_data'] = from_epoch_ms(newest)
             
-            conn.close()
+            stats['partitions'] = self.partitions.get_stats()
+            stats['connection_pool'] = self.pool.get_stats()
             
             return stats
             
         except Exception as e:
             logger.error(f"Error getting database stats: {e}")
-            return {}
\ No newline at end of file
+            return {}
+    
+    def _time_range(self, cursor, table):
+        """Oldest and newest ts over the partitions of ``table``"""
+        oldest = newest = None
+        for name in self.partitions.covering(table):
+            cursor.execute(f'SELECT MIN(ts), MAX(ts) FROM {name}')
+            low, high = cursor.fetchone()
+            if low is not None:
+                oldest = low if oldest is None else min(oldest, low)
+                newest = high if newest is None else max(newest, high)
+        return oldest, newest
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Delta Stream Module
+Numbered keyframes and deltas of a published value for WebSocket clients
+"""
+
+import json
+import time
+from collections import deque
+
+from json_delta import diff
+
+# Version of the frame format, sent in every frame as ``v``
+PROTOCOL_VERSION = 2
+
+
+class DeltaStream:
+    """Successive values of one payload as numbered frames
+
+    A keyframe ``{"v", "seq", "data"}`` carries the whole value. A delta
+    frame ``{"v", "seq", "base", "delta"}`` carries the ``json_delta`` diff
+    from the value numbered ``base`` to the value numbered ``seq``. Clients
+    start from a keyframe and apply the deltas whose ``base`` is the
+    sequence number they hold; on a gap they ask for a keyframe again.
+    A value equal to the previous one sends nothing. Keyword ``fields``
+    (such as the topic) are sent in every frame.
+
+    ``advance`` is called by one thread; ``keyframe`` from any.
+    """
+
+    def __init__(self, window=60, **fields):
+        self.fields = fields
+        self._header = ''.join(f'{json.dumps(name)}:{json.dumps(value)},' for name, value in fields.items())
+        # (seq, value, keyframe JSON), swapped whole on advance
+        self._latest = None
+        # (monotonic time, full bytes, delta bytes) of recent frames
+        self._frames = deque(maxlen=window)
+        self.keyframes_sent = 0
+
+    def advance(self, value, text):
+        """Make ``value``, serialized as ``text``, the latest and return the
+        JSON of the delta frame from the previous one (a keyframe the first
+        time), None when nothing changed"""
+        previous = self._latest
+        if previous is None:
+            delta = None
+        else:
+            delta = diff(previous[1], value)
+            if not delta:
+                # Nothing to send, and the sequence stays gapless
+                self._frames.append((time.monotonic(), len(previous[2].encode('utf-8')), 0))
+                return None
+        seq = previous[0] + 1 if previous else 1
+        keyframe = f'{{"v":{PROTOCOL_VERSION},{self._header}"seq":{seq},"data":{text}}}'
+        self._latest = (seq, value, keyframe)
+        if previous is None:
+            frame = keyframe
+        else:
+            frame = json.dumps({
+                'v': PROTOCOL_VERSION,
+                **self.fields,
+                'seq': seq,
+                'base': previous[0],
+                'delta': delta
+            }, separators=(',', ':'), default=str)
+        self._frames.append((time.monotonic(), len(keyframe.encode('utf-8')), len(frame.encode('utf-8'))))
+        return frame
+
+    def keyframe(self):
+        """JSON of the keyframe of the latest value, None before the first"""
+        latest = self._latest
+        if latest is None:
+            return None
+        self.keyframes_sent += 1
+        return latest[2]
+
+    def get_stats(self):
+        """Sequence number and the bytes per second each client receives with
+        deltas against resending the whole value every frame"""
+        frames = list(self._frames)
+        stats = {
+            'protocol_version': PROTOCOL_VERSION,
+            'seq': self._latest[0] if self._latest else 0,
+            'keyframes_sent': self.keyframes_sent,
+            'last_full_bytes': frames[-1][1] if frames else 0,
+            'last_delta_bytes': frames[-1][2] if frames else 0,
+            'full_bytes_per_sec': 0.0,
+            'delta_bytes_per_sec': 0.0
+        }
+        if len(frames) > 1:
+            elapsed = frames[-1][0] - frames[0][0]
+            if elapsed > 0:
+                # Bytes of the frames after the first over the time they span
+                stats['full_bytes_per_sec'] = round(sum(full for _, full, _ in frames[1:]) / elapsed, 1)
+                stats['delta_bytes_per_sec'] = round(sum(delta for _, _, delta in frames[1:]) / elapsed, 1)
+        return stats
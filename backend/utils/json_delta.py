@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON Delta Module
+Deltas between JSON objects, for storing and sending only what changed
+"""
+
+
+def diff(old, new):
+    """Delta turning dict ``old`` into dict ``new``
+
+    ``s`` maps keys to their new values, ``d`` lists removed keys and ``p``
+    holds the deltas of nested dicts. A list that only gained items at the
+    front (such as newest first query lists) goes in ``h`` as the new items
+    and how many of the old ones it keeps. Empty parts are left out, so
+    equal dicts give ``{}``. Other lists and values are replaced whole.
+    """
+    delta = {}
+    for key, value in new.items():
+        if key not in old:
+            delta.setdefault('s', {})[key] = value
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            nested = diff(old[key], value)
+            if nested:
+                delta.setdefault('p', {})[key] = nested
+        elif isinstance(value, list) and isinstance(old[key], list):
+            if value == old[key]:
+                continue
+            added = _added_head(old[key], value)
+            if added is None:
+                delta.setdefault('s', {})[key] = value
+            else:
+                delta.setdefault('h', {})[key] = [value[:added], len(value) - added]
+        elif old[key] != value or type(old[key]) is not type(value):
+            delta.setdefault('s', {})[key] = value
+    removed = [key for key in old if key not in new]
+    if removed:
+        delta['d'] = removed
+    return delta
+
+
+def patch(old, delta):
+    """Apply a delta from ``diff`` to ``old``, returns the new dict and leaves ``old`` unchanged"""
+    new = dict(old)
+    for key in delta.get('d', ()):
+        new.pop(key, None)
+    new.update(delta.get('s', {}))
+    for key, nested in delta.get('p', {}).items():
+        new[key] = patch(old[key], nested)
+    for key, (added, keep) in delta.get('h', {}).items():
+        new[key] = added + old[key][:keep]
+    return new
+
+
+def _added_head(old, new):
+    """Number of items ``new`` added in front of the start of ``old``, None
+    if ``new`` is not that or would not be smaller sent that way"""
+    if not old:
+        return None
+    first = old[0]
+    for added, item in enumerate(new):
+        if item == first and type(item) is type(first):
+            kept = new[added:]
+            # Sending as many new items as the list keeps saves nothing
+            if added < len(kept) and kept == old[:len(kept)]:
+                return added
+            return None
+    return None
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Latest Store Module
+Latest value published by each collector, shared by the API and WebSocket
+"""
+
+import json
+import time
+import hashlib
+import threading
+
+
+class Published:
+    """One published value
+
+    Values published with ``serialize`` also carry their JSON encoding
+    (``text`` and UTF-8 ``body``) and a strong ETag of it, computed once at
+    publish time however many readers fetch them.
+    """
+
+    __slots__ = ('value', 'published', 'text', 'body', 'etag')
+
+    def __init__(self, value, serialize=False):
+        self.value = value
+        self.published = time.monotonic()
+        self.text = None
+        self.body = None
+        self.etag = None
+        if serialize:
+            self.text = json.dumps(value, separators=(',', ':'), default=str)
+            self.body = self.text.encode('utf-8')
+            self.etag = hashlib.blake2b(self.body, digest_size=8).hexdigest()
+
+
+class LatestStore:
+    """Latest value published under each name
+
+    ``publish`` swaps in a new dict instead of changing the current one, so
+    readers never lock and never see a half-applied update. Published
+    values must not be mutated afterwards.
+    """
+
+    def __init__(self):
+        # name -> Published
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def publish(self, name, value, serialize=False):
+        """Replace the value published under ``name``, serializing it for readers if asked"""
+        entry = Published(value, serialize)
+        with self._lock:
+            values = dict(self._values)
+            values[name] = entry
+            self._values = values
+        return entry
+
+    def get(self, name, default=None):
+        """Latest value published under ``name``"""
+        entry = self._values.get(name)
+        return default if entry is None else entry.value
+
+    def get_published(self, name):
+        """Latest ``Published`` entry under ``name``, None if there is none"""
+        return self._values.get(name)
+
+    def get_stats(self):
+        """Seconds since each value was published"""
+        now = time.monotonic()
+        return {name: round(now - entry.published, 3) for name, entry in self._values.items()}
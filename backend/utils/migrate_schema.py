@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Schema Migration Module
+Converts databases written by older versions to the current schema: TEXT
+ISO timestamps become epoch milliseconds and dns_queries is dictionary
+encoded
+
+Usage: python3 migrate_schema.py [--db backend/data/dns_monitor.db] [--batch-size 5000] [--pause 0.05]
+
+Safe to run next to a monitor that still runs the previous version; that
+monitor's writes start failing once the tables have been swapped, so restart
+it on the new version when the migration is done.
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+from pathlib import Path
+
+from sqlite_pool import SQLitePool
+from schema import (TABLES, PARTITIONED_TABLES, LEGACY_TIME_COLUMNS, LEGACY_COLUMNS,
+                    create_table_sql, create_index_sqls)
+from timestamps import to_epoch_ms
+from query_encoding import QueryEncoder
+
+logger = logging.getLogger(__name__)
+
+# Tables updated in place rather than appended to. They are small and are
+# copied whole inside the swap transaction so that no update is missed
+MUTABLE_TABLES = ('ingest_checkpoint', 'metric_rollups')
+
+PROGRESS_TABLE = 'schema_migration'
+
+
+class SchemaMigration:
+    """Rebuilds legacy tables with the current schema, online
+
+    Each legacy table is copied into ``<table>_v2`` (created with its final
+    indexes) ``batch_size`` rows at a time in rowid order. Every batch is its
+    own short write transaction that also records the last copied rowid, and
+    is followed by ``pause`` seconds so other writers get the database; an
+    interrupted migration resumes from the recorded rowid. Once every table
+    has caught up, a single transaction copies the rows written meanwhile and
+    replaces all legacy tables with their copies.
+    """
+
+    def __init__(self, pool, batch_size=5000, pause=0.05):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.pause = pause
+        self.copied = 0
+        self.skipped = 0
+        self.encoder = QueryEncoder()
+
+    def pending_tables(self):
+        """Tables that still have a legacy layout"""
+        pending = []
+        with self.pool.writer() as conn:
+            for table in TABLES:
+                for row in conn.execute(f'PRAGMA table_info({table})'):
+                    if ((row[1] in LEGACY_TIME_COLUMNS and row[2].upper() == 'TEXT')
+                            or row[1] == LEGACY_COLUMNS.get(table)):
+                        pending.append(table)
+                        break
+        return pending
+
+    def run(self):
+        """Migrate every pending table, returns the number of rows copied"""
+        pending = self.pending_tables()
+        if not pending:
+            return 0
+
+        with self.pool.writer() as conn:
+            conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {PROGRESS_TABLE} (
+                    name TEXT PRIMARY KEY,
+                    last_rowid INTEGER NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            # Tables new in this layout, e.g. the query dictionaries
+            for table in TABLES:
+                if table not in pending and table not in PARTITIONED_TABLES:
+                    conn.execute(create_table_sql(table))
+
+        positions = {table: self._backfill(table) for table in pending}
+
+        # Swap every table at once, so other writers see a single cut-over
+        started = time.monotonic()
+        with self.pool.writer() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            for table, last_rowid in positions.items():
+                target = f'{table}_v2'
+                if table in MUTABLE_TABLES:
+                    self._copy_rows(conn, target, conn.execute(f'SELECT * FROM {table}'))
+                else:
+                    # Rows written since the last batch
+                    count = self.batch_size
+                    while count == self.batch_size:
+                        count, last_rowid = self._copy_batch(conn, table, target, last_rowid)
+                conn.execute(f'DROP TABLE {table}')
+                conn.execute(f'ALTER TABLE {target} RENAME TO {table}')
+            conn.execute(f'DROP TABLE {PROGRESS_TABLE}')
+        logger.info(f"Swapped {', '.join(pending)} in {time.monotonic() - started:.2f}s")
+
+        if self.skipped:
+            logger.warning(f"Skipped {self.skipped} rows with unreadable timestamps")
+        return self.copied
+
+    def _backfill(self, table):
+        """Create ``<table>_v2`` and copy the rows present so far, returns the last rowid copied"""
+        target = f'{table}_v2'
+        started = time.monotonic()
+        copied = self.copied
+
+        with self.pool.writer() as conn:
+            conn.execute(create_table_sql(table, target))
+            for sql in create_index_sqls(table, target):
+                conn.execute(sql)
+            row = conn.execute(f'SELECT last_rowid FROM {PROGRESS_TABLE} WHERE name = ?',
+                               (table,)).fetchone()
+        last_rowid = row[0] if row else 0
+
+        if table in MUTABLE_TABLES:
+            return last_rowid
+
+        while True:
+            with self.pool.writer() as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                count, last_rowid = self._copy_batch(conn, table, target, last_rowid)
+            if count < self.batch_size:
+                break
+            time.sleep(self.pause)
+
+        logger.info(f"Copied {self.copied - copied} rows of {table} in "
+                    f"{time.monotonic() - started:.1f}s")
+        return last_rowid
+
+    def _copy_batch(self, conn, table, target, last_rowid):
+        """Copy the next batch after ``last_rowid``, returns (rows read, new last rowid)"""
+        cursor = conn.execute(f'SELECT rowid, * FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?',
+                              (last_rowid, self.batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            return 0, last_rowid
+        self._copy_rows(conn, target, rows, [column[0] for column in cursor.description[1:]], 1)
+        last_rowid = rows[-1][0]
+        conn.execute(f'''
+            INSERT INTO {PROGRESS_TABLE} (name, last_rowid) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET last_rowid = excluded.last_rowid
+        ''', (table, last_rowid))
+        return len(rows), last_rowid
+
+    def _copy_rows(self, conn, target, rows, columns=None, offset=0):
+        """Insert legacy ``rows`` into ``target``, converting the time columns"""
+        if columns is None:
+            columns = [column[0] for column in rows.description]
+        if target == 'dns_queries_v2':
+            self._copy_queries(conn, rows, columns, offset)
+            return
+        target_columns = {row[1] for row in conn.execute(f'PRAGMA table_info({target})')}
+
+        # (position in the legacy row, converted to epoch ms)
+        picks = []
+        names = []
+        for position, column in enumerate(columns, offset):
+            name = LEGACY_TIME_COLUMNS.get(column, column)
+            if name in target_columns:
+                picks.append((position, column in LEGACY_TIME_COLUMNS))
+                names.append(name)
+
+        converted = []
+        for row in rows:
+            try:
+                converted.append(tuple(
+                    to_epoch_ms(row[position]) if is_time and row[position] is not None else row[position]
+                    for position, is_time in picks))
+            except (TypeError, ValueError):
+                self.skipped += 1
+
+        conn.executemany(f'INSERT OR REPLACE INTO {target} ({", ".join(names)}) '
+                         f'VALUES ({", ".join("?" * len(names))})', converted)
+        self.copied += len(converted)
+
+    def _copy_queries(self, conn, rows, columns, offset):
+        """Dictionary encode legacy ``dns_queries`` rows into ``dns_queries_v2``"""
+        position = {column: index for index, column in enumerate(columns, offset)}
+        time_column = 'ts' if 'ts' in position else 'timestamp'
+        queries = []
+        for row in rows:
+            try:
+                ts = row[position[time_column]]
+                if isinstance(ts, str):
+                    ts = to_epoch_ms(ts)
+                seq = row[position['seq']] if 'seq' in position else None
+                queries.append((
+                    ts,
+                    # Rows stored before sequence numbers existed get negative
+                    # ones, which never collide with those of the monitor
+                    -row[position['id']] if seq is None else seq,
+                    row[position['client_ip']],
+                    row[position['domain']],
+                    row[position['query_type']],
+                    row[position['response_time']],
+                    row[position['raw_line']]
+                ))
+            except (TypeError, ValueError):
+                self.skipped += 1
+
+        query_rows, line_rows = self.encoder.encode(conn, queries)
+        conn.executemany('''
+            INSERT OR REPLACE INTO dns_queries_v2 (
+                ts, seq, client_id, domain_id, type_id, response_us
+            ) VALUES (?, ?, ?, ?, ?, ?)
+        ''', query_rows)
+        if line_rows:
+            # Kept next to the migrated rows, which stay unpartitioned
+            conn.execute(create_table_sql('dns_query_lines'))
+            conn.executemany('''
+                INSERT OR REPLACE INTO dns_query_lines (ts, seq, raw_line) VALUES (?, ?, ?)
+            ''', line_rows)
+        self.copied += len(query_rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=os.path.join(os.path.dirname(__file__), '..', 'data', 'dns_monitor.db'))
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--pause', type=float, default=0.05,
+                        help='seconds to sleep between batches')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if not Path(args.db).exists():
+        logger.error(f"Database {args.db} does not exist")
+        sys.exit(1)
+
+    pool = SQLitePool(args.db)
+    try:
+        migration = SchemaMigration(pool, args.batch_size, args.pause)
+        pending = migration.pending_tables()
+        if not pending:
+            logger.info("Database already uses the current schema")
+            return
+        logger.info(f"Migrating {', '.join(pending)}")
+        copied = migration.run()
+        logger.info(f"Migration finished, {copied} rows copied")
+    finally:
+        pool.close()
+
+
+if __name__ == '__main__':
+    main()
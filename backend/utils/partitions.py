@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Partitions Module
+Day partitions of the large tables: routing rows and range scans to them
+"""
+
+import re
+import threading
+from datetime import datetime, timezone
+
+from schema import PARTITIONED_TABLES, create_table_sql, create_index_sqls
+
+DAY_MS = 86400 * 1000
+
+
+def partition_day(ts):
+    """UTC day number of epoch milliseconds"""
+    return ts // DAY_MS
+
+
+def partition_name(table, day):
+    """``<table>_YYYYMMDD`` of a UTC day number"""
+    return f"{table}_{datetime.fromtimestamp(day * 86400, timezone.utc):%Y%m%d}"
+
+
+class PartitionSet:
+    """Day partitions that exist for each partitioned table
+
+    Partitions live in the main database file, so one transaction still
+    covers rows of every table (queries and their ingestion checkpoint).
+    The writer creates partitions on first use and records them with
+    ``add`` once its transaction has committed, so readers never see a
+    partition that does not exist yet. Readers get the partitions
+    overlapping a time range, oldest first, with the legacy unpartitioned
+    table (if any) ahead of them.
+    """
+
+    def __init__(self):
+        self._days = {table: set() for table in PARTITIONED_TABLES}
+        self._legacy = set()
+        self._lock = threading.Lock()
+
+    def load(self, conn):
+        """Read the existing partitions from the schema"""
+        days = {table: set() for table in PARTITIONED_TABLES}
+        legacy = set()
+        patterns = {table: re.compile(rf'^{table}_(\d{{8}})$') for table in PARTITIONED_TABLES}
+        for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'"):
+            if name in days:
+                legacy.add(name)
+                continue
+            for table, pattern in patterns.items():
+                match = pattern.match(name)
+                if match:
+                    date = datetime.strptime(match.group(1), '%Y%m%d').replace(tzinfo=timezone.utc)
+                    days[table].add(int(date.timestamp()) // 86400)
+                    break
+        with self._lock:
+            self._days = days
+            self._legacy = legacy
+
+    def ensure(self, conn, table, day, created):
+        """Name of the partition of ``table`` for ``day``, created if missing
+
+        A new partition is added to ``created`` as (table, day), to be
+        recorded with ``add`` after the transaction commits.
+        """
+        name = partition_name(table, day)
+        if day not in self._days[table] and (table, day) not in created:
+            conn.execute(create_table_sql(table, name))
+            for sql in create_index_sqls(table, name, name[len(table):]):
+                conn.execute(sql)
+            created.add((table, day))
+        return name
+
+    def split(self, conn, table, rows, created):
+        """Group rows whose first column is epoch ms by partition, creating
+        partitions (see ``ensure``)"""
+        groups = {}
+        for row in rows:
+            groups.setdefault(partition_day(row[0]), []).append(row)
+        return [(self.ensure(conn, table, day, created), day_rows) for day, day_rows in sorted(groups.items())]
+
+    def add(self, created):
+        """Record partitions created by a committed transaction"""
+        with self._lock:
+            for table, day in created:
+                self._days[table].add(day)
+
+    def covering(self, table, start=None, end=None):
+        """Tables holding rows of ``table`` at or after ``start`` and before
+        ``end`` (epoch ms), oldest first"""
+        with self._lock:
+            days = sorted(self._days[table])
+            names = [table] if table in self._legacy else []
+        first_day = None if start is None else partition_day(start)
+        last_day = None if end is None else partition_day(end - 1)
+        names.extend(partition_name(table, day) for day in days
+                     if (first_day is None or day >= first_day) and (last_day is None or day <= last_day))
+        return names
+
+    def expired(self, table, cutoff):
+        """Partitions of ``table`` holding only rows older than ``cutoff`` (epoch ms)"""
+        with self._lock:
+            days = sorted(self._days[table])
+        return [day for day in days if (day + 1) * DAY_MS <= cutoff]
+
+    def has_legacy(self, table):
+        """Whether the legacy unpartitioned ``table`` still exists"""
+        with self._lock:
+            return table in self._legacy
+
+    def discard(self, table, day=None):
+        """Forget a partition (or the legacy table) before it is dropped"""
+        with self._lock:
+            if day is None:
+                self._legacy.discard(table)
+            else:
+                self._days[table].discard(day)
+
+    def get_stats(self):
+        """Number of day partitions per table and the legacy tables left"""
+        with self._lock:
+            return {
+                'days': {table: len(days) for table, days in self._days.items()},
+                'legacy': sorted(self._legacy)
+            }
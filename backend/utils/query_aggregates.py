@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Query Aggregates Module
+Per-minute query counts by domain and query type
+"""
+
+from collections import Counter
+
+MINUTE_MS = 60 * 1000
+
+# aggregate table -> dns_queries id column it counts (same name in both)
+AGGREGATES = {'domain_counts': 'domain_id', 'query_type_counts': 'type_id'}
+
+
+def minute_start(ts):
+    """Start of the minute holding epoch milliseconds ``ts``"""
+    return ts // MINUTE_MS * MINUTE_MS
+
+
+def count_rows(rows):
+    """(minute, id, count) rows of each aggregate table for encoded dns_queries rows"""
+    counts = {table: Counter() for table in AGGREGATES}
+    for ts, _seq, _client_id, domain_id, type_id, _response_us in rows:
+        minute = minute_start(ts)
+        if domain_id is not None:
+            counts['domain_counts'][(minute, domain_id)] += 1
+        if type_id is not None:
+            counts['query_type_counts'][(minute, type_id)] += 1
+    return {table: [(minute, value_id, count) for (minute, value_id), count in sorted(counter.items())]
+            for table, counter in counts.items()}
+
+
+def split_window(start, end):
+    """Split [start, end) (epoch ms) into the whole minutes answered from the
+    aggregates and the partial minutes at either end, which are not
+
+    Returns ((first, last) minute bounds or None, [(start, end) partial ranges]).
+    """
+    first = -(-start // MINUTE_MS) * MINUTE_MS
+    last = minute_start(end)
+    if first >= last:
+        return None, [(start, end)] if start < end else []
+    return (first, last), [(low, high) for low, high in ((start, first), (last, end)) if low < high]
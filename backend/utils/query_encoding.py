@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Query Encoding Module
+Dictionary encoding of stored DNS queries
+"""
+
+import socket
+
+# A dictionary entry's stored last_seen is only refreshed once it is this
+# old, so most batches resolve every id from the cache without writing
+LAST_SEEN_GRANULARITY_MS = 3600 * 1000
+
+
+def pack_ip(address):
+    """4 or 16 byte blob of an IPv4/IPv6 address, the text itself if it is not one"""
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            return socket.inet_pton(family, address)
+        except (OSError, ValueError):
+            continue
+    return address
+
+
+def unpack_ip(value):
+    """Text form of a value stored by ``pack_ip``"""
+    if isinstance(value, bytes):
+        return socket.inet_ntop(socket.AF_INET if len(value) == 4 else socket.AF_INET6, value)
+    return value
+
+
+class Dictionary:
+    """Integer ids for the values of one dictionary table
+
+    The table has ``id``, a unique ``column`` and ``last_seen`` (epoch ms of
+    the newest query using the entry, kept to within
+    ``LAST_SEEN_GRANULARITY_MS``) so retention can drop unused entries.
+    Ids are cached; call ``clear`` whenever a transaction that may have
+    created entries rolls back, or after entries are deleted.
+    """
+
+    def __init__(self, table, column, cache_size=100000):
+        self.table = table
+        self.cache_size = cache_size
+        self.cache = {}
+        self._upsert = (f'INSERT INTO {table} ({column}, last_seen) VALUES (?, ?) '
+                        f'ON CONFLICT({column}) DO UPDATE SET last_seen = MAX(last_seen, excluded.last_seen)')
+        self._select = f'SELECT id FROM {table} WHERE {column} = ?'
+
+    def ids(self, conn, values):
+        """Map each value of ``values`` ({value: newest epoch ms}) to its id"""
+        ids = {}
+        refresh = []
+        for value, ts in values.items():
+            entry = self.cache.get(value)
+            if entry is not None and ts - entry[1] < LAST_SEEN_GRANULARITY_MS:
+                ids[value] = entry[0]
+            else:
+                refresh.append((value, ts))
+
+        if refresh:
+            conn.executemany(self._upsert, refresh)
+            if len(self.cache) + len(refresh) > self.cache_size:
+                self.cache.clear()
+            for value, ts in refresh:
+                # Re-read the id too, retention may have recreated the entry
+                entry = [conn.execute(self._select, (value,)).fetchone()[0], ts]
+                self.cache[value] = entry
+                ids[value] = entry[0]
+        return ids
+
+    def clear(self):
+        """Forget cached ids"""
+        self.cache.clear()
+
+
+class QueryEncoder:
+    """Turns query tuples into compact ``dns_queries`` rows
+
+    Domains, client addresses (packed) and query types are replaced by ids
+    from their dictionary tables and response times are stored as integer
+    microseconds. Raw log lines, when present, go to ``dns_query_lines``.
+    """
+
+    def __init__(self, cache_size=100000):
+        self.domains = Dictionary('domains', 'name', cache_size)
+        self.clients = Dictionary('clients', 'address', cache_size)
+        self.query_types = Dictionary('query_types', 'name', 256)
+
+    def encode(self, conn, queries):
+        """Encode (ts, seq, client_ip, domain, query_type, response_time, raw_line)
+        tuples, returns (query rows, raw line rows)"""
+        domains = {}
+        addresses = {}
+        clients = {}
+        query_types = {}
+        for ts, _seq, client_ip, domain, query_type, _rt, _raw in queries:
+            if domain and domains.get(domain, -1) < ts:
+                domains[domain] = ts
+            if client_ip:
+                address = addresses.get(client_ip)
+                if address is None:
+                    address = addresses[client_ip] = pack_ip(client_ip)
+                if clients.get(address, -1) < ts:
+                    clients[address] = ts
+            if query_type and query_types.get(query_type, -1) < ts:
+                query_types[query_type] = ts
+
+        domain_ids = self.domains.ids(conn, domains)
+        client_ids = self.clients.ids(conn, clients)
+        type_ids = self.query_types.ids(conn, query_types)
+
+        rows = []
+        lines = []
+        for ts, seq, client_ip, domain, query_type, response_time, raw_line in queries:
+            rows.append((
+                ts,
+                seq,
+                client_ids[addresses[client_ip]] if client_ip else None,
+                domain_ids.get(domain),
+                type_ids.get(query_type),
+                None if response_time is None else int(round(response_time * 1000))
+            ))
+            if raw_line:
+                lines.append((ts, seq, raw_line))
+        return rows, lines
+
+    def clear(self):
+        """Forget cached ids"""
+        self.domains.clear()
+        self.clients.clear()
+        self.query_types.clear()
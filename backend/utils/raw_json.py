@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Raw JSON Module
+Sending already serialized JSON through Socket.IO without encoding it again
+"""
+
+import json
+
+
+class RawJSON:
+    """JSON text to be sent as is"""
+
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+
+class RawJSONEncoder:
+    """json module for ``SocketIO(json=...)`` that splices ``RawJSON``
+    arguments into the packet instead of serializing them
+
+    Socket.IO encodes a packet as a JSON list of the event name and its
+    arguments; only those top level arguments may be ``RawJSON``.
+    """
+
+    @staticmethod
+    def dumps(obj, *args, **kwargs):
+        if isinstance(obj, RawJSON):
+            return obj.text
+        if isinstance(obj, (list, tuple)) and any(isinstance(item, RawJSON) for item in obj):
+            kwargs.setdefault('default', str)
+            return '[' + ','.join(item.text if isinstance(item, RawJSON) else json.dumps(item, *args, **kwargs)
+                                  for item in obj) + ']'
+        kwargs.setdefault('default', str)
+        return json.dumps(obj, *args, **kwargs)
+
+    @staticmethod
+    def loads(*args, **kwargs):
+        return json.loads(*args, **kwargs)
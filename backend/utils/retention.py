@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Retention Module
+Background thread that periodically expires old monitoring data
+"""
+
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RetentionWorker:
+    """Runs ``DatabaseManager.cleanup_old_data`` every ``interval`` seconds
+
+    The first run happens right after ``start`` so a restarted monitor
+    catches up at once. Most runs only drop whole day partitions.
+    """
+
+    def __init__(self, db_manager, interval=3600, days=30, query_days=7):
+        self.db_manager = db_manager
+        self.interval = interval
+        self.days = days
+        self.query_days = query_days
+
+        self.runs = 0
+        self.dropped_partitions = 0
+        self.deleted_rows = 0
+        self.last_run = None
+        self.last_run_ms = 0.0
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the retention thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='db-retention')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop the retention thread"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def run_once(self):
+        """Expire old data now"""
+        started = time.perf_counter()
+        summary = self.db_manager.cleanup_old_data(self.days, self.query_days)
+        self.last_run_ms = (time.perf_counter() - started) * 1000
+        self.last_run = time.time()
+        self.runs += 1
+        self.dropped_partitions += summary['dropped_partitions']
+        self.deleted_rows += summary['deleted_rows']
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Error running retention: {e}")
+            self._stop_event.wait(self.interval)
+
+    def get_stats(self):
+        """Retention settings and what the runs so far removed"""
+        return {
+            'interval': self.interval,
+            'days': self.days,
+            'query_days': self.query_days,
+            'runs': self.runs,
+            'dropped_partitions': self.dropped_partitions,
+            'deleted_rows': self.deleted_rows,
+            'last_run': self.last_run,
+            'last_run_ms': round(self.last_run_ms, 3)
+        }
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rollups Module
+Downsampling tiers (10s/1m/5m/1h) of system and DNS metrics
+"""
+
+from timestamps import to_epoch_ms, from_epoch_ms
+
+# Bucket widths in seconds, finest first
+TIERS = (10, 60, 300, 3600)
+
+# How long each tier is kept, in days
+TIER_RETENTION_DAYS = {10: 2, 60: 7, 300: 30, 3600: 365}
+
+# Points returned by the history endpoints when none are requested
+DEFAULT_POINTS = 500
+
+# metric -> (path in the sample section, aggregate reported as the metric's value)
+SOURCES = {
+    'system': {
+        'cpu_percent': (('cpu', 'percent'), 'avg'),
+        'memory_percent': (('memory', 'percent'), 'avg'),
+        'disk_percent': (('disk', 'percent'), 'avg'),
+        'load_avg_1min': (('load_average', '1min'), 'avg'),
+        'network_upload_speed': (('network', 'speed', 'upload'), 'avg'),
+        'network_download_speed': (('network', 'speed', 'download'), 'avg'),
+        'uptime': (('uptime', 'seconds'), 'last')
+    },
+    'dns': {
+        'bind_running': (('bind_status', 'process_running'), 'min'),
+        'service_active': (('bind_status', 'service_status', 'active'), 'min'),
+        'total_queries': (('query_stats', 'total_queries'), 'last'),
+        'qps': (('query_stats', 'qps'), 'avg'),
+        'queries_per_minute': (('query_stats', 'queries_per_minute'), 'avg'),
+        'queries_per_hour': (('query_stats', 'queries_per_hour'), 'avg'),
+        'avg_response_time': (('response_times', 'average'), 'avg'),
+        'config_valid': (('bind_status', 'config_status', 'valid'), 'min')
+    }
+}
+
+# Boolean metrics are stored as 0/1 and reported as booleans again
+BOOLEAN_METRICS = {'bind_running', 'service_active', 'config_valid'}
+
+
+def choose_resolution(seconds, points):
+    """Finest resolution (1 = raw rows) giving at most ``points`` points over ``seconds``"""
+    if not points or points <= 0 or seconds / points <= 1:
+        return 1
+    for width in TIERS:
+        if seconds / width <= points:
+            return width
+    return TIERS[-1]
+
+
+def _extract(section, path):
+    value = section
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    if isinstance(value, bool):
+        return int(value)
+    return value if isinstance(value, (int, float)) else None
+
+
+def _merge(buckets, key, value, epoch):
+    bucket = buckets.get(key)
+    if bucket is None:
+        buckets[key] = [value, value, value, 1, value, epoch]
+    else:
+        if value < bucket[0]:
+            bucket[0] = value
+        if value > bucket[1]:
+            bucket[1] = value
+        bucket[2] += value
+        bucket[3] += 1
+        if epoch >= bucket[5]:
+            bucket[4] = value
+            bucket[5] = epoch
+
+
+def _bucket_rows(buckets):
+    return [(source, tier, start * 1000, metric, *bucket)
+            for (source, tier, start, metric), bucket in buckets.items()]
+
+
+def rollup_rows(samples):
+    """Partial aggregates of a batch of samples for every tier
+
+    Returns rows of (source, tier, bucket start in epoch ms, metric, min, max,
+    sum, count, last, last_time), one per bucket touched by the batch, ready
+    to be merged into stored buckets.
+    """
+    buckets = {}
+    for sample in samples:
+        try:
+            epoch = to_epoch_ms(sample['timestamp']) / 1000.0
+        except (KeyError, TypeError, ValueError, AttributeError):
+            continue
+        for source, metrics in SOURCES.items():
+            section = sample.get(source)
+            if not section:
+                continue
+            for metric, (path, _aggregate) in metrics.items():
+                value = _extract(section, path)
+                if value is None:
+                    continue
+                for tier in TIERS:
+                    _merge(buckets, (source, tier, int(epoch // tier) * tier, metric), value, epoch)
+
+    return _bucket_rows(buckets)
+
+
+def rollup_stored_rows(source, rows, ranges):
+    """Partial aggregates of rows already stored in the ``source`` table
+
+    ``rows`` are (epoch ms, value of each metric in SOURCES order). Each tier
+    only takes the rows inside its [start, end) epoch ms range in ``ranges``
+    (``end`` None for no bound). Returns rows as ``rollup_rows`` does.
+    """
+    metrics = list(SOURCES[source])
+    buckets = {}
+    for ts, *values in rows:
+        tiers = [tier for tier, (start, end) in ranges.items() if ts >= start and (end is None or ts < end)]
+        if not tiers:
+            continue
+        epoch = ts / 1000.0
+        for metric, value in zip(metrics, values):
+            if isinstance(value, bool):
+                value = int(value)
+            elif not isinstance(value, (int, float)):
+                continue
+            for tier in tiers:
+                _merge(buckets, (source, tier, int(epoch // tier) * tier, metric), value, epoch)
+
+    return _bucket_rows(buckets)
+
+
+def pivot_rows(source, resolution, rows):
+    """Turn (epoch ms, metric, min, max, sum, count, last) rows ordered by
+    time into one history point per bucket"""
+    metrics = SOURCES[source]
+    history = []
+    point = None
+    last_ts = None
+    for ts, metric, minimum, maximum, total, count, last in rows:
+        if point is None or ts != last_ts:
+            last_ts = ts
+            point = {'timestamp': from_epoch_ms(ts), 'resolution': resolution, 'min': {}, 'max': {}}
+            history.append(point)
+        if metric not in metrics:
+            continue
+        aggregate = metrics[metric][1]
+        if aggregate == 'avg':
+            value = round(total / count, 3) if count else None
+        elif aggregate == 'last':
+            value = last
+        else:
+            value = minimum
+        if metric in BOOLEAN_METRICS:
+            point[metric] = bool(value)
+            point['min'][metric] = bool(minimum)
+            point['max'][metric] = bool(maximum)
+        else:
+            point[metric] = value
+            point['min'][metric] = minimum
+            point['max'][metric] = maximum
+    return history
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Scheduler Module
+Runs collectors at their own fixed intervals on a monotonic timer wheel
+"""
+
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Collector:
+    """A function run every ``interval`` seconds, with its declared cost
+    (expected milliseconds per run) and its measured cost"""
+
+    def __init__(self, name, func, interval, cost):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.cost = cost
+        self.interval_ticks = 1
+        self.due_tick = 0
+
+        self.runs = 0
+        self.skipped = 0
+        self.errors = 0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+        self.total_ms = 0.0
+        self.last_cpu_ms = 0.0
+
+    def run(self):
+        """Run once, returns (wall ms, CPU ms)"""
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
+        try:
+            self.func()
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Error in collector {self.name}: {e}")
+        self.last_ms = (time.perf_counter() - started) * 1000
+        self.last_cpu_ms = (time.thread_time() - cpu_started) * 1000
+        self.max_ms = max(self.max_ms, self.last_ms)
+        self.total_ms += self.last_ms
+        self.runs += 1
+        return self.last_ms, self.last_cpu_ms
+
+
+class CollectionScheduler:
+    """Runs collectors on a hashed timer wheel driven by the monotonic clock
+
+    Time is counted in ``tick`` second ticks from the start; a collector due
+    at tick n waits in slot n % ``slots``. Each run is due one interval
+    after the previous due tick, not after the previous run finished, so
+    periods do not drift by the collection time. When collectors overrun
+    and ticks are processed late, a collector that fell behind runs once
+    and its missed runs are counted as skipped.
+
+    Collectors with the shortest interval all start at tick 0 and run in
+    the order they were added. Longer interval collectors are staggered,
+    most expensive first, onto the ticks with the least declared cost, so
+    slow probes do not pile onto the same tick or delay the fast ones.
+    """
+
+    def __init__(self, tick=0.25, slots=512):
+        self.tick = tick
+        self.slots = slots
+        self.collectors = []
+        self._wheel = [[] for _ in range(slots)]
+
+        self.ticks = 0
+        self.late_ticks = 0
+        self.last_tick_ms = 0.0
+        self.last_tick_cpu_ms = 0.0
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def add(self, name, func, interval, cost=1.0):
+        """Register ``func`` to run every ``interval`` seconds, before ``start``"""
+        collector = Collector(name, func, interval, cost)
+        collector.interval_ticks = max(1, int(round(interval / self.tick)))
+        self.collectors.append(collector)
+        return collector
+
+    def start(self):
+        """Start the scheduler thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._place()
+        self._thread = threading.Thread(target=self._run, name='collectors')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop the scheduler thread after the running collector returns"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _place(self):
+        """Choose each collector's first due tick and put it on the wheel"""
+        self._wheel = [[] for _ in range(self.slots)]
+        if not self.collectors:
+            return
+        fastest = min(collector.interval_ticks for collector in self.collectors)
+        load = [0.0] * self.slots
+        slow = []
+        for collector in self.collectors:
+            if collector.interval_ticks == fastest:
+                collector.due_tick = 0
+                for slot in range(0, self.slots, fastest):
+                    load[slot] += collector.cost
+            else:
+                slow.append(collector)
+
+        for collector in sorted(slow, key=lambda c: c.cost, reverse=True):
+            step = collector.interval_ticks
+            collector.due_tick = min(
+                range(step), key=lambda phase: sum(load[slot] for slot in range(phase, self.slots, step)))
+            for slot in range(collector.due_tick, self.slots, step):
+                load[slot] += collector.cost
+
+        for collector in self.collectors:
+            self._wheel[collector.due_tick % self.slots].append(collector)
+
+    def _run(self):
+        started = time.monotonic()
+        next_tick = 0
+        while not self._stop_event.is_set():
+            delay = started + next_tick * self.tick - time.monotonic()
+            if delay > 0 and self._stop_event.wait(delay):
+                break
+
+            current = max(next_tick, int((time.monotonic() - started) / self.tick))
+            if current > next_tick:
+                self.late_ticks += current - next_tick
+            tick_ms = 0.0
+            tick_cpu_ms = 0.0
+            for tick in range(next_tick, current + 1):
+                wall_ms, cpu_ms = self._process(tick, current)
+                tick_ms += wall_ms
+                tick_cpu_ms += cpu_ms
+            if tick_ms:
+                self.last_tick_ms = tick_ms
+                self.last_tick_cpu_ms = tick_cpu_ms
+            self.ticks += current + 1 - next_tick
+            next_tick = current + 1
+
+    def _process(self, tick, current):
+        """Run the collectors due at ``tick`` and reschedule them after ``current``"""
+        slot = self._wheel[tick % self.slots]
+        due = [collector for collector in slot if collector.due_tick == tick]
+        if not due:
+            return 0.0, 0.0
+        # Collectors due in a later rotation stay in the slot
+        self._wheel[tick % self.slots] = [collector for collector in slot if collector.due_tick != tick]
+
+        wall_ms = 0.0
+        cpu_ms = 0.0
+        for collector in due:
+            run_ms, run_cpu_ms = collector.run()
+            wall_ms += run_ms
+            cpu_ms += run_cpu_ms
+            collector.due_tick += collector.interval_ticks
+            while collector.due_tick <= current:
+                collector.due_tick += collector.interval_ticks
+                collector.skipped += 1
+            self._wheel[collector.due_tick % self.slots].append(collector)
+        return wall_ms, cpu_ms
+
+    def get_stats(self):
+        """Get tick counters and each collector's interval and costs"""
+        return {
+            'tick': self.tick,
+            'ticks': self.ticks,
+            'late_ticks': self.late_ticks,
+            'last_tick_ms': round(self.last_tick_ms, 3),
+            'last_tick_cpu_ms': round(self.last_tick_cpu_ms, 3),
+            'collectors': {
+                collector.name: {
+                    'interval': collector.interval,
+                    'declared_cost_ms': collector.cost,
+                    'runs': collector.runs,
+                    'skipped': collector.skipped,
+                    'errors': collector.errors,
+                    'last_ms': round(collector.last_ms, 3),
+                    'avg_ms': round(collector.total_ms / collector.runs, 3) if collector.runs else 0.0,
+                    'max_ms': round(collector.max_ms, 3),
+                    'last_cpu_ms': round(collector.last_cpu_ms, 3)
+                }
+                for collector in self.collectors
+            }
+        }
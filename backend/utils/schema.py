@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Schema Module
+Table and index definitions of the monitoring database
+
+Every time column (``ts``, ``updated``) holds integer epoch milliseconds.
+"""
+
+# table -> CREATE statement, ``{table}`` is the name the table is created
+# under (the migration builds a copy next to the legacy table first)
+TABLES = {
+    'system_monitoring': '''
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts INTEGER NOT NULL,
+            cpu_percent REAL,
+            memory_percent REAL,
+            memory_used INTEGER,
+            memory_total INTEGER,
+            disk_percent REAL,
+            disk_used INTEGER,
+            disk_total INTEGER,
+            load_avg_1min REAL,
+            load_avg_5min REAL,
+            load_avg_15min REAL,
+            network_bytes_sent INTEGER,
+            network_bytes_recv INTEGER,
+            network_upload_speed REAL,
+            network_download_speed REAL,
+            uptime REAL
+        )
+    ''',
+    'dns_monitoring': '''
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts INTEGER NOT NULL,
+            bind_running BOOLEAN,
+            service_active BOOLEAN,
+            total_queries INTEGER,
+            qps REAL,
+            queries_per_minute INTEGER,
+            queries_per_hour INTEGER,
+            avg_response_time REAL,
+            config_valid BOOLEAN
+        )
+    ''',
+    # One compact row per query, clustered by time; the text columns live
+    # in the dictionary tables below and response times are microseconds
+    'dns_queries': '''
+        CREATE TABLE IF NOT EXISTS {table} (
+            ts INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            client_id INTEGER,
+            domain_id INTEGER,
+            type_id INTEGER,
+            response_us INTEGER,
+            PRIMARY KEY (ts, seq)
+        ) WITHOUT ROWID
+    ''',
+    # Raw log lines, only written when the monitor keeps them
+    'dns_query_lines': '''
+        CREATE TABLE IF NOT EXISTS {table} (
+            ts INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            raw_line TEXT,
+            PRIMARY KEY (ts, seq)
+        ) WITHOUT ROWID
+    ''',
+    'domains': '''
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            last_seen INTEGER
+        )
+    ''',
+    # Addresses are packed 4/16 byte blobs
+    'clients': '''
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY,
+            address BLOB NOT NULL UNIQUE,
+            last_seen INTEGER
+        )
+    ''',
+    'query_types': '''
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            last_seen INTEGER
+        )
+    ''',
+    # Newest stored query seq and the log positions that produced it
+    'ingest_checkpoint': '''
+        CREATE TABLE IF NOT EXISTS {table} (
+            name TEXT PRIMARY KEY,
+            seq INTEGER NOT NULL,
+            positions TEXT,
+            updated INTEGER
+        ) WITHOUT ROWID
+    ''',
+    # One row per sample and query type, clustered by time
+    'query_statistics': '''
+        CREATE TABLE IF NOT EXISTS {table} (
+            ts INTEGER NOT NULL,
+            query_type TEXT NOT NULL,
+            count INTEGER,
+            percentage REAL,
+            PRIMARY KEY (ts, query_type)
+        ) WITHOUT ROWID
+    ''',
+    # Queries per minute (``ts`` is the minute start) and domain / query
+    # type, maintained at ingest so windowed top-N and distribution queries
+    # read pre-summed buckets instead of every query
+    'domain_counts': '''
+        CREATE TABLE IF NOT EXISTS {table} (
+            ts INTEGER NOT NULL,
+            domain_id INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (ts, domain_id)
+        ) WITHOUT ROWID
+    ''',
+    'query_type_counts': '''
+        CREATE TABLE IF NOT EXISTS {table} (
+            ts INTEGER NOT NULL,
+            type_id INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (ts, type_id)
+        ) WITHOUT ROWID
+    ''',
+    # Opt-in sampled snapshots of the full monitoring data (snapshots.py):
+    # zlib compressed JSON, whole in keyframes, otherwise a delta against
+    # the previous row
+    'snapshots': '''
+        CREATE TABLE IF NOT EXISTS {table} (
+            ts INTEGER PRIMARY KEY,
+            keyframe INTEGER NOT NULL,
+            data BLOB NOT NULL
+        )
+    ''',
+    # One sparse latency histogram per interval
+    'latency_histograms': '''
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts INTEGER NOT NULL,
+            interval INTEGER,
+            count INTEGER,
+            p50 REAL,
+            p90 REAL,
+            p99 REAL,
+            p999 REAL,
+            max REAL,
+            histogram TEXT
+        )
+    ''',
+    # One row per source/tier/bucket/metric
+    'metric_rollups': '''
+        CREATE TABLE IF NOT EXISTS {table} (
+            source TEXT NOT NULL,
+            tier INTEGER NOT NULL,
+            ts INTEGER NOT NULL,
+            metric TEXT NOT NULL,
+            min REAL,
+            max REAL,
+            sum REAL,
+            count INTEGER,
+            last REAL,
+            last_time REAL,
+            PRIMARY KEY (source, tier, ts, metric)
+        ) WITHOUT ROWID
+    '''
+}
+
+# (index, table, columns). The history indexes cover every column their
+# query reads, so those range scans never touch the table rows (which still
+# hold a raw_data blob in partitions written by older versions).
+# dns_queries needs none: its rows are small and clustered by time
+INDEXES = (
+    # get_system_history
+    ('idx_system_history', 'system_monitoring',
+     'ts, cpu_percent, memory_percent, disk_percent, load_avg_1min, '
+     'network_upload_speed, network_download_speed, uptime'),
+    # get_dns_history
+    ('idx_dns_history', 'dns_monitoring',
+     'ts, bind_running, service_active, total_queries, qps, queries_per_minute, '
+     'queries_per_hour, avg_response_time, config_valid'),
+    ('idx_latency_ts', 'latency_histograms', 'ts')
+)
+
+# Tables stored as one table per UTC day (``<table>_YYYYMMDD``, see
+# partitions.py) so that retention drops whole days. A table under the plain
+# name is a legacy partition left by an older version
+PARTITIONED_TABLES = ('system_monitoring', 'dns_monitoring', 'query_statistics', 'dns_queries',
+                      'dns_query_lines', 'domain_counts', 'query_type_counts')
+
+# Legacy TEXT ISO time columns and the epoch millisecond columns replacing them
+LEGACY_TIME_COLUMNS = {'timestamp': 'ts', 'updated': 'updated'}
+
+# Columns only found in the legacy layout of a table
+LEGACY_COLUMNS = {'dns_queries': 'domain'}
+
+
+def create_table_sql(table, name=None):
+    """CREATE TABLE statement for ``table``, optionally under another name"""
+    return TABLES[table].format(table=name or table)
+
+
+def create_index_sqls(table, name=None, suffix=''):
+    """CREATE INDEX statements for ``table``, optionally built on another name
+    with ``suffix`` appended to the index names"""
+    return [f'CREATE INDEX IF NOT EXISTS {index}{suffix} ON {name or table}({columns})'
+            for index, indexed_table, columns in INDEXES if indexed_table == table]
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Snapshots Module
+Sampled, delta encoded and compressed snapshots of the full monitoring data
+"""
+
+import json
+import zlib
+
+from json_delta import diff, patch
+
+
+class SnapshotEncoder:
+    """Picks one monitoring sample per ``interval`` seconds and encodes it
+
+    Every ``keyframe_every``-th snapshot, and the first one after a start or
+    ``reset``, is stored whole; the others as a delta against the previous
+    snapshot. Both are zlib compressed JSON. Call ``reset`` whenever a
+    transaction holding encoded snapshots rolls back.
+    """
+
+    def __init__(self, interval=60, keyframe_every=60, level=6):
+        self.interval_ms = interval * 1000
+        self.keyframe_every = keyframe_every
+        self.level = level
+        self.previous = None
+        self.since_keyframe = 0
+        self.last_bucket = None
+
+    def encode(self, samples):
+        """(ts, keyframe, data) rows for the (ts, snapshot) samples, in time
+        order, that are due to be stored"""
+        rows = []
+        for ts, snapshot in samples:
+            bucket = ts // self.interval_ms
+            if self.last_bucket is not None and bucket <= self.last_bucket:
+                continue
+            # Deltas are taken against what decoding will give back
+            snapshot = json.loads(json.dumps(snapshot))
+            keyframe = self.previous is None or self.since_keyframe >= self.keyframe_every
+            payload = snapshot if keyframe else diff(self.previous, snapshot)
+            rows.append((ts, int(keyframe),
+                         zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'), self.level)))
+            self.previous = snapshot
+            self.since_keyframe = 1 if keyframe else self.since_keyframe + 1
+            self.last_bucket = bucket
+        return rows
+
+    def reset(self):
+        """Start over with a keyframe"""
+        self.previous = None
+        self.since_keyframe = 0
+        self.last_bucket = None
+
+
+def decode_snapshot(rows):
+    """Snapshot stored in the last of ``rows``: (keyframe, data) from its
+    keyframe on, in time order"""
+    snapshot = None
+    for keyframe, data in rows:
+        payload = json.loads(zlib.decompress(data))
+        snapshot = payload if keyframe else patch(snapshot, payload)
+    return snapshot
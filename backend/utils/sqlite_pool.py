@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite Pool Module
+One long-lived WAL writer connection plus a pool of read-only connections
+"""
+
+import queue
+import sqlite3
+import threading
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Pragmas applied to every connection
+CONNECTION_PRAGMAS = (
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA cache_size = -16384',       # 16 MiB page cache
+    'PRAGMA mmap_size = 268435456',     # 256 MiB memory-mapped reads
+    'PRAGMA temp_store = MEMORY'
+)
+
+# Pragmas applied to the writer only
+WRITER_PRAGMAS = (
+    # Lets a new database return the pages of dropped partitions to the file
+    # system; SQLite only accepts it before the first table is created and
+    # before the switch to WAL
+    'PRAGMA auto_vacuum = INCREMENTAL',
+    'PRAGMA journal_mode = WAL',
+    # In WAL mode NORMAL only syncs at checkpoints: a power loss can drop the
+    # last transactions but never corrupts the database
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA wal_autocheckpoint = 1000'
+)
+
+
+class SQLitePool:
+    """Connection manager for a single SQLite database file
+
+    Writes go through one connection serialized by a lock, so there is never
+    writer contention inside the process; with WAL readers are not blocked by
+    it. Readers borrow one of up to ``readers`` read-only connections, opened
+    lazily and reused. Each connection keeps ``cached_statements`` prepared
+    statements keyed by SQL text, so callers should use constant SQL strings
+    with bound parameters.
+    """
+
+    def __init__(self, db_path, readers=4, cached_statements=256):
+        self.db_path = str(db_path)
+        self.max_readers = readers
+        self.cached_statements = cached_statements
+
+        self._write_lock = threading.Lock()
+        self._writer = None
+        self._readers = queue.LifoQueue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self, read_only=False):
+        if read_only:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True,
+                                   check_same_thread=False,
+                                   cached_statements=self.cached_statements)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                   cached_statements=self.cached_statements)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        if read_only:
+            conn.execute('PRAGMA query_only = ON')
+        else:
+            for pragma in WRITER_PRAGMAS:
+                conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def writer(self):
+        """Exclusive use of the writer connection, committed on success"""
+        with self._write_lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Connection pool is closed")
+            if self._writer is None:
+                self._writer = self._connect()
+            conn = self._writer
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    @contextmanager
+    def reader(self):
+        """Borrow a read-only connection, waiting when all are in use"""
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            if self._closed:
+                conn.close()
+            else:
+                self._readers.put(conn)
+
+    def _acquire_reader(self):
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection pool is closed")
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._reader_lock:
+            if self._reader_count < self.max_readers:
+                if self._writer is None:
+                    # The database and its WAL must exist before a read-only open
+                    with self.writer():
+                        pass
+                conn = self._connect(read_only=True)
+                self._reader_count += 1
+                return conn
+        return self._readers.get()
+
+    def close(self):
+        """Close every connection"""
+        self._closed = True
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def get_stats(self):
+        """Pool usage"""
+        return {
+            'readers_open': self._reader_count,
+            'readers_idle': self._readers.qsize(),
+            'max_readers': self.max_readers,
+            'writer_open': self._writer is not None
+        }
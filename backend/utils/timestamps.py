@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Timestamps Module
+Conversions between epoch milliseconds, as stored, and ISO 8601 strings
+"""
+
+import time
+from datetime import datetime, timezone
+
+
+def to_epoch_ms(value=None):
+    """Epoch milliseconds of an ISO 8601 string, epoch seconds or now
+
+    Strings without an offset are read as local time, which is what older
+    versions wrote; the hour repeated when DST ends is ambiguous for those.
+    """
+    if value is None:
+        return int(time.time() * 1000)
+    if isinstance(value, (int, float)):
+        return int(round(value * 1000))
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    return int(round(datetime.fromisoformat(value).timestamp() * 1000))
+
+
+def from_epoch_ms(ms):
+    """ISO 8601 UTC string (``2024-01-01T12:00:00.000Z``) of epoch milliseconds"""
+    if ms is None:
+        return None
+    return datetime.fromtimestamp(ms / 1000, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def epoch_ms_ago(seconds):
+    """Epoch milliseconds ``seconds`` before now"""
+    return int((time.time() - seconds) * 1000)
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Topics Module
+WebSocket topics, the update rates clients can choose and their subscriptions
+"""
+
+import json
+import threading
+
+from delta_stream import DeltaStream
+
+TOPICS = ('system', 'dns-summary', 'dns-live-queries', 'processes', 'alerts')
+
+# Update rates in seconds, one publish tick each
+RATES = (1, 5, 30)
+DEFAULT_RATE = 1
+
+# Newest queries sent in the dns-live-queries topic
+LIVE_QUERIES = 50
+
+
+def room_name(topic, rate):
+    """Socket.IO room of the clients receiving ``topic`` every ``rate`` seconds"""
+    return f"{topic}@{rate}s"
+
+
+def topic_values(system_data, dns_data, system_health, recent_queries):
+    """Split a monitoring sample into the topics
+
+    ``recent_queries`` are the latest queries rather than the ones new in
+    this sample, so clients at slower rates miss none.
+    """
+    system = dict(system_data)
+    processes = system.pop('processes', [])
+    dns_summary = dict(dns_data)
+    dns_summary.pop('recent_queries', None)
+    return {
+        'system': system,
+        'processes': {'processes': processes},
+        'dns-summary': dns_summary,
+        'dns-live-queries': {'recent_queries': recent_queries},
+        'alerts': {'system': system_health, 'dns': dns_data.get('service_health')}
+    }
+
+
+class TopicStreams:
+    """A DeltaStream per topic and rate
+
+    Each tick every topic is serialized once and each stream due that tick
+    builds at most one frame, whatever the number of clients in its room.
+    """
+
+    def __init__(self, topics=TOPICS, rates=RATES):
+        self.rates = rates
+        self.streams = {
+            (topic, rate): DeltaStream(topic=topic, rate=rate)
+            for topic in topics for rate in rates
+        }
+        self.ticks = 0
+
+    def advance(self, values):
+        """Advance the streams due this tick with ``values`` (topic -> dict),
+        returns (room, frame JSON) pairs to emit"""
+        due = [rate for rate in self.rates if self.ticks % rate == 0]
+        self.ticks += 1
+        frames = []
+        if not due:
+            return frames
+        for topic, value in values.items():
+            text = json.dumps(value, separators=(',', ':'), default=str)
+            for rate in due:
+                frame = self.streams[(topic, rate)].advance(value, text)
+                if frame is not None:
+                    frames.append((room_name(topic, rate), frame))
+        return frames
+
+    def keyframe(self, topic, rate):
+        """JSON of the latest keyframe of ``topic`` at ``rate``, None before the first"""
+        return self.streams[(topic, rate)].keyframe()
+
+    def get_stats(self):
+        """Stream statistics by room"""
+        return {room_name(topic, rate): stream.get_stats() for (topic, rate), stream in self.streams.items()}
+
+
+class Subscriptions:
+    """Rate of each topic each client subscribed to, and whether it paused
+
+    Methods return the (topic, rate) rooms the client has to leave and
+    join. A paused client is in no room; its subscriptions are kept for
+    ``resume``.
+    """
+
+    def __init__(self, topics=TOPICS, rates=RATES):
+        self.topics = topics
+        self.rates = rates
+        # sid -> {'rates': {topic: rate}, 'paused': bool}
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def add(self, sid, rate=DEFAULT_RATE):
+        """Subscribe a new client to every topic, returns the rooms to join"""
+        with self._lock:
+            self._clients[sid] = {'rates': {topic: rate for topic in self.topics}, 'paused': False}
+            return [(topic, rate) for topic in self.topics]
+
+    def remove(self, sid):
+        """Forget a disconnected client"""
+        with self._lock:
+            self._clients.pop(sid, None)
+
+    def subscribe(self, sid, topics=None, rate=DEFAULT_RATE):
+        """Receive ``topics`` (default all) every ``rate`` seconds, returns (leave, join)"""
+        topics = self._validate(topics)
+        if rate not in self.rates:
+            raise ValueError(f"Unknown rate {rate}, expected one of {list(self.rates)}")
+        leave, join = [], []
+        with self._lock:
+            client = self._clients.setdefault(sid, {'rates': {}, 'paused': False})
+            for topic in topics:
+                previous = client['rates'].get(topic)
+                if previous == rate:
+                    continue
+                client['rates'][topic] = rate
+                if not client['paused']:
+                    if previous is not None:
+                        leave.append((topic, previous))
+                    join.append((topic, rate))
+        return leave, join
+
+    def unsubscribe(self, sid, topics=None):
+        """Stop receiving ``topics`` (default all), returns the rooms to leave"""
+        topics = self._validate(topics)
+        leave = []
+        with self._lock:
+            client = self._clients.get(sid)
+            if client is None:
+                return leave
+            for topic in topics:
+                rate = client['rates'].pop(topic, None)
+                if rate is not None and not client['paused']:
+                    leave.append((topic, rate))
+        return leave
+
+    def pause(self, sid):
+        """Stop sending to a client, returns the rooms to leave"""
+        with self._lock:
+            client = self._clients.get(sid)
+            if client is None or client['paused']:
+                return []
+            client['paused'] = True
+            return list(client['rates'].items())
+
+    def resume(self, sid):
+        """Send to a paused client again, returns the rooms to join"""
+        with self._lock:
+            client = self._clients.get(sid)
+            if client is None or not client['paused']:
+                return []
+            client['paused'] = False
+            return list(client['rates'].items())
+
+    def get_rate(self, sid, topic):
+        """Rate of ``topic`` for a client, None when not subscribed or paused"""
+        client = self._clients.get(sid)
+        if client is None or client['paused']:
+            return None
+        return client['rates'].get(topic)
+
+    def get_stats(self):
+        """Client counts, and subscribers of each room"""
+        rooms = {}
+        paused = 0
+        with self._lock:
+            for client in self._clients.values():
+                if client['paused']:
+                    paused += 1
+                    continue
+                for topic, rate in client['rates'].items():
+                    room = room_name(topic, rate)
+                    rooms[room] = rooms.get(room, 0) + 1
+            clients = len(self._clients)
+        return {'clients': clients, 'paused': paused, 'rooms': rooms}
+
+    def _validate(self, topics):
+        if topics is None:
+            return list(self.topics)
+        if isinstance(topics, str):
+            topics = [topics]
+        unknown = [topic for topic in topics if topic not in self.topics]
+        if unknown:
+            raise ValueError(f"Unknown topics {unknown}, expected some of {list(self.topics)}")
+        return topics
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Write Behind Module
+Bounded queue and writer thread that batches monitoring samples into the
+database
+"""
+
+import time
+import threading
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+POLICY_DROP_OLDEST = 'drop_oldest'
+POLICY_BLOCK = 'block'
+POLICIES = (POLICY_DROP_OLDEST, POLICY_BLOCK)
+
+
+def count_rows(sample):
+    """Number of rows a monitoring sample turns into"""
+    dns_data = sample.get('dns') or {}
+    rows = 1 if sample.get('system') else 0
+    if dns_data:
+        rows += 1 + len(dns_data.get('query_types', {}))
+    return rows + len(sample.get('queries', []))
+
+
+def carry_queries(sample, other, limit=None):
+    """Copy of ``sample`` that also holds the drained queries of ``other``,
+    in sequence order, and the newer of their checkpoints
+
+    Each sample's queries are already in sequence order and the two do not
+    interleave, so they are concatenated. With ``limit`` only the newest
+    ``limit`` queries are kept. Returns (merged sample, number of queries left out).
+    """
+    queries = list(sample.get('queries', []))
+    carried = list(other.get('queries', []))
+    if queries and carried and carried[0]['seq'] > queries[0]['seq']:
+        queries += carried
+    else:
+        queries = carried + queries
+    overflow = 0
+    if limit is not None and len(queries) > limit:
+        overflow = len(queries) - limit
+        queries = queries[overflow:]
+    merged = dict(sample)
+    merged['queries'] = queries
+    checkpoints = [c for c in (sample.get('checkpoint'), other.get('checkpoint')) if c]
+    if checkpoints:
+        merged['checkpoint'] = max(checkpoints, key=lambda checkpoint: checkpoint['seq'])
+    return merged, overflow
+
+
+class WriteBehindQueue:
+    """Decouples sample collection from database writes
+
+    ``put`` only appends to a bounded in-memory queue. A writer thread
+    flushes everything queued in one transaction (``write_batch``) as soon as
+    ``flush_rows`` rows are pending or the oldest sample has waited
+    ``flush_interval`` seconds. When ``capacity`` samples are queued the
+    ``policy`` decides: ``drop_oldest`` discards the oldest sample,
+    ``block`` makes ``put`` wait up to ``block_timeout`` seconds for the
+    writer and drops the new sample if it is still full.
+
+    Drained queries and their checkpoint are never dropped: they move into
+    the next queued sample (or the previous one for a dropped new sample),
+    since a later checkpoint would skip them for good. A sample holds at
+    most ``max_carried`` queries that way; older ones beyond that are lost
+    and counted in ``dropped_queries``. A batch that fails
+    is queued again and retried after ``retry_interval`` seconds; queries
+    still queued at shutdown are re-read from the stored checkpoint.
+    """
+
+    def __init__(self, write_batch, flush_interval=1.0, flush_rows=5000, capacity=600,
+                 policy=POLICY_DROP_OLDEST, block_timeout=5.0, retry_interval=5.0, max_carried=100000):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy {policy!r}, expected one of {', '.join(POLICIES)}")
+        self.write_batch = write_batch
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.capacity = capacity
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.retry_interval = retry_interval
+        self.max_carried = max_carried
+
+        self.queue = deque()
+        self.pending_rows = 0
+        self.oldest = None
+        self.retry_at = 0.0
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.dropped_queries = 0
+        self.failed = 0
+        self.requeued = 0
+        self.flushes = 0
+        self.max_depth = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    def start(self):
+        """Start the writer thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='db-writer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Flush what is queued and stop the writer thread"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def put(self, sample):
+        """Queue a sample, returns False if it was dropped"""
+        rows = count_rows(sample)
+        with self._condition:
+            if len(self.queue) >= self.capacity:
+                if self.policy == POLICY_BLOCK:
+                    self._condition.wait_for(lambda: len(self.queue) < self.capacity or self._stopping,
+                                             self.block_timeout)
+                    if len(self.queue) >= self.capacity:
+                        self.dropped += 1
+                        if sample.get('queries') or sample.get('checkpoint'):
+                            self._replace(-1, self._carry(self.queue[-1][0], sample))
+                        return False
+                else:
+                    sample = self._evict_oldest(sample)
+                    rows = count_rows(sample)
+
+            first = not self.queue
+            if first:
+                self.oldest = time.monotonic()
+            self.queue.append((sample, rows))
+            self.pending_rows += rows
+            self.enqueued += 1
+            self.max_depth = max(self.max_depth, len(self.queue))
+            if first or self.pending_rows >= self.flush_rows:
+                # Start the writer's flush_interval timer, or flush now
+                self._condition.notify_all()
+        return True
+
+    def _evict_oldest(self, sample):
+        """Drop the oldest queued sample, moving its queries into the next
+        queued one or, when it was the only one, into ``sample``; returns ``sample``"""
+        old, old_rows = self.queue.popleft()
+        self.pending_rows -= old_rows
+        self.dropped += 1
+        if not old.get('queries') and not old.get('checkpoint'):
+            return sample
+        if self.queue:
+            self._replace(0, self._carry(self.queue[0][0], old))
+            return sample
+        return self._carry(sample, old)
+
+    def _carry(self, sample, other):
+        merged, overflow = carry_queries(sample, other, self.max_carried)
+        if overflow:
+            self.dropped_queries += overflow
+            logger.warning(f"Write queue full, dropped {overflow} queries carried over from dropped samples")
+        return merged
+
+    def _replace(self, index, sample):
+        rows = count_rows(sample)
+        self.pending_rows += rows - self.queue[index][1]
+        self.queue[index] = (sample, rows)
+
+    def _requeue(self, batch):
+        """Put a failed batch back in front of the queue, keeping its queries within capacity"""
+        for sample in reversed(batch):
+            rows = count_rows(sample)
+            self.queue.appendleft((sample, rows))
+            self.pending_rows += rows
+        while len(self.queue) > self.capacity:
+            self._evict_oldest(None)
+        self.oldest = time.monotonic()
+        self.retry_at = self.oldest + self.retry_interval
+        self.requeued += len(batch)
+
+    def _due(self):
+        if self._stopping:
+            return True
+        if time.monotonic() < self.retry_at:
+            return False
+        return self.pending_rows >= self.flush_rows or (
+            self.queue and time.monotonic() - self.oldest >= self.flush_interval)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._due():
+                    timeout = None
+                    if self.queue:
+                        due_at = max(self.oldest + self.flush_interval, self.retry_at)
+                        timeout = max(0.0, due_at - time.monotonic())
+                    self._condition.wait(timeout)
+
+                batch = [sample for sample, _rows in self.queue]
+                self.queue.clear()
+                self.pending_rows = 0
+                self.oldest = None
+                stopping = self._stopping
+                # Wake producers blocked on a full queue
+                self._condition.notify_all()
+
+            if batch:
+                self._flush(batch)
+            if stopping:
+                return
+
+    def _flush(self, batch):
+        started = time.monotonic()
+        try:
+            ok = self.write_batch(batch)
+        except Exception as e:
+            logger.error(f"Error writing monitoring batch: {e}")
+            ok = False
+        elapsed = (time.monotonic() - started) * 1000.0
+
+        with self._condition:
+            self.flushes += 1
+            self.last_flush_ms = elapsed
+            self.max_flush_ms = max(self.max_flush_ms, elapsed)
+            self.total_flush_ms += elapsed
+            if ok is False:
+                self.failed += len(batch)
+                self._requeue(batch)
+            else:
+                self.written += len(batch)
+
+    def get_stats(self):
+        """Queue depth, drop counts and flush latency"""
+        with self._condition:
+            return {
+                'policy': self.policy,
+                'depth': len(self.queue),
+                'max_depth': self.max_depth,
+                'capacity': self.capacity,
+                'pending_rows': self.pending_rows,
+                'enqueued': self.enqueued,
+                'written': self.written,
+                'dropped': self.dropped,
+                'dropped_queries': self.dropped_queries,
+                'failed': self.failed,
+                'requeued': self.requeued,
+                'flushes': self.flushes,
+                'last_flush_ms': round(self.last_flush_ms, 3),
+                'max_flush_ms': round(self.max_flush_ms, 3),
+                'avg_flush_ms': round(self.total_flush_ms / self.flushes, 3) if self.flushes else 0
+            }
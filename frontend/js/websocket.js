@@ -1,6 +1,9 @@
 // DNS Monitor - WebSocket Client
 // Real-time communication with backend
 
+// Version of the monitoring frame format this client understands
+const MONITORING_PROTOCOL_VERSION = 2;
+
 class WebSocketClient {
     constructor() {
         this.socket = null;
@@ -11,6 +14,13 @@ class WebSocketClient {
         this.listeners = new Map();
         this.messageQueue = [];
         
+        // Topic data rebuilt from keyframes and deltas: topic -> {rate, seq, data, resyncPending}
+        this.topics = {};
+        // Topics subscribed to at a non-default rate (topic -> rate) or dropped (topic -> null)
+        this.subscriptions = {};
+        this.activeAlerts = new Set();
+        this.updateTimer = null;
+        
         this.init();
     }
     
@@ -57,8 +67,9 @@ class WebSocketClient {
             this.updateConnectionStatus(true);
             this.processPendingMessages();
             
-            // Request current data
-            this.socket.emit('request_current_data');
+            // The server subscribes new clients to every topic and sends their keyframes
+            this.topics = {};
+            this.restoreSubscriptions();
         });
         
         // Connection lost
@@ -105,12 +116,17 @@ class WebSocketClient {
             this.emit('status', data);
         });
         
-        // Monitoring data
+        // Monitoring data, answering request_current_data
         this.socket.on('monitoring_data', (data) => {
             console.log('Received monitoring data:', data);
             this.handleMonitoringData(data);
         });
         
+        // Monitoring keyframes and deltas
+        this.socket.on('monitoring_frame', (frame) => {
+            this.handleMonitoringFrame(frame);
+        });
+        
         // Error messages
         this.socket.on('error', (error) => {
             console.error('WebSocket error:', error);
@@ -182,6 +198,97 @@ class WebSocketClient {
         }
     }
     
+    handleMonitoringFrame(frame) {
+        if (frame.v !== MONITORING_PROTOCOL_VERSION) {
+            console.warn(`Unsupported monitoring frame version ${frame.v}`);
+            return;
+        }
+        
+        const current = this.topics[frame.topic];
+        if ('data' in frame) {
+            // Keyframe; an older one than the data held at this rate arrived late
+            if (current && current.rate === frame.rate && frame.seq < current.seq) return;
+            this.topics[frame.topic] = { rate: frame.rate, seq: frame.seq, data: frame.data, resyncPending: false };
+        } else {
+            // Delta; ignored until the keyframe of its rate arrives or when already applied
+            if (!current || current.rate !== frame.rate || current.resyncPending || frame.seq <= current.seq) return;
+            if (frame.base !== current.seq) {
+                console.log(`Missed ${frame.topic} frames ${current.seq + 1}-${frame.base}, resyncing`);
+                this.resync(frame.topic);
+                return;
+            }
+            current.data = WebSocketClient.applyDelta(current.data, frame.delta);
+            current.seq = frame.seq;
+        }
+        
+        if (frame.topic === 'alerts') {
+            this.handleAlerts(this.topics.alerts.data);
+            return;
+        }
+        
+        // The frames of one tick arrive together, update the UI once for them
+        if (!this.updateTimer) {
+            this.updateTimer = setTimeout(() => {
+                this.updateTimer = null;
+                this.handleMonitoringData(this.buildMonitoringData());
+            }, 50);
+        }
+    }
+    
+    // Monitoring data in the shape of monitoring_data from the topics held
+    buildMonitoringData() {
+        const data = (topic) => this.topics[topic] && this.topics[topic].data;
+        const system = data('system') && Object.assign({}, data('system'), data('processes'));
+        const dns = data('dns-summary') && Object.assign({}, data('dns-summary'), data('dns-live-queries'));
+        return {
+            timestamp: system ? system.timestamp : new Date().toISOString(),
+            system,
+            dns
+        };
+    }
+    
+    handleAlerts(alerts) {
+        const current = [];
+        const system = alerts.system || {};
+        (system.critical || []).forEach(message => current.push({ title: '系统严重告警', message }));
+        (system.warnings || []).forEach(message => current.push({ title: '系统警告', message }));
+        ((alerts.dns || {}).issues || []).forEach(message => current.push({ title: 'DNS 服务告警', message }));
+        
+        // Notify each alert once while it lasts; values after the colon change every tick
+        const active = new Set();
+        current.forEach(alert => {
+            const key = alert.message.split(':')[0];
+            active.add(key);
+            if (!this.activeAlerts.has(key)) {
+                this.handleSystemAlert(alert);
+            }
+        });
+        this.activeAlerts = active;
+    }
+    
+    // Apply a delta from the server's json_delta.diff, leaving old unchanged
+    static applyDelta(old, delta) {
+        const updated = Object.assign({}, old);
+        (delta.d || []).forEach(key => {
+            delete updated[key];
+        });
+        Object.assign(updated, delta.s || {});
+        Object.entries(delta.p || {}).forEach(([key, nested]) => {
+            updated[key] = WebSocketClient.applyDelta(old[key], nested);
+        });
+        Object.entries(delta.h || {}).forEach(([key, [added, keep]]) => {
+            updated[key] = added.concat(old[key].slice(0, keep));
+        });
+        return updated;
+    }
+    
+    resync(topic) {
+        if (this.socket) {
+            this.topics[topic].resyncPending = true;
+            this.socket.emit('resync', { topic, seq: this.topics[topic].seq });
+        }
+    }
+    
     handleMonitoringData(data) {
         try {
             // Update main application with received data
@@ -379,6 +486,32 @@ class WebSocketClient {
         }
     }
     
+    // Receive topics every rate seconds (1, 5 or 30)
+    subscribe(topics, rate = 1) {
+        topics.forEach(topic => {
+            this.subscriptions[topic] = rate;
+        });
+        this.send('subscribe', { topics, rate });
+    }
+    
+    unsubscribe(topics) {
+        topics.forEach(topic => {
+            this.subscriptions[topic] = null;
+            delete this.topics[topic];
+        });
+        this.send('unsubscribe', { topics });
+    }
+    
+    restoreSubscriptions() {
+        Object.entries(this.subscriptions).forEach(([topic, rate]) => {
+            if (rate === null) {
+                this.socket.emit('unsubscribe', { topics: [topic] });
+            } else {
+                this.socket.emit('subscribe', { topics: [topic], rate });
+            }
+        });
+    }
+    
     requestCurrentData() {
         if (this.socket) {
             this.socket.emit('request_current_data');